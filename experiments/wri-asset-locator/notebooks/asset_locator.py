@@ -89,11 +89,14 @@ def _(df_all):
 
 @app.cell
 def _():
+    import functools
+    import json
     import marimo as mo
     import pandas as pd
+    import time
     from pathlib import Path
 
-    return Path, mo, pd
+    return Path, functools, json, mo, pd, time
 
 
 @app.cell
@@ -119,7 +122,7 @@ def _(Path, mo):
 
             Run the fetch_all script (includes data combination):
             ```bash
-            python src/fetch_all.py
+            uv run src/fetch_all.py
             ```
 
             Or run the combination script directly:
@@ -133,19 +136,59 @@ def _(Path, mo):
 
     datapath = DATA_DIR
     print(f"Data directory: {datapath.absolute()}")
-    return REQUIRED_FILE, datapath
+
+    # Load the typed Parquet copy written next to the CSV unless set to "csv"
+    LOAD_FORMAT = "parquet"
+    return LOAD_FORMAT, REQUIRED_FILE, datapath
 
 
 @app.cell
-def _(REQUIRED_FILE, datapath, pd):
+def _(LOAD_FORMAT, REQUIRED_FILE, datapath, pd, time):
     # Load the pre-combined assets data
-    df_all = pd.read_csv(datapath / REQUIRED_FILE)
+    csv_path = datapath / REQUIRED_FILE
+    parquet_path = csv_path.with_suffix(".parquet")
+
+    def timed_load(path):
+        t0 = time.perf_counter()
+        df = pd.read_parquet(path) if path.suffix == ".parquet" else pd.read_csv(path)
+        return df, time.perf_counter() - t0
+
+    # an older run may have left no (or a stale) Parquet copy; fall back to the CSV then
+    parquet_ok = parquet_path.exists() and (
+        parquet_path.stat().st_mtime >= csv_path.stat().st_mtime
+    )
+    if LOAD_FORMAT == "parquet" and parquet_ok:
+        df_all, load_secs = timed_load(parquet_path)
+        _, csv_secs = timed_load(csv_path)
+        print(
+            f"Loaded {parquet_path.name} in {load_secs * 1000:.0f} ms "
+            f"(CSV: {csv_secs * 1000:.0f} ms, {csv_secs / max(load_secs, 1e-9):.1f}x slower)"
+        )
+    else:
+        df_all, load_secs = timed_load(csv_path)
+        print(f"Loaded {csv_path.name} in {load_secs * 1000:.0f} ms")
     print(f"Loaded {len(df_all)} assets from combined dataset")
     print(f"Shape: {df_all.shape}")
     print(f"Columns: {len(df_all.columns)}")
     return (df_all,)
 
 
+@app.cell
+def _(datapath, functools, pd):
+    # WRI Data Explorer resources (one row per file/link of a dataset) live in a side table
+    # keyed by dataset_id; it is only read when a selected dataset's details are shown,
+    # and then only the row groups that can hold that dataset_id
+    RESOURCES_FILE = datapath / "wri_data_explorer_resources.parquet"
+
+    @functools.lru_cache(maxsize=128)
+    def load_resources(dataset_id):
+        if not RESOURCES_FILE.exists():
+            return None
+        return pd.read_parquet(RESOURCES_FILE, filters=[("dataset_id", "==", dataset_id)])
+
+    return (load_resources,)
+
+
 @app.cell
 def _(df_all):
     # Useful columns subsets
@@ -161,6 +204,7 @@ def _(df_all):
         "date_created",
         "date_last_updated",
         "source",
+        "also_in",
         "slug",
         "provider",
         "url",
@@ -332,7 +376,7 @@ def _(mo):
 
 
 @app.cell
-def _(df_all, embed_button, mo, model_nomic):
+def _(datapath, df_all, embed_button, json, mo, model_nomic, time):
     # Construct textx from df_all["dataset_info_combined"]
     # typical runtime without GPU: 2.5 min
 
@@ -346,7 +390,16 @@ def _(df_all, embed_button, mo, model_nomic):
         X = model_nomic.encode(texts)
         return texts, X
 
+    t_embed = time.perf_counter()
     texts, X = embed_dataframe_text()
+    embed_secs = time.perf_counter() - t_embed
+    # a persistent-cache hit returns in well under a second; only a real encode is recorded,
+    # so the combine step can report the embedding time its dedup saves
+    if embed_secs > 1:
+        (datapath / "telemetry").mkdir(exist_ok=True)
+        (datapath / "telemetry" / "embedding.json").write_text(
+            json.dumps({"rows": len(texts), "seconds": embed_secs})
+        )
     return X, texts
 
 
@@ -569,10 +622,11 @@ def _(df_all, display_cols, widget):
 
 
 @app.cell(hide_code=True)
-def _(df_all, display_cols, indices, pd, reordered_cols):
+def _(df_all, display_cols, indices, load_resources, pd, reordered_cols):
     # Print details on the first selected dataset
     def print_row_details(iidx):
-        row = df_all.loc[iidx, reordered_cols].copy()
+        # `also_in` is only there when the combine step merged duplicates
+        row = df_all.loc[iidx, [c for c in reordered_cols if c in df_all]].copy()
         # Remove 'dataset_info_combined' if present
         if "dataset_info_combined" in row.index:
             row = row.drop("dataset_info_combined")
@@ -607,6 +661,24 @@ def _(df_all, display_cols, indices, pd, reordered_cols):
             print("\n--- Keys with no value ---")
             print(", ".join(empty_keys))
 
+        # a row merged by the combine step's dedup lists its other copies in `also_in`
+        refs = [f"{df_all.loc[iidx, 'source_collection']}:{df_all.loc[iidx, 'dataset_id']}"]
+        if "also_in" in df_all and pd.notna(df_all.loc[iidx, "also_in"]):
+            refs += [r for r in str(df_all.loc[iidx, "also_in"]).split("; ") if r]
+        for ref in refs:
+            if not ref.startswith("wri_data_explorer:"):
+                continue
+            resources = load_resources(ref.split(":", 1)[1])
+            print("\n--- Resources ---")
+            if resources is None:
+                print("(no resources side table; run fetch_datasets_wri_data_explorer.py)")
+            elif resources.empty:
+                print("(none)")
+            else:
+                for res in resources.itertuples():
+                    fmt = f" [{res.format}]" if pd.notna(res.format) and res.format else ""
+                    print(f"{res.name or res.resource_id}{fmt}: {res.url}")
+
     # Example usage:
     if len(indices.values) > 0:
         print_row_details(indices[0])
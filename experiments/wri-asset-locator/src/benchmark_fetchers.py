@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# /// script
+# requires-python = ">=3.11"
+# dependencies = [
+#     "brotli==1.1.0",
+#     "ijson==3.4.0",
+#     "pandas==2.3.3",
+#     "pyarrow==22.0.0",
+#     "requests==2.32.5",
+# ]
+# ///
+"""Benchmark the catalog connectors offline against recorded API responses.
+
+`record` crawls every source live once with the HTTP cache off and saves each
+response under `data/fixtures/` (see `connectors/replay.py`). `run` then replays
+those fixtures from a local stand-in server under a few network conditions and
+reports pages/sec, rows/sec, MB downloaded and wall time per connector:
+
+* `fast`: no added latency
+* `slow`: 250 ms per response
+* `flaky`: 100 ms per response, 5% of requests fail with a 503
+* `throttled`: 100 ms per response, 10% of requests get a 429 with `Retry-After: 1`
+
+Pass `--latency`, `--error-rate` and/or `--throttle-rate` to run one custom
+condition instead.
+
+`rw-lazy` is the two-phase Resource Watch crawl (light pages, then per-dataset
+layer names) starting from an empty layer cache; `rw-lazy-warm` is the same
+crawl after an untimed run filled the cache, as on a repeat fetch. Compare
+them with the single-pass `rw` row; each also prints its phase split.
+
+Usage: uv run src/benchmark_fetchers.py record
+       uv run src/benchmark_fetchers.py run [--only rw ckan] [--latency 0.5]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from connectors import Checkpoint, arcgis, ckan, registry, resourcewatch
+from connectors.ratelimit import reset_limiter
+from connectors.replay import FIXTURE_DIR, serve_fixtures
+
+SCENARIOS = {
+    "fast": {},
+    "slow": {"latency": 0.25},
+    "flaky": {"latency": 0.1, "error_rate": 0.05},
+    "throttled": {"latency": 0.1, "throttle_rate": 0.1},
+}
+
+CONNECTORS = ["rw", "rw-lazy", "rw-lazy-warm", "gfw", "ckan", "arcgis"]
+
+
+def prepare_connector(name, out_dir):
+    """Untimed setup before a run: the warm two-phase run starts with a filled layer cache."""
+    if name == "rw-lazy-warm":
+        run_connector("rw-lazy", out_dir)
+
+
+def run_connector(name, out_dir, stats=None):
+    """Crawl one source the way its fetch notebook does; return the number of rows."""
+    if name in ("rw", "gfw"):
+        return resourcewatch.write_csv(
+            registry.SOURCES[name], out_dir / f"{name}.csv", resume=False, facet_dir=out_dir
+        )
+    if name in ("rw-lazy", "rw-lazy-warm"):
+        return resourcewatch.write_csv(
+            registry.SOURCES["rw"],
+            out_dir / "rw.csv",
+            resume=False,
+            facet_dir=out_dir,
+            layers="lazy",
+            layer_cache_dir=out_dir / "layers",
+            stats=stats,
+        )
+    if name == "ckan":
+        checkpoint = Checkpoint("bench-ckan", params={"rows": 100}, resume=False)
+        dataset_records, _ = ckan.fetch_packages(
+            registry.SOURCES["wri_explorer"], checkpoint, rows=100
+        )
+        return len(dataset_records)
+    if name == "arcgis":
+        checkpoint = Checkpoint("bench-arcgis", params={"limit": 100}, resume=False)
+        return len(arcgis.fetch_rows(registry.SOURCES["arcgis"], checkpoint, page_size=100))
+    raise ValueError(f"Unknown connector: {name}")
+
+
+def record(names, fixture_dir):
+    os.environ["FETCH_RECORD_DIR"] = str(fixture_dir)
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in names:
+            t0 = time.perf_counter()
+            n_rows = run_connector(name, Path(tmp))
+            print(f"Recorded {name}: {n_rows} rows in {time.perf_counter() - t0:.1f}s")
+    n_files = len(list(Path(fixture_dir).glob("*.body")))
+    print(f"\n{n_files} responses in {fixture_dir}")
+
+
+def benchmark(names, fixture_dir, scenarios):
+    print(
+        f"{'scenario':<10} {'connector':<12} {'pages':>6} {'rows':>7} {'MB':>7} {'wall':>8} "
+        f"{'pages/s':>8} {'rows/s':>9} {'503s':>5} {'429s':>5}"
+    )
+    failed = False
+    for scenario, conditions in scenarios.items():
+        with serve_fixtures(directory=fixture_dir, **conditions) as server:
+            for name in names:
+                log = io.StringIO()
+                stats = {}
+                try:
+                    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(log):
+                        prepare_connector(name, Path(tmp))
+                        # every run starts from the same limiter state and an empty checkpoint
+                        reset_limiter()
+                        server.reset_stats()
+                        t0 = time.perf_counter()
+                        n_rows = run_connector(name, Path(tmp), stats=stats)
+                        wall = time.perf_counter() - t0
+                except Exception as e:
+                    failed = True
+                    print(f"{scenario:<10} {name:<12} failed: {e!r}")
+                    continue
+                st = server.stats
+                print(
+                    f"{scenario:<10} {name:<12} {st['served']:>6} {n_rows:>7} "
+                    f"{st['bytes'] / 2**20:>7.1f} {wall:>7.2f}s "
+                    f"{st['served'] / wall:>8.1f} {n_rows / wall:>9.0f} "
+                    f"{st['errors']:>5} {st['throttled']:>5}"
+                )
+                if stats:
+                    print(
+                        f"  phase 1 (light pages) {stats['phase1_seconds']:.2f}s, phase 2 "
+                        f"(layers: {stats['fetched']} fetched, {stats['cached']} cached) "
+                        f"{stats['phase2_seconds']:.2f}s"
+                    )
+                if st["missing"]:
+                    print(f"  {st['missing']} requests had no fixture; re-run `record`")
+    return not failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["record", "run"])
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        choices=CONNECTORS,
+        default=CONNECTORS,
+        help="Connectors to record or benchmark (default: all)",
+    )
+    parser.add_argument(
+        "--fixtures",
+        type=Path,
+        default=FIXTURE_DIR,
+        help="Fixture directory (default: data/fixtures)",
+    )
+    parser.add_argument("--latency", type=float, help="Seconds added to every response")
+    parser.add_argument("--error-rate", type=float, help="Fraction of requests failing with 503")
+    parser.add_argument("--throttle-rate", type=float, help="Fraction of requests getting a 429")
+    args = parser.parse_args()
+
+    custom = {
+        key: value
+        for key, value in (
+            ("latency", args.latency),
+            ("error_rate", args.error_rate),
+            ("throttle_rate", args.throttle_rate),
+        )
+        if value is not None
+    }
+    scenarios = {"custom": custom} if custom else SCENARIOS
+    if args.command == "run" and not any(args.fixtures.glob("*.body")):
+        sys.exit(f"No fixtures in {args.fixtures}; run `record` first.")
+
+    # fixtures must come from (and be replayed to) the network, never the HTTP cache
+    os.environ["FETCH_NO_CACHE"] = "1"
+    with tempfile.TemporaryDirectory(prefix="bench-checkpoints-") as checkpoints:
+        os.environ["FETCH_CHECKPOINT_DIR"] = checkpoints
+        # completed runs are archived; keep the benchmark's out of data/raw_archive/
+        os.environ["FETCH_ARCHIVE_DIR"] = str(Path(checkpoints) / "archive")
+        if args.command == "record":
+            record(args.only, args.fixtures)
+        elif not benchmark(args.only, args.fixtures, scenarios):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@
 #     "marimo",
 #     "pandas==2.3.3",
 #     "pyarrow==22.0.0",
+#     "requests==2.32.5",
 # ]
 # ///
 
@@ -36,9 +37,13 @@ def _(mo):
     | `fetch_datasets_wri_data_explorer.py` | `wri_data_explorer_01.csv` |
 
     See the respective fetch notebooks in `src/` for details on how each dataset is collected.
+    The sources, their files and their column mappings are declared in
+    `connectors/registry.py`; a source registered there is loaded here with no changes to
+    this notebook.
 
     **Output File:**
     - `wri_assets_info_combined.csv`
+    - `wri_assets_info_combined.parquet` (same rows; timestamps, counts and flags typed)
 
     **Note:** This script is designed to run automatically as part of the data fetch pipeline 
     via `fetch_all.py`.
@@ -50,29 +55,27 @@ def _(mo):
 @app.cell
 def _():
     import marimo as mo
+    import os
     import pandas as pd
     import re
     import html
     from datetime import datetime
     from pathlib import Path
 
-    return Path, datetime, html, mo, pd, re
+    # typed Parquet output, cross-source dedup and the source registry (src/connectors/)
+    from connectors import dedup, registry, write_parquet
+
+    return Path, datetime, dedup, html, mo, os, pd, re, registry, write_parquet
 
 
 @app.cell
-def _(Path, mo):
+def _(Path, mo, registry):
     # Calculate data directory - works whether run from src/ or root
     SCRIPT_DIR = Path.cwd()
     DATA_DIR = SCRIPT_DIR.parent / "data" if SCRIPT_DIR.name == "src" else SCRIPT_DIR / "data"
 
-    # Check if required data files exist
-    REQUIRED_FILES = [
-        "resourcewatch_datasets.csv",
-        "wri_arcgis_catalog_01.csv",
-        "global_forest_watch_datasets.csv",
-        "eae_datasets_pdf-extract.csv",
-        "wri_data_explorer_01.csv",
-    ]
+    # Check if required data files exist: one per registered source
+    REQUIRED_FILES = [source.output for source in registry.SOURCES.values()]
 
     missing_files = [f for f in REQUIRED_FILES if not (DATA_DIR / f).exists()]
 
@@ -121,162 +124,113 @@ def _(mo):
 
 
 @app.cell
-def _(datapath, pd):
-    # Resource Watch
-    df_rw = pd.read_csv(datapath / "resourcewatch_datasets.csv")
-    print(f"Loaded {len(df_rw)} datasets from collection: 'Resource Watch'")
-
-    df_rw.rename(
-        columns={
-            "id": "dataset_id",
-            "name": "dataset_name",
-            "slug": "slug",
-            "updatedAt": "last_updated",
-            "tags": "dataset_tags",
-        },
-        inplace=True,
-    )
-
-    # Add these columns
-    df_rw["source_collection"] = "resource_watch"
-    df_rw["source"] = df_rw.apply(
-        lambda x: f"resource_watch > {x['provider']}"
-        if pd.notnull(x.get("provider"))
-        else "resource_watch",
-        axis=1,
-    )
-    df_rw["dataset_description"] = ""  # none in source
-
-    print(f"  Columns (n={len(df_rw.columns)})")
-    return (df_rw,)
-
-
-@app.cell
-def _(datapath, pd):
-    # ArcGIS Catalog
-    df_arc = pd.read_csv(datapath / "wri_arcgis_catalog_01.csv")
-    print(f"Loaded {len(df_arc)} datasets from collection: 'ArcGIS Catalog'")
-
-    df_arc.rename(
-        columns={
-            "id": "dataset_id",
-            "name": "dataset_name",
-            "description": "dataset_description",
-            "tags": "dataset_tags",
-            "updatedAt": "date_last_updated",
-            "createdAt": "date_created",
-        },
-        inplace=True,
-    )
-
-    # Add these columns
-    df_arc["source_collection"] = "arcgis_wri_catalog"
-    df_arc["source"] = df_arc.apply(
-        lambda x: f"arcgis_wri_catalog > {x['provider']}"
-        if pd.notnull(x.get("provider"))
-        else "arcgis_wri_catalog",
-        axis=1,
-    )
-
-    print(f"  Columns (n={len(df_arc.columns)})")
-    return (df_arc,)
-
-
-@app.cell
-def _(datapath, pd):
-    # Global Forest Watch
-    df_gfw = pd.read_csv(datapath / "global_forest_watch_datasets.csv")
-    print(f"Loaded {len(df_gfw)} datasets from collection: 'GFW'")
-
-    df_gfw.rename(
-        columns={
-            "id": "dataset_id",
-            "name": "dataset_name",
-            "description": "dataset_description",
-            "tags": "dataset_tags",
-        },
-        inplace=True,
-    )
-
-    # Add these columns
-    df_gfw["source_collection"] = "global_forest_watch"
-    df_gfw["source"] = df_gfw.apply(
-        lambda x: f"global_forest_watch > {x['provider']}"
-        if pd.notnull(x.get("provider"))
-        else "global_forest_watch",
-        axis=1,
-    )
+def _(datapath, pd, registry):
+    # One frame per registered source (see connectors/registry.py), in registry order
+    source_frames = {}
+    for _source in registry.SOURCES.values():
+        _df = pd.read_csv(datapath / _source.output)
+        print(f"Loaded {len(_df)} datasets from collection: '{_source.title}'")
+
+        _df = _df.rename(columns=_source.columns)
+
+        # Add these columns
+        _df["source_collection"] = _source.collection
+        _providers = (
+            _df[_source.provider]
+            if _source.provider in _df
+            else pd.Series(None, index=_df.index, dtype=object)
+        )
+        _df["source"] = (_source.collection + " > " + _providers.astype(str)).where(
+            _providers.notna(), _source.collection
+        )
+        if "dataset_description" not in _df:
+            _df["dataset_description"] = ""  # none in source
 
-    print(f"  Columns (n={len(df_gfw.columns)})")
-    return (df_gfw,)
+        print(f"  Columns (n={len(_df.columns)})")
+        source_frames[_source.collection] = _df
+    return (source_frames,)
 
 
 @app.cell
-def _(datapath, pd):
-    # Energy Access Explorer
-    df_eae = pd.read_csv(datapath / "eae_datasets_pdf-extract.csv")
-    print(f"Loaded {len(df_eae)} datasets from collection: 'EAE'")
-
-    df_eae.rename(
-        columns={
-            "id": "dataset_id",
-            "name": "dataset_name",
-            "description": "dataset_description",
-            "tags": "dataset_tags",
-        },
-        inplace=True,
-    )
-
-    # Add these columns
-    df_eae["source_collection"] = "energy_access_explorer"
-    df_eae["source"] = df_eae.apply(
-        lambda x: f"energy_access_explorer > {x['provider']}"
-        if pd.notnull(x.get("provider"))
-        else "energy_access_explorer",
-        axis=1,
-    )
-
-    print(f"  Columns (n={len(df_eae.columns)})")
-    return (df_eae,)
+def _(pd, source_frames):
+    # Combine into one unified DataFrame
+    df_combined = pd.concat(list(source_frames.values()), ignore_index=True)
+    print(f"\nCombined total: {len(df_combined)} assets")
+    print(f"Shape: {df_combined.shape}")
+    return (df_combined,)
 
 
-@app.cell
-def _(datapath, pd):
-    # WRI Data Explorer
-    df_ex = pd.read_csv(datapath / "wri_data_explorer_01.csv")
-    print(f"Loaded {len(df_ex)} datasets from collection: 'WRI Data Explorer'")
-
-    df_ex.rename(
-        columns={
-            "id": "dataset_id",
-            "name": "dataset_name",
-            "title": "dataset_description",
-            "tags": "dataset_tags",
-            "updatedAt": "date_last_updated",
-            "createdAt": "date_created",
-        },
-        inplace=True,
-    )
-
-    # Add these columns
-    df_ex["source_collection"] = "wri_data_explorer"
-    df_ex["source"] = df_ex.apply(
-        lambda x: f"wri_data_explorer > {x['organization']}"
-        if pd.notnull(x.get("organization"))
-        else "wri_data_explorer",
-        axis=1,
+@app.cell(hide_code=True)
+def _(mo):
+    mo.md(
+        r"""
+    ## Cross-source dedup
+
+    RW and GFW are the same API, and the WRI Data Explorer and ArcGIS catalogs often list the
+    same dataset. Rows are matched on id, slug or normalized name (3+ words) as each source's
+    rows arrive (see `connectors/dedup.py`); a name match never joins two rows of one source
+    or rows whose slugs or ids disagree. The persistent index `dedup_index.json` keeps the
+    surviving row the same from run to run.
+
+    * `FETCH_DEDUP=flag` (default): every row is kept; copies name their canonical row in
+      `duplicate_of`.
+    * `FETCH_DEDUP=merge`: one row per dataset; empty fields are filled from the other
+      copies, which are listed in `also_in`. Duplicates are never embedded.
+    * `FETCH_DEDUP=off`: no dedup.
+    """
     )
-
-    print(f"  Columns (n={len(df_ex.columns)})")
-    return (df_ex,)
+    return
 
 
 @app.cell
-def _(df_arc, df_eae, df_ex, df_gfw, df_rw, pd):
-    # Combine into one unified DataFrame
-    df_all = pd.concat([df_rw, df_gfw, df_arc, df_eae, df_ex], ignore_index=True)
-    print(f"\nCombined total: {len(df_all)} assets")
-    print(f"Shape: {df_all.shape}")
+def _(DATA_DIR, dedup, df_combined, os, pd, registry):
+    DEDUP = os.environ.get("FETCH_DEDUP", "flag")
+
+    # (id, slug, name) columns per source, after renaming (see connectors/registry.py)
+    IDENTITY_COLUMNS = {_s.collection: _s.identity for _s in registry.SOURCES.values()}
+    # sources served by the same endpoint (RW and GFW) share their dataset ids
+    ID_SPACES = {_s.collection: _s.endpoint or _s.collection for _s in registry.SOURCES.values()}
+
+    df_all = df_combined
+    if DEDUP != "off":
+        identity = dedup.IdentityIndex(
+            dedup.load_index(DATA_DIR / "dedup_index.json"), id_spaces=ID_SPACES
+        )
+        refs = df_combined["source_collection"] + ":" + df_combined["dataset_id"].astype(str)
+        # rows arrive source by source, in concat order
+        for _source, (_id_col, _slug_col, _name_col) in IDENTITY_COLUMNS.items():
+            _rows = df_combined["source_collection"] == _source
+            _seen = 0
+            for _ref, (_, _row) in zip(refs[_rows], df_combined[_rows].iterrows(), strict=True):
+                _keys = dedup.identity_keys(
+                    _row[_id_col], _row.get(_slug_col) if _slug_col else None, _row[_name_col]
+                )
+                _seen += identity.add(_ref, _keys) is not None
+            print(f"  {_source}: {_seen} of {_rows.sum()} rows already seen")
+        groups = identity.groups()
+        dedup.save_index(identity.key_map(), DATA_DIR / "dedup_index.json")
+
+        df_all = dedup.apply_groups(df_combined, refs, groups, mode=DEDUP)
+        seconds_per_row, measured = dedup.embed_seconds_per_row(
+            DATA_DIR / "telemetry" / "embedding.json"
+        )
+        dedup_report = dedup.summarize(list(refs), groups, seconds_per_row)
+        _merged = DEDUP == "merge"
+        print(
+            f"\nDedup ({DEDUP}): {dedup_report['rows']} rows -> {dedup_report['datasets']} "
+            f"datasets; {dedup_report['duplicates']} duplicate rows "
+            f"{'merged' if _merged else 'flagged'}"
+        )
+        print(
+            f"  Embedding time {'saved' if _merged else 'merging would save'}: "
+            f"~{dedup_report['embed_seconds_saved'] / 60:.1f} min "
+            f"({seconds_per_row:.2f} s/row, "
+            f"{'measured by the asset locator' if measured else 'README CPU estimate'})"
+        )
+        display_report = pd.DataFrame(dedup_report["by_source"]).T
+    else:
+        display_report = None
+    display_report
     return (df_all,)
 
 
@@ -394,6 +348,8 @@ def _(df_all):
         "date_created",
         "date_last_updated",
         "source",
+        "also_in",
+        "duplicate_of",
         "slug",
         "provider",
         "url",
@@ -424,17 +380,32 @@ def _(df_all):
 
 
 @app.cell
-def _(datapath, df_all, reordered_cols):
-    # Write combined CSV file automatically
+def _(datapath, df_all, reordered_cols, write_parquet):
+    # Write combined CSV file automatically, plus a typed Parquet copy
     outfilename = "wri_assets_info_combined.csv"
     output_path = datapath / outfilename
     df_all[reordered_cols].to_csv(output_path, index=False)
+    parquet_path = write_parquet(
+        df_all[reordered_cols],
+        output_path.with_suffix(".parquet"),
+        datetimes=[
+            "date_created",
+            "date_last_updated",
+            "last_updated",
+            "createdAt",
+            "dataLastUpdated",
+            "updatedAt",
+        ],
+        ints=["layerCount", "numResources"],
+        bools=["usedIn_EAP", "usedIn_Demand", "usedIn_Supply", "usedIn_NeedAssist"],
+    )
 
     print(f"\n✓ Combined {len(df_all)} assets into: {outfilename}")
     print(f"  Location: {output_path.absolute()}")
     print(f"  Columns: {len(reordered_cols)}")
     print(f"  File size: {output_path.stat().st_size / 1024:.1f} KB")
-    return outfilename, output_path
+    print(f"  Parquet: {parquet_path.name} ({parquet_path.stat().st_size / 1024:.1f} KB)")
+    return outfilename, output_path, parquet_path
 
 
 @app.cell(hide_code=True)
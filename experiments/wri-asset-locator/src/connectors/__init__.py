@@ -0,0 +1,60 @@
+"""Shared catalog connectors for the WRI asset-locator fetch notebooks.
+
+Import from a notebook in `src/` with e.g. `from connectors import resourcewatch`.
+"""
+
+from . import (
+    arcgis,
+    archive,
+    ckan,
+    dedup,
+    eae,
+    facets,
+    freshness,
+    paging,
+    registry,
+    resourcewatch,
+)
+from .cache import ResponseCache, get_cache
+from .checkpoint import Checkpoint, atomic_output
+from .client import get_json, get_session, make_session, open_body, print_summary
+from .pool import bounded_map, get_pool
+from .ratelimit import RateLimiter, get_limiter
+from .rowstream import RowWriter, external_sort
+from .streaming import StreamedPage, stream_page, streaming_available
+from .tables import OUTPUT_FORMATS, finish_csv, write_outputs, write_parquet
+
+__all__ = [
+    "Checkpoint",
+    "OUTPUT_FORMATS",
+    "RateLimiter",
+    "ResponseCache",
+    "RowWriter",
+    "StreamedPage",
+    "archive",
+    "arcgis",
+    "atomic_output",
+    "bounded_map",
+    "ckan",
+    "dedup",
+    "eae",
+    "external_sort",
+    "facets",
+    "finish_csv",
+    "freshness",
+    "get_cache",
+    "get_json",
+    "get_limiter",
+    "get_pool",
+    "get_session",
+    "make_session",
+    "open_body",
+    "paging",
+    "print_summary",
+    "registry",
+    "resourcewatch",
+    "stream_page",
+    "streaming_available",
+    "write_outputs",
+    "write_parquet",
+]
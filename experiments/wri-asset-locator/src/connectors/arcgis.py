@@ -0,0 +1,165 @@
+"""ArcGIS Hub Search (OGC API Records) connector for the WRI Data Catalogue.
+
+Pages of `/collections/dataset/items` are addressed with a 1-based `startindex`.
+The first page reports `numberMatched`, so every remaining offset is known up
+front and fetched concurrently. Servers whose `rel="next"` links don't use
+`startindex` (e.g. opaque cursors), or that omit `numberMatched`, are crawled by
+following the links one page at a time instead.
+
+The paging itself is the shared engine's (`paging.crawl`), as declared by the
+`arcgis` source in `registry.py`. `crawl_rows` checkpoints every page (see
+`checkpoint.py`) so an interrupted crawl can resume, and yields the rows as the
+pages arrive; `write_rows` streams them to the outputs, newest first, through
+an external sort (see `rowstream.py`).
+"""
+
+import datetime as dt
+import html
+import re
+
+from .paging import crawl
+from .rowstream import SORT_RUN_ROWS, RowWriter, external_sort
+
+BASE = "https://wri-data-catalogue-worldresources.hub.arcgis.com/api/search/v1/collections/dataset/items"
+
+FIELDS = [
+    "id",
+    "name",
+    "slug",
+    "provider",
+    "tags",
+    "layerCount",
+    "layerNames",
+    "createdAt",
+    "dataLastUpdated",
+    "updatedAt",
+    "license",
+    "type",
+    "url",
+    "description",
+]
+
+# Typed columns of the Parquet copy (see `tables.py`)
+DATETIME_FIELDS = ["createdAt", "dataLastUpdated", "updatedAt"]
+
+PAGE_SIZE = 100
+
+# Offsets after the first page are fetched concurrently (1 fetches them one at a time);
+# pacing is left to the shared per-host rate limiter
+MAX_WORKERS = 4
+
+TAG_RE = re.compile(r"<[^>]+>")
+
+
+def next_link(js):
+    """The `href` of the page's `rel="next"` link, or "" on the last page."""
+    for ln in js.get("links") or []:
+        if isinstance(ln, dict) and ln.get("rel") == "next" and ln.get("href"):
+            return ln["href"]
+    return ""
+
+
+def page_rows(js):
+    """Normalized rows of one page."""
+    return [normalize_feature(f) for f in js.get("features") or []]
+
+
+def fetch_rows(source, checkpoint, page_size=PAGE_SIZE, session=None, max_workers=MAX_WORKERS):
+    """Return the normalized rows of every item, checkpointing each page (see `crawl_rows`)."""
+    return list(
+        crawl_rows(
+            source, checkpoint, page_size=page_size, session=session, max_workers=max_workers
+        )
+    )
+
+
+def crawl_rows(source, checkpoint, page_size=PAGE_SIZE, session=None, max_workers=MAX_WORKERS):
+    """Yield the normalized row of every item of a registry `source`, in page order.
+
+    Every page is checkpointed, and pages already in `checkpoint` (from an interrupted
+    run being resumed) are read back from disk instead of fetched. Offset pages are
+    keyed by `startindex`; link-followed pages by their position.
+    """
+    pages = crawl(source, checkpoint, page_size=page_size, max_workers=max_workers, session=session)
+    n_rows = 0
+    for row in distinct_rows(rows for _, rows in pages):
+        n_rows += 1
+        yield row
+    n_matched = checkpoint.info["total"]
+    if n_matched is not None and n_rows != n_matched:
+        print(f"  warning: numberMatched={n_matched} but fetched {n_rows} distinct items")
+
+
+def distinct_rows(pages):
+    """Yield the rows of `pages`, keeping the first row of each id."""
+    seen = set()
+    for page in pages:
+        for row in page:
+            # offsets can shift while the catalog changes mid-crawl; keep the first copy
+            if row["id"] in seen:
+                continue
+            seen.add(row["id"])
+            yield row
+
+
+def write_rows(rows, csv_path, output_format="both", run_rows=SORT_RUN_ROWS):
+    """Write the catalog table, newest `updatedAt` first (missing last), as `tables.py` outputs.
+
+    The rows are ordered by an external merge sort, so memory holds at most
+    `run_rows` of them; each output replaces the old one only once complete.
+    Returns the `RowWriter`, whose `rows` and `paths` say what was written.
+    """
+    ordered = external_sort(
+        rows, key=lambda row: row["updatedAt"] or "", reverse=True, run_rows=run_rows
+    )
+    with RowWriter(csv_path, FIELDS, output_format, datetimes=DATETIME_FIELDS) as writer:
+        writer.write_rows(ordered)
+    return writer
+
+
+def ms_to_iso(ms):
+    if not ms:
+        return ""
+    try:
+        return dt.datetime.utcfromtimestamp(int(ms) / 1000).isoformat() + "Z"
+    except Exception:
+        return ""
+
+
+def clean_html(s):
+    if not s:
+        return ""
+    # strip tags + unescape entities
+    return html.unescape(TAG_RE.sub("", s)).strip()
+
+
+def pick_url(links):
+    if not isinstance(links, list):
+        return ""
+    for rel in ("self", "hub", "canonical"):
+        for ln in links:
+            if isinstance(ln, dict) and ln.get("rel") == rel and ln.get("href"):
+                return ln["href"]
+    return ""
+
+
+def normalize_feature(f):
+    """Flatten one GeoJSON feature into a row with the `FIELDS` columns."""
+    p = f.get("properties") or {}
+    links = p.get("links") or []
+    return {
+        "id": p.get("id") or f.get("id"),
+        "name": p.get("name") or p.get("title"),
+        "slug": p.get("slug") or "",
+        "provider": p.get("owner") or p.get("source") or "",
+        "tags": ", ".join(p.get("tags") or p.get("keywords") or []),
+        "layerCount": "",  # not exposed here
+        "layerNames": "",  # not exposed here
+        "createdAt": ms_to_iso(p.get("created")),
+        "dataLastUpdated": ms_to_iso(p.get("modified")),
+        "updatedAt": ms_to_iso(p.get("modified")),
+        "license": p.get("license") or "",
+        "type": p.get("type"),
+        "url": pick_url(links),
+        "description": clean_html(p.get("description") or p.get("searchDescription") or ""),
+    }
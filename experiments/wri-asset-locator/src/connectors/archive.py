@@ -0,0 +1,220 @@
+"""Append-only, gzip-compressed archive of the raw API pages behind every fetch.
+
+When a checkpointed fetch completes, `Checkpoint.finish` appends its raw pages to
+`data/raw_archive/<checkpoint name>.jsonl.gz` (or under `FETCH_ARCHIVE_DIR`) as
+one run. Each run is its own gzip member: a header line (run id, parameters,
+what page 1 reported), one line per page (`{"key": ..., "body": <response text>}`)
+in page order, and an end line. A failed append is cut back off the file; one
+that could not be (the process was killed) leaves a truncated member, which is
+skipped on read: the scan decompresses one member at a time and resyncs at the
+next gzip header, so the runs after it still count.
+
+Next to each archive, `<name>.index.json` records where every complete run's
+member starts and ends, so `latest_run` decodes one member rather than all of
+them. The index also records the archive size it describes; when that doesn't
+match (an append was killed before the index was written, or the index is
+missing) it is rebuilt with a full scan. Only the newest `FETCH_ARCHIVE_KEEP`
+runs (default 20, 0 keeps everything) are kept: older members are cut off the
+front of the file after an append.
+
+`renormalize.py` rebuilds the source CSVs from the newest runs, so a change to
+a row extractor doesn't need a refetch.
+"""
+
+import gzip
+import json
+import mmap
+import os
+import shutil
+import time
+import zlib
+from pathlib import Path
+
+ARCHIVE_DIR = Path(__file__).resolve().parents[2] / "data" / "raw_archive"
+
+GZIP_MAGIC = b"\x1f\x8b\x08"  # ID1, ID2 and CM=deflate: the start of every member
+
+READ_CHUNK = 1024 * 1024
+
+KEEP_RUNS = 20
+
+
+def archive_dir():
+    return Path(os.environ.get("FETCH_ARCHIVE_DIR", ARCHIVE_DIR))
+
+
+def archive_path(name, directory=None):
+    return Path(directory or archive_dir()) / f"{name}.jsonl.gz"
+
+
+def index_path(name, directory=None):
+    return Path(directory or archive_dir()) / f"{name}.index.json"
+
+
+def keep_runs():
+    return int(os.environ.get("FETCH_ARCHIVE_KEEP", KEEP_RUNS))
+
+
+def append_run(name, pages, params=None, info=None, directory=None, keep=None):
+    """Append one run's `(key, body bytes)` pages; return (pages, raw bytes, compressed bytes).
+
+    Afterwards only the newest `keep` runs are kept (default `keep_runs()`; 0 keeps all).
+    """
+    path = archive_path(name, directory)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    index = load_index(name, directory)
+    start = index["size"]
+    run = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+    n_pages = raw_bytes = 0
+    try:
+        with open(path, "ab") as f, gzip.GzipFile(fileobj=f, mode="wb") as gz:
+            header = {"run": run, "name": name, "archived_at": time.time()}
+            gz.write(
+                (json.dumps({**header, "params": params or {}, "info": info or {}}) + "\n").encode()
+            )
+            for key, body in pages:
+                line = json.dumps({"key": key, "body": body.decode("utf-8")}) + "\n"
+                gz.write(line.encode())
+                n_pages += 1
+                raw_bytes += len(body)
+            gz.write((json.dumps({"end": run, "pages": n_pages}) + "\n").encode())
+    except BaseException:
+        # drop the partial member so the next append starts on a clean boundary
+        with open(path, "r+b") as f:
+            f.truncate(start)
+        raise
+    end = path.stat().st_size
+    entry = {"run": run, "archived_at": header["archived_at"], "pages": n_pages}
+    index["runs"].append({**entry, "offset": start, "end": end})
+    index["size"] = end
+    keep = keep_runs() if keep is None else keep
+    if keep and len(index["runs"]) > keep:
+        _prune(path, index, keep)
+    _write_index(name, directory, index)
+    return n_pages, raw_bytes, end - start
+
+
+def _prune(path, index, keep):
+    """Cut every run but the newest `keep` off the front of the archive, updating `index`."""
+    dropped, kept = index["runs"][:-keep], index["runs"][-keep:]
+    cut = kept[0]["offset"]
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(path, "rb") as src, open(tmp, "wb") as dst:
+        src.seek(cut)
+        shutil.copyfileobj(src, dst, READ_CHUNK)
+    os.replace(tmp, path)
+    for entry in kept:
+        entry["offset"] -= cut
+        entry["end"] -= cut
+    index["runs"] = kept
+    index["size"] -= cut
+    index["pruned_through"] = dropped[-1]["archived_at"]
+
+
+def load_index(name, directory=None):
+    """The run index of `name`: `{"size", "runs", "pruned_through"}`, rebuilt if it is stale.
+
+    Each entry of `"runs"` is `{"run", "archived_at", "pages", "offset", "end"}`, oldest
+    first; `"pruned_through"` is when the newest run dropped by retention was archived.
+    """
+    path = archive_path(name, directory)
+    size = path.stat().st_size if path.exists() else 0
+    try:
+        index = json.loads(index_path(name, directory).read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        index = {}
+    if index.get("size") == size:
+        return index
+    runs = []
+    if size:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for start, end, run in _scan(data):
+                entry = {"run": run["run"], "archived_at": run["archived_at"]}
+                runs.append({**entry, "pages": len(run["pages"]), "offset": start, "end": end})
+    index = {"size": size, "runs": runs, "pruned_through": index.get("pruned_through")}
+    if path.exists():
+        _write_index(name, directory, index)
+    return index
+
+
+def _write_index(name, directory, index):
+    path = index_path(name, directory)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(index))
+    os.replace(tmp, path)
+
+
+def _scan(data):
+    """Yield (start, end, run) for every complete run in `data`, skipping damaged members."""
+    pos = 0
+    while pos < len(data):
+        start = pos
+        try:
+            run, pos = _read_member(data, pos)
+        except (zlib.error, json.JSONDecodeError, KeyError, UnicodeDecodeError):
+            run = None
+            # an interrupted append: skip to the next member header
+            pos = data.find(GZIP_MAGIC, start + 1)
+            if pos < 0:
+                return
+        if run is not None:
+            yield start, pos, run
+
+
+def runs(name, directory=None, entries=None):
+    """Yield every complete run of `name`, oldest first, with its pages decoded.
+
+    Each run is its header dict plus `"pages"`: a list of (key, decoded JSON).
+    `entries` limits this to those entries of the run index (see `load_index`).
+    """
+    if entries is None:
+        entries = load_index(name, directory)["runs"]
+    if not entries:
+        return
+    path = archive_path(name, directory)
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        for entry in entries:
+            run, _ = _read_member(data, entry["offset"])
+            if run is not None:
+                yield run
+
+
+def _read_member(data, pos):
+    """Decode the gzip member at `pos`; return (its complete run or None, end offset).
+
+    Raises `zlib.error` (or a parse error) if the member is corrupt or cut short.
+    """
+    d = zlib.decompressobj(wbits=31)
+    run = None
+    complete = False
+    pending = b""
+    offset = pos
+    while not d.eof:
+        if offset >= len(data):
+            raise zlib.error("truncated gzip member")
+        chunk = data[offset : offset + READ_CHUNK]
+        offset += len(chunk)
+        *lines, pending = (pending + d.decompress(chunk)).split(b"\n")
+        for line in lines:
+            rec = json.loads(line)
+            if "run" in rec:
+                run = {**rec, "pages": []}
+            elif "end" in rec:
+                complete = run is not None and run["run"] == rec["end"]
+            elif run is not None:
+                run["pages"].append((rec["key"], json.loads(rec["body"])))
+    # whatever the member didn't use belongs to the next one
+    end = offset - len(d.unused_data)
+    return (run if complete else None), end
+
+
+def latest_run(name, directory=None):
+    """The newest complete run of `name`, or None; only its own member is decoded."""
+    entries = load_index(name, directory)["runs"][-1:]
+    return next(runs(name, directory, entries), None)
+
+
+def names(directory=None):
+    """Names of every archive in `directory`."""
+    paths = Path(directory or archive_dir()).glob("*.jsonl.gz")
+    return sorted(p.name.removesuffix(".jsonl.gz") for p in paths)
@@ -0,0 +1,201 @@
+"""On-disk HTTP response cache shared by the catalog connectors.
+
+Each entry is keyed by a hash of the URL plus its query params and stored as
+two files: `<key>.body` (the raw response bytes) and `<key>.json` (ETag,
+Last-Modified and when it was stored). Within `ttl` seconds an entry is served
+without touching the network; after that it is revalidated with
+`If-None-Match` / `If-Modified-Since`, and a `304 Not Modified` refreshes it in
+place. Least-recently-used entries are evicted once the cache outgrows
+`max_bytes`.
+
+Configuration comes from the environment so `fetch_all.py` can set it for
+every notebook, whether they run in-process or as separate `uv run` processes:
+
+* `FETCH_CACHE_DIR`: cache location (default `data/.http_cache`)
+* `FETCH_CACHE_TTL`: seconds an entry is served without revalidation (default 12h)
+* `FETCH_CACHE_MAX_MB`: size cap before LRU eviction (default 512)
+* `FETCH_NO_CACHE=1`: disable the cache entirely
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import urlencode
+
+CACHE_DIR = Path(__file__).resolve().parents[2] / "data" / ".http_cache"
+TTL = 12 * 3600
+MAX_BYTES = 512 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    body_path: Path
+    etag: str | None
+    last_modified: str | None
+    stored_at: float
+
+    def is_fresh(self, ttl):
+        return time.time() - self.stored_at < ttl
+
+    def validators(self):
+        """Conditional-request headers that let the server answer `304 Not Modified`."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def open(self):
+        return open(self.body_path, "rb")
+
+
+class ResponseCache:
+    """Content cache for GET responses, safe to share across threads and processes."""
+
+    def __init__(self, directory=CACHE_DIR, ttl=TTL, max_bytes=MAX_BYTES):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0, "stored": 0, "evicted": 0}
+        self._lock = threading.Lock()
+        self._size = sum(p.stat().st_size for p in self.directory.glob("*.body"))
+
+    @staticmethod
+    def key(url, params=None):
+        query = urlencode(sorted((params or {}).items()), doseq=True)
+        return hashlib.sha256(f"{url}?{query}".encode()).hexdigest()
+
+    def _paths(self, key):
+        return self.directory / f"{key}.body", self.directory / f"{key}.json"
+
+    @staticmethod
+    def _tmp_path(path):
+        return path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+    def _write_atomic(self, path, data):
+        tmp = self._tmp_path(path)
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    def record(self, outcome):
+        with self._lock:
+            self.stats[outcome] += 1
+
+    def get(self, url, params=None):
+        """Return the entry for this request, or None if it isn't cached."""
+        key = self.key(url, params)
+        body_path, meta_path = self._paths(key)
+        try:
+            meta = json.loads(meta_path.read_text())
+            # the body's mtime doubles as its last-access time for LRU eviction
+            os.utime(body_path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return CacheEntry(
+            key, body_path, meta.get("etag"), meta.get("last_modified"), meta["stored_at"]
+        )
+
+    def put(self, url, params, response):
+        """Store a 200 response's body and validators; return the body opened for reading.
+
+        The body is copied in chunks, so a response opened with `stream=True` is
+        written to disk without being held in memory.
+        """
+        key = self.key(url, params)
+        body_path, meta_path = self._paths(key)
+        old_size = body_path.stat().st_size if body_path.exists() else 0
+        meta = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "stored_at": time.time(),
+        }
+        tmp = self._tmp_path(body_path)
+        with open(tmp, "wb") as f:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                f.write(chunk)
+        size = tmp.stat().st_size
+        os.replace(tmp, body_path)
+        body = open(body_path, "rb")  # noqa: SIM115 - returned to the caller, who closes it
+        self._write_atomic(meta_path, json.dumps(meta).encode())
+        with self._lock:
+            self.stats["stored"] += 1
+            self._size += size - old_size
+            over = self._size > self.max_bytes
+        if over:
+            self.evict()
+        return body
+
+    def refresh(self, entry, response):
+        """Mark an entry fresh again after a `304 Not Modified`."""
+        _, meta_path = self._paths(entry.key)
+        meta = json.loads(meta_path.read_text())
+        entry.etag = response.headers.get("ETag") or entry.etag
+        entry.last_modified = response.headers.get("Last-Modified") or entry.last_modified
+        entry.stored_at = time.time()
+        meta.update(etag=entry.etag, last_modified=entry.last_modified, stored_at=entry.stored_at)
+        self._write_atomic(meta_path, json.dumps(meta).encode())
+
+    def evict(self):
+        """Drop least-recently-used entries until the cache fits in `max_bytes`."""
+        bodies = []
+        for p in self.directory.glob("*.body"):
+            try:
+                st = p.stat()
+            except FileNotFoundError:  # evicted by another process
+                continue
+            bodies.append((st.st_mtime, st.st_size, p))
+        bodies.sort()
+
+        total = sum(size for _, size, _ in bodies)
+        evicted = 0
+        for _, size, body_path in bodies:
+            if total <= self.max_bytes:
+                break
+            body_path.unlink(missing_ok=True)
+            body_path.with_suffix(".json").unlink(missing_ok=True)
+            total -= size
+            evicted += 1
+
+        with self._lock:
+            self._size = total
+            self.stats["evicted"] += evicted
+
+    def summary(self):
+        s = self.stats
+        served = s["hits"] + s["revalidated"]
+        total = served + s["misses"]
+        pct = 100 * served / total if total else 0.0
+        return (
+            f"HTTP cache: {served}/{total} responses from disk ({pct:.0f}%); "
+            f"{s['hits']} fresh, {s['revalidated']} revalidated (304), {s['misses']} misses, "
+            f"{s['evicted']} evicted"
+        )
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the process-wide cache configured from the environment, or None if disabled."""
+    global _cache
+    if os.environ.get("FETCH_NO_CACHE") == "1":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            max_mb = float(os.environ.get("FETCH_CACHE_MAX_MB", MAX_BYTES / 2**20))
+            _cache = ResponseCache(
+                directory=os.environ.get("FETCH_CACHE_DIR", CACHE_DIR),
+                ttl=float(os.environ.get("FETCH_CACHE_TTL", TTL)),
+                max_bytes=int(max_mb * 2**20),
+            )
+        return _cache
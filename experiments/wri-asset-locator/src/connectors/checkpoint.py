@@ -0,0 +1,160 @@
+"""Page-level checkpoints so an interrupted fetch can resume where it stopped.
+
+Each fetcher run gets a directory under `data/.checkpoints/<name>/`. Every page
+is stored as `<key>.raw` (the response body as received) and then
+`<key>.rows.json` (the rows extracted from it); the rows file is written last
+and atomically, so its presence marks the page complete. `manifest.json` holds
+the run's parameters (page size, query, ...) and what page 1 told us (page
+count, total items), so a resumed run skips straight to the missing pages.
+
+A new run discards old checkpoints unless resuming. Resuming is enabled with
+`resume=True` or `FETCH_RESUME=1` (set by `fetch_all.py --resume`); checkpoints
+written with different parameters are discarded rather than mixed in. Outputs
+are written to a `.partial` file and renamed into place only when the run
+finishes (`atomic_output`), after which `finish` appends the raw pages to the
+compressed archive (see `archive.py`) and removes the checkpoints.
+"""
+
+import json
+import os
+import shutil
+from contextlib import contextmanager
+from pathlib import Path
+
+from . import archive
+from .streaming import StreamedPage
+
+CHECKPOINT_DIR = Path(__file__).resolve().parents[2] / "data" / ".checkpoints"
+
+
+def resume_requested():
+    return os.environ.get("FETCH_RESUME") == "1"
+
+
+def _write_atomic(path, write):
+    tmp = path.with_name(f"{path.name}.tmp")
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+@contextmanager
+def atomic_output(path):
+    """Yield a temporary path next to `path`; rename it over `path` only if the block succeeds."""
+    path = Path(path)
+    tmp = path.with_name(f"{path.name}.partial")
+    try:
+        yield tmp
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    os.replace(tmp, path)
+
+
+class Checkpoint:
+    """The saved pages of one fetcher run, keyed by page number or offset."""
+
+    def __init__(self, name, params=None, resume=None, directory=None):
+        self.directory = Path(directory or os.environ.get("FETCH_CHECKPOINT_DIR", CHECKPOINT_DIR))
+        self.directory = self.directory / name
+        self.name = name
+        self.params = params or {}
+        if resume is None:
+            resume = resume_requested()
+
+        manifest = self._read_manifest()
+        self.resumed = resume and manifest is not None and manifest.get("params") == self.params
+        if self.resumed:
+            self.info = manifest.get("info", {})
+            done = len(list(self.directory.glob("*.rows.json")))
+            print(f"[{name}] resuming from checkpoint: {done} pages already complete")
+        else:
+            if resume and manifest is not None:
+                print(f"[{name}] checkpoint was written with different parameters; starting over")
+            self.clear()
+            self.info = {}
+            self._save_manifest()
+
+    def _manifest_path(self):
+        return self.directory / "manifest.json"
+
+    def _read_manifest(self):
+        try:
+            return json.loads(self._manifest_path().read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _save_manifest(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        manifest = json.dumps({"params": self.params, "info": self.info}).encode()
+        _write_atomic(self._manifest_path(), lambda f: f.write(manifest))
+
+    def update(self, **info):
+        """Record run-wide facts (e.g. the page count) for a resumed run to reuse."""
+        self.info.update(info)
+        self._save_manifest()
+
+    def done(self, key):
+        return (self.directory / f"{key}.rows.json").exists()
+
+    def rows(self, key):
+        return json.loads((self.directory / f"{key}.rows.json").read_text())
+
+    def raw(self, key):
+        """The saved response body of page `key`, decoded."""
+        with open(self.directory / f"{key}.raw", "rb") as f:
+            return json.load(f)
+
+    def save(self, key, raw, extract):
+        """Store page `key`'s body, then the rows `extract(raw)` returns; return those rows."""
+
+        def write_raw(f):
+            if isinstance(raw, StreamedPage):
+                raw.body.seek(0)
+                shutil.copyfileobj(raw.body, f)
+            else:
+                f.write(json.dumps(raw).encode())
+
+        _write_atomic(self.directory / f"{key}.raw", write_raw)
+        rows = list(extract(raw))
+        data = json.dumps(rows).encode()
+        _write_atomic(self.directory / f"{key}.rows.json", lambda f: f.write(data))
+        return rows
+
+    def pages(self, keys, fetch_many, extract):
+        """Yield (key, rows) for every key in order.
+
+        Completed pages are read back from disk; the rest are fetched with
+        `fetch_many(pending_keys)`, which must yield raw pages in the order given,
+        and checkpointed as they arrive.
+        """
+        keys = list(keys)
+        pending = [k for k in keys if not self.done(k)]
+        if self.resumed:
+            print(f"[{self.name}] {len(keys) - len(pending)}/{len(keys)} pages from checkpoint")
+        fetched = iter(fetch_many(pending)) if pending else iter(())
+        pending = set(pending)
+        for key in keys:
+            if key in pending:
+                yield key, self.save(key, next(fetched), extract)
+            else:
+                yield key, self.rows(key)
+
+    def _page_keys(self):
+        keys = [p.name.removesuffix(".raw") for p in self.directory.glob("*.raw")]
+        return sorted(keys, key=lambda k: (0, int(k), "") if k.isdigit() else (1, 0, k))
+
+    def finish(self):
+        """Archive this completed run's raw pages, in page order, then remove the checkpoint."""
+        pages = ((k, (self.directory / f"{k}.raw").read_bytes()) for k in self._page_keys())
+        n_pages, raw_bytes, stored = archive.append_run(
+            self.name, pages, params=self.params, info=self.info
+        )
+        print(
+            f"[{self.name}] archived {n_pages} raw pages "
+            f"({raw_bytes / 2**20:.1f} MB -> {stored / 2**20:.1f} MB gzip)"
+        )
+        self.clear()
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,432 @@
+"""CKAN `package_search` connector for the WRI Data Explorer (datasets.wri.org).
+
+Supports a full catalog pull and an incremental sync that only fetches packages
+whose `metadata_modified` is newer than the previous snapshot, then merges them
+into it and drops packages that no longer exist upstream.
+
+Resources (one row per package resource) go to a side table keyed by
+`dataset_id`, written sorted by that key in small Parquet row groups so a reader
+can load one dataset's resources without reading the rest. Pass
+`resources=False` to skip building resource rows altogether. The side table's
+own high-water mark is kept next to it (`resources_since`), so a sync after
+runs that skipped resources still brings it up to date.
+
+Pages are fetched by the shared engine (`paging.crawl`) as declared by the
+`wri_explorer` source in `registry.py`; only the id-only deletion listing pages
+on its own. `write_packages` streams a full pull to those outputs as the pages arrive (the
+resources through an external sort), so its memory doesn't grow with the catalog.
+"""
+
+import json
+import time
+from functools import partial
+from pathlib import Path
+
+import pandas as pd
+
+from .checkpoint import atomic_output
+from .client import get_json
+from .paging import crawl
+from .pool import bounded_map
+from .rowstream import SORT_RUN_ROWS, RowWriter, external_sort
+from .tables import write_parquet
+
+BASE = "https://datasets.wri.org/api/3/action/package_search"
+
+DATASET_FIELDS = [
+    "id",
+    "title",
+    "name",
+    "tags",
+    "createdAt",
+    "updatedAt",
+    "license",
+    "organization",
+    "numResources",
+]
+
+# Typed columns of the datasets Parquet copy (see `tables.py`)
+DATASET_DATETIME_FIELDS = ["createdAt", "updatedAt"]
+DATASET_INT_FIELDS = ["numResources"]
+
+RESOURCE_FIELDS = [
+    "dataset_id",
+    "resource_id",
+    "name",
+    "format",
+    "url",
+    "last_modified",
+    "size",
+]
+RESOURCE_DATETIME_FIELDS = ["last_modified"]
+RESOURCE_INT_FIELDS = ["size"]
+
+# Rows per row group of the resources side table; each group's min/max `dataset_id`
+# lets a filtered read skip the groups that can't hold the ids it wants
+RESOURCE_ROW_GROUP_SIZE = 2000
+
+# Offsets after the first page are fetched concurrently (1 fetches them one at a time);
+# pacing is left to the shared per-host rate limiter
+MAX_WORKERS = 4
+
+# CKAN caps `rows` at 1000; id-only pages are tiny, so use the largest page for listings
+ID_PAGE_SIZE = 1000
+
+
+def check_page(js):
+    """Raise unless `js` is a successful `package_search` response."""
+    if not (js.get("success") and "result" in js):
+        raise ValueError("Unexpected CKAN response")
+
+
+def _timed_page(params, cache=None):
+    t0 = time.perf_counter()
+    js = get_json(BASE, params=params, cache=cache)
+    check_page(js)
+    print(f"  package_search start={params['start']}: {time.perf_counter() - t0:.2f}s")
+    return js["result"]
+
+
+def search_params(q=None, rows=100, fq=None, fl=None):
+    params = {"rows": rows, "start": 0}
+    if q:
+        params["q"] = q
+    if fq:
+        params["fq"] = fq
+    if fl:
+        params["fl"] = fl
+    return params
+
+
+def fetch_offsets(params, offsets, max_workers=MAX_WORKERS, cache=None):
+    """Yield the package_search page at each `start` offset, in the order given."""
+    # results come back in submission order, so pages still arrive by offset
+    yield from bounded_map(
+        lambda start: _timed_page({**params, "start": start}, cache=cache), offsets, max_workers
+    )
+
+
+def fetch_ckan_package_search(
+    q=None, rows=100, fq=None, fl=None, max_workers=MAX_WORKERS, cache=None
+):
+    """Generator yielding CKAN package_search pages, in offset order.
+
+    The first page doubles as the count probe; once `result.count` is known every
+    remaining `start` offset is fetched concurrently on up to `max_workers` threads.
+    `cache=False` skips the shared HTTP cache (see `client.open_body`).
+    """
+    params = search_params(q=q, rows=rows, fq=fq, fl=fl)
+    first = _timed_page(params, cache=cache)
+    yield first
+    offsets = range(rows, first["count"], rows)
+    yield from fetch_offsets(params, offsets, max_workers=max_workers, cache=cache)
+
+
+def to_dataset_row(pkg):
+    tags = sorted({t.get("name", "").strip() for t in (pkg.get("tags") or []) if t.get("name")})
+    org = (pkg.get("organization") or {}).get("title") or (pkg.get("organization") or {}).get(
+        "name"
+    )
+    return {
+        "id": pkg.get("id"),
+        "title": pkg.get("title"),
+        "name": pkg.get("name"),
+        "tags": ", ".join(tags),
+        "createdAt": pkg.get("metadata_created"),
+        "updatedAt": pkg.get("metadata_modified"),
+        "license": pkg.get("license_title") or pkg.get("license_id"),
+        "organization": org,
+        "numResources": len(pkg.get("resources") or []),
+    }
+
+
+def to_resource_rows(pkg):
+    rows = []
+    for res in pkg.get("resources") or []:
+        rows.append(
+            {
+                "dataset_id": pkg.get("id"),
+                "resource_id": res.get("id"),
+                "name": res.get("name") or res.get("description") or "",
+                "format": res.get("format"),
+                "url": res.get("url"),
+                "last_modified": res.get("last_modified") or res.get("revision_timestamp"),
+                "size": res.get("size"),
+            }
+        )
+    return rows
+
+
+def package_rows(page, resources=True):
+    """One `{"dataset": ..., "resources": [...]}` record per package on a package_search page.
+
+    `page` is a whole response, or just its `result` (as archived before the pages
+    were fetched by `paging.crawl`). With `resources=False` the resource lists are left empty.
+    """
+    result = page.get("result", page)
+    return [
+        {"dataset": to_dataset_row(pkg), "resources": to_resource_rows(pkg) if resources else []}
+        for pkg in result.get("results", [])
+    ]
+
+
+def package_pages(
+    source, checkpoint, q=None, rows=100, fq=None, max_workers=MAX_WORKERS, resources=True
+):
+    """Yield `package_rows` for every page of matching packages of a registry `source`.
+
+    Pages come in offset order; each is saved to `checkpoint` as it arrives, and pages
+    it already holds are not fetched again.
+    """
+    params = {key: value for key, value in {"q": q, "fq": fq}.items() if value}
+    pages = crawl(
+        source,
+        checkpoint,
+        page_size=rows,
+        max_workers=max_workers,
+        params=params,
+        extract=partial(package_rows, resources=resources),
+    )
+    for _, records in pages:
+        yield records
+
+
+def fetch_packages(
+    source, checkpoint, q=None, rows=100, fq=None, max_workers=MAX_WORKERS, resources=True
+):
+    """Fetch every matching package; return (dataset_records, resource_records).
+
+    See `package_pages`. With `resources=False`, `resource_records` is empty.
+    """
+    return collect_packages(
+        package_pages(
+            source,
+            checkpoint,
+            q=q,
+            rows=rows,
+            fq=fq,
+            max_workers=max_workers,
+            resources=resources,
+        )
+    )
+
+
+def distinct_packages(pages):
+    """Yield the records of `package_rows` pages, first copy per id."""
+    seen = set()
+    for records in pages:
+        for rec in records:
+            # offsets can shift while the catalog changes mid-crawl; keep the first copy
+            if rec["dataset"]["id"] in seen:
+                continue
+            seen.add(rec["dataset"]["id"])
+            yield rec
+
+
+def collect_packages(pages):
+    """Concatenate `package_rows` pages into (dataset_records, resource_records), first copy per id."""
+    dataset_records = []
+    resource_records = []
+    for rec in distinct_packages(pages):
+        dataset_records.append(rec["dataset"])
+        resource_records.extend(rec["resources"])
+    return dataset_records, resource_records
+
+
+def write_packages(
+    pages, datasets_path, resources_path=None, output_format="both", run_rows=SORT_RUN_ROWS
+):
+    """Stream `package_rows` pages to the datasets outputs and the resources side table.
+
+    Datasets are appended in arrival order as the pages come in (`output_format` as
+    in `tables.py`). Resource rows are sorted by `dataset_id` with an external merge
+    sort (runs of `run_rows`) and written to `resources_path` in
+    `RESOURCE_ROW_GROUP_SIZE` row groups; without `resources_path` they are dropped.
+    Every output replaces the old one only once complete, and the side table's
+    `resources_since` is recorded. Returns (datasets writer, resources writer or
+    None), whose `rows` and `paths` say what was written.
+    """
+    newest = ""  # the high-water mark of the datasets written
+    with RowWriter(
+        datasets_path,
+        DATASET_FIELDS,
+        output_format,
+        datetimes=DATASET_DATETIME_FIELDS,
+        ints=DATASET_INT_FIELDS,
+    ) as datasets:
+
+        def resource_rows():
+            nonlocal newest
+            for rec in distinct_packages(pages):
+                datasets.write(rec["dataset"])
+                newest = max(newest, rec["dataset"]["updatedAt"] or "")
+                yield from rec["resources"]
+
+        if resources_path is None:
+            for _ in resource_rows():
+                pass
+            return datasets, None
+        with RowWriter(
+            Path(resources_path).with_suffix(".csv"),
+            RESOURCE_FIELDS,
+            "parquet",
+            datetimes=RESOURCE_DATETIME_FIELDS,
+            ints=RESOURCE_INT_FIELDS,
+            row_group_size=RESOURCE_ROW_GROUP_SIZE,
+        ) as resources:
+            ordered = external_sort(
+                resource_rows(), key=lambda row: row["dataset_id"] or "", run_rows=run_rows
+            )
+            resources.write_rows(ordered)
+    record_resources_since(resources_path, newest or None)
+    return datasets, resources
+
+
+def modified_since_filter(timestamp):
+    """Solr `fq` matching packages modified at or after `timestamp` (a `metadata_modified` value).
+
+    The range is inclusive and truncated to whole seconds, so the newest package of the
+    previous snapshot is fetched again; the merge makes that harmless.
+    """
+    ts = pd.Timestamp(timestamp)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    return f"metadata_modified:[{ts.strftime('%Y-%m-%dT%H:%M:%SZ')} TO *]"
+
+
+def list_package_ids(q=None):
+    """Ids of every package currently in the catalog, requesting only the `id` field.
+
+    Always from the network: a cached listing would keep deleted packages in the
+    synced snapshot until the cache entry expired.
+    """
+    ids = set()
+    for page in fetch_ckan_package_search(q=q, rows=ID_PAGE_SIZE, fl="id", cache=False):
+        ids.update(pkg["id"] for pkg in page.get("results", []) if pkg.get("id"))
+    return ids
+
+
+def sync_incremental(
+    source,
+    previous,
+    checkpoint,
+    q=None,
+    rows=100,
+    previous_resources=None,
+    resources_since=None,
+    resources=True,
+    max_workers=MAX_WORKERS,
+):
+    """Bring a previous datasets snapshot up to date with a few requests.
+
+    Fetches only packages modified since the newest `updatedAt` in `previous`,
+    replaces or appends them by `id`, and drops ids that an id-only listing no
+    longer returns. `previous_resources` (the old side table, if any) is brought
+    up to date the same way; without it the resources only cover changed packages.
+    `resources_since` is the old side table's own high-water mark (`resources_since()`);
+    when it is older than the datasets' (runs that skipped resources advanced only the
+    datasets), packages are fetched from it instead, so the side table catches up.
+    Returns (datasets_df, resources_df, stats); `resources_df` is None when
+    `resources=False`. The changed-package pages of `source` are saved to `checkpoint`.
+    Raises `ValueError` if `previous` has no `updatedAt` to sync from (no rows, or all null).
+    """
+    since = high_water_mark(previous)
+    if since is None:
+        raise ValueError("previous snapshot has no updatedAt to sync from; do a full pull")
+    if resources and previous_resources is not None and resources_since is not None:
+        since = min(since, resources_since, key=pd.Timestamp)
+    changed, resource_records = fetch_packages(
+        source,
+        checkpoint,
+        q=q,
+        rows=rows,
+        fq=modified_since_filter(since),
+        max_workers=max_workers,
+        resources=resources,
+    )
+    live_ids = list_package_ids(q=q)
+
+    changed_df = pd.DataFrame(changed, columns=DATASET_FIELDS)
+    changed_ids = set(changed_df["id"])
+    kept = previous[~previous["id"].isin(changed_ids) & previous["id"].isin(live_ids)]
+    # updated packages keep their position; new ones are appended
+    merged = pd.concat([kept, changed_df], ignore_index=True)
+    order = {pkg_id: i for i, pkg_id in enumerate(previous["id"])}
+    merged = merged.sort_values(
+        "id", key=lambda ids: ids.map(order).fillna(len(order)), kind="stable"
+    ).reset_index(drop=True)
+
+    previous_ids = set(previous["id"])
+    stats = {
+        "since": since,
+        "changed": len(changed_ids & previous_ids),
+        "added": len(changed_ids - previous_ids),
+        "deleted": len(previous_ids - live_ids - changed_ids),
+    }
+    resources_df = None
+    if resources:
+        resources_df = pd.DataFrame(resource_records, columns=RESOURCE_FIELDS)
+        if previous_resources is not None:
+            kept = previous_resources[
+                previous_resources["dataset_id"].isin(merged["id"])
+                & ~previous_resources["dataset_id"].isin(changed_ids)
+            ]
+            resources_df = pd.concat([kept[RESOURCE_FIELDS], resources_df], ignore_index=True)
+    return merged[DATASET_FIELDS], resources_df, stats
+
+
+def high_water_mark(datasets_df):
+    """The newest `updatedAt` in a datasets table, or None if it has none."""
+    newest = datasets_df["updatedAt"].dropna().max()
+    return None if pd.isna(newest) else newest
+
+
+def write_resources(resources_df, path, since=None):
+    """Write the resources side table to `path` as Parquet, sorted by `dataset_id`; return the path.
+
+    `since` is the high-water mark of the datasets it was built with, recorded next
+    to it (see `resources_since`).
+    """
+    ordered = resources_df.sort_values("dataset_id", kind="stable").reset_index(drop=True)
+    write_parquet(
+        ordered[RESOURCE_FIELDS],
+        path,
+        datetimes=RESOURCE_DATETIME_FIELDS,
+        ints=RESOURCE_INT_FIELDS,
+        row_group_size=RESOURCE_ROW_GROUP_SIZE,
+    )
+    record_resources_since(path, since)
+    return path
+
+
+def resources_stamp(path):
+    """The file next to the side table at `path` that holds its `resources_since`."""
+    return Path(path).with_suffix(".json")
+
+
+def resources_since(path):
+    """The newest dataset `updatedAt` the side table at `path` is current to, or None if unknown.
+
+    Only runs that build resources move it, so after `resources=False` runs it
+    lags the datasets table, and the next sync fetches resources from here.
+    """
+    try:
+        return json.loads(resources_stamp(path).read_text())["since"]
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        return None
+
+
+def record_resources_since(path, since):
+    """Record `since` as the side table's high-water mark; None forgets it (next sync is full)."""
+    stamp = resources_stamp(path)
+    if since is None:
+        stamp.unlink(missing_ok=True)
+        return
+    with atomic_output(stamp) as tmp:
+        Path(tmp).write_text(json.dumps({"since": str(since)}))
+
+
+def read_resources(path, dataset_ids=None):
+    """The resources side table, or only the rows of `dataset_ids`."""
+    filters = None if dataset_ids is None else [("dataset_id", "in", list(dataset_ids))]
+    return pd.read_parquet(path, filters=filters)
@@ -0,0 +1,196 @@
+"""Pooled HTTP session and retry/backoff shared by every catalog connector."""
+
+import io
+import json
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import make_headers
+
+from .cache import CHUNK_SIZE, get_cache
+from .ratelimit import get_limiter
+from .replay import record, replay_url
+from .telemetry import log_request
+
+# Enough keep-alive connections per host for the concurrent page fetchers
+POOL_SIZE = 16
+
+# Streamed bodies stay in memory up to this size before spilling to a temporary file
+SPOOL_SIZE = 1024 * 1024
+
+# Compressed transfer encodings to offer: gzip and deflate always, plus br / zstd when the
+# `brotli` / `zstandard` packages are installed (urllib3 decodes whichever the server picks)
+ACCEPT_ENCODING = make_headers(accept_encoding=True)["accept-encoding"]
+
+# Retry budget for transient failures (connection errors, timeouts, 429s and 5xx).
+# 429s are paced by the rate limiter (honoring Retry-After) rather than by `BACKOFF`.
+RETRIES = 5
+BACKOFF = 1.5
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def make_session(pool_size=POOL_SIZE):
+    """Create a `requests.Session` whose connection pool fits `pool_size` concurrent requests."""
+    s = requests.Session()
+    s.headers["Accept-Encoding"] = ACCEPT_ENCODING
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+
+def get_session():
+    """Return the process-wide session, so every fetcher reuses the same keep-alive pool."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = make_session()
+        return _session
+
+
+def open_body(
+    url,
+    params=None,
+    session=None,
+    retries=RETRIES,
+    backoff=BACKOFF,
+    timeout=60,
+    cache=None,
+    stream=False,
+):
+    """GET `url`, retrying transient failures, and return the body as a binary file object.
+
+    Responses go through the shared on-disk cache (see `cache.py`) unless `cache=False`:
+    fresh entries skip the network and stale ones are revalidated conditionally.
+    Requests that do go out are paced by the shared per-host rate limiter (see
+    `ratelimit.py`), which also absorbs 429s and `Retry-After`.
+    Client errors other than 429 are raised immediately; they won't succeed on retry.
+    Requests are redirected to a local fixture server when `FETCH_REPLAY_URL` is set,
+    and downloaded bodies are recorded when `FETCH_RECORD_DIR` is (see `replay.py`).
+    Every call is traced for the run's telemetry report (see `telemetry.py`).
+
+    With `stream=True` the body is copied to disk in chunks (into the cache, or a
+    spooled temporary file when caching is off) rather than read into memory.
+    """
+    if cache is None:
+        cache = get_cache()
+    trace = {
+        "host": urlparse(url).netloc,
+        "url": url,
+        "status": None,
+        "cache": "miss" if cache else "off",
+        "latency": None,
+        "bytes": 0,
+        "wire_bytes": 0,
+        "retries": 0,
+        "throttle_wait": 0.0,
+        "backoff": 0.0,
+    }
+    try:
+        return _fetch(url, params, session, retries, backoff, timeout, cache, stream, trace)
+    finally:
+        log_request(trace)
+
+
+def _body_size(body):
+    body.seek(0, io.SEEK_END)
+    size = body.tell()
+    body.seek(0)
+    return size
+
+
+def _fetch(url, params, session, retries, backoff, timeout, cache, stream, trace):
+    s = session or get_session()
+    entry = cache.get(url, params) if cache else None
+    if entry and entry.is_fresh(cache.ttl):
+        cache.record("hits")
+        trace.update(status=200, cache="hit")
+        return entry.open()
+    headers = entry.validators() if entry else None
+
+    bucket = get_limiter().bucket(url)
+    if target := replay_url(url, params):
+        request_url, request_params = target, None
+    else:
+        request_url, request_params = url, params
+    for attempt in range(retries):
+        last_attempt = attempt == retries - 1
+        trace["retries"] = attempt
+        trace["throttle_wait"] += bucket.acquire()
+        t0 = time.perf_counter()
+        try:
+            r = s.get(
+                request_url,
+                params=request_params,
+                headers=headers,
+                timeout=timeout,
+                stream=stream,
+            )
+            trace["status"] = r.status_code
+            trace["latency"] = time.perf_counter() - t0
+            bucket.observe(r.status_code, trace["latency"], r.headers.get("Retry-After"))
+            if r.status_code == 429 and not last_attempt:
+                # throttled; the limiter now holds this host back for Retry-After
+                r.close()
+                continue
+            if r.status_code == 304 and entry:
+                r.close()
+                cache.refresh(entry, r)
+                cache.record("revalidated")
+                trace["cache"] = "revalidated"
+                return entry.open()
+            r.raise_for_status()
+            if cache:
+                cache.record("misses")
+                body = cache.put(url, params, r)
+            elif not stream:
+                body = io.BytesIO(r.content)
+            else:
+                # handed to the caller, who closes it; closed here only if the download fails
+                body = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)  # noqa: SIM115
+                try:
+                    for chunk in r.iter_content(CHUNK_SIZE):
+                        body.write(chunk)
+                except BaseException:
+                    body.close()
+                    raise
+            # latency runs until the whole body is stored, so streamed downloads count too
+            trace["latency"] = time.perf_counter() - t0
+            trace["bytes"] = _body_size(body)
+            # what came over the network, before gzip/brotli decoding
+            trace["wire_bytes"] = r.raw.tell() if r.raw is not None else trace["bytes"]
+            return record(url, params, r, body)
+        except requests.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            if last_attempt or (status is not None and status < 500 and status != 429):
+                raise
+        except requests.RequestException:
+            trace["status"] = None
+            trace["latency"] = time.perf_counter() - t0
+            bucket.observe(None, trace["latency"])
+            # transient retry
+            if last_attempt:
+                raise
+        pause = backoff * (attempt + 1)
+        trace["backoff"] += pause
+        time.sleep(pause)
+
+
+def get_json(url, params=None, **kwargs):
+    """GET `url` and return the decoded JSON body (see `open_body` for retries and caching)."""
+    with open_body(url, params=params, **kwargs) as f:
+        return json.load(f)
+
+
+def print_summary():
+    """Print this process's cache and rate-limiter statistics."""
+    if cache := get_cache():
+        print(cache.summary())
+    if limiter_summary := get_limiter().summary():
+        print(limiter_summary)
@@ -0,0 +1,232 @@
+"""Cross-source dataset identity: which catalog rows describe the same dataset.
+
+Resource Watch and GFW are the same API, so a dataset tagged for both comes back
+from both crawls with the same id; the WRI Data Explorer (CKAN) and ArcGIS
+catalogs often list the same underlying dataset under their own ids. Each row
+gets identity keys — its id, its slug and its normalized name (only when the
+name has at least `MIN_NAME_WORDS` words, so short generic names like
+"Population" don't match unrelated datasets) — and rows sharing any key are one
+dataset. A shared name alone is weaker evidence than an id or slug, so it only
+joins two groups that don't contradict each other: never two groups holding rows
+of the same source, nor groups whose slugs, or ids from the same id space (RW
+and GFW share one), all differ.
+
+`IdentityIndex` takes rows source by source as they arrive and groups them.
+The group's canonical row is the one a previous run chose, if it's still
+there, so the row that survives a merge doesn't flip between runs; otherwise
+it's the first row to arrive. That choice is kept in `data/dedup_index.json`
+({identity key: canonical ref}, refs being `<source_collection>:<dataset_id>`).
+
+`apply_groups` then merges each group into its canonical row (empty fields filled
+from the other copies, which are listed in `also_in`) or only flags the copies
+(`duplicate_of`), and `summarize` reports the rows, and embedding time, saved.
+"""
+
+import json
+import os
+import re
+import time
+import unicodedata
+from pathlib import Path
+
+INDEX_PATH = Path(__file__).resolve().parents[2] / "data" / "dedup_index.json"
+
+MIN_NAME_WORDS = 3
+
+# CPU embedding rate quoted in the README (~10 minutes for 650 assets), used to
+# estimate the time saved until the asset locator has recorded a measured rate
+DEFAULT_EMBED_SECONDS_PER_ROW = 600 / 650
+
+
+def _present(value):
+    return value is not None and value == value and str(value).strip() != ""
+
+
+def normalize_name(name):
+    """Lowercase, accent- and punctuation-free `name`; "" if it's too short to identify a dataset."""
+    if not _present(name):
+        return ""
+    text = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode()
+    words = re.sub(r"[^a-z0-9]+", " ", text.lower()).split()
+    return " ".join(words) if len(words) >= MIN_NAME_WORDS else ""
+
+
+def identity_keys(dataset_id=None, slug=None, name=None):
+    """The `id:`, `slug:` and `name:` keys of one row (missing parts are skipped)."""
+    keys = []
+    if _present(dataset_id):
+        keys.append(f"id:{str(dataset_id).strip().lower()}")
+    if _present(slug):
+        keys.append(f"slug:{str(slug).strip().lower()}")
+    if normalized := normalize_name(name):
+        keys.append(f"name:{normalized}")
+    return keys
+
+
+def load_index(path=INDEX_PATH):
+    try:
+        return json.loads(Path(path).read_text())["keys"]
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        return {}
+
+
+def save_index(keys, path=INDEX_PATH):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.tmp")
+    tmp.write_text(json.dumps({"updated_at": time.time(), "keys": keys}, sort_keys=True))
+    os.replace(tmp, path)
+
+
+class IdentityIndex:
+    """Groups rows that share an identity key; `known` is a previous run's {key: canonical ref}.
+
+    `id_spaces` maps a source to the namespace of its ids ({source_collection: space});
+    sources not in it each have their own.
+    """
+
+    def __init__(self, known=None, id_spaces=None):
+        self.known = known or {}
+        self.id_spaces = id_spaces or {}
+        self.parent = {}  # ref -> ref (union-find)
+        self.order = {}  # ref -> arrival position
+        self.owner = {}  # key -> first ref seen with it
+        self.keys = {}  # ref -> its keys
+        self.facts = {}  # group root -> its sources, slug keys and id keys per id space
+
+    def _find(self, ref):
+        while self.parent[ref] != ref:
+            self.parent[ref] = self.parent[self.parent[ref]]
+            ref = self.parent[ref]
+        return ref
+
+    def add(self, ref, keys):
+        """Add one row; return the earlier ref it duplicates, or None."""
+        source = ref.split(":", 1)[0]
+        if ref not in self.parent:
+            self.parent[ref] = ref
+            self.order[ref] = len(self.order)
+            self.keys[ref] = []
+            self.facts[ref] = {"sources": {source}, "slugs": set(), "ids": {}}
+        facts = self.facts[self._find(ref)]
+        for key in keys:
+            if key.startswith("slug:"):
+                facts["slugs"].add(key)
+            elif key.startswith("id:"):
+                facts["ids"].setdefault(self.id_spaces.get(source, source), set()).add(key)
+
+        duplicate_of = None
+        for key in keys:
+            if key not in self.keys[ref]:
+                self.keys[ref].append(key)
+            other = self.owner.setdefault(key, ref)
+            if other == ref:
+                continue
+            a, b = self._find(ref), self._find(other)
+            if a != b:
+                if key.startswith("name:") and self._conflict(a, b):
+                    continue
+                # the earlier arrival stays the root
+                a, b = sorted((a, b), key=self.order.get)
+                self.parent[b] = a
+                self._merge_facts(a, b)
+            duplicate_of = duplicate_of or other
+        return duplicate_of
+
+    def _conflict(self, a, b):
+        """Whether groups `a` and `b` can't be one dataset whatever their names say."""
+        fa, fb = self.facts[a], self.facts[b]
+        if fa["sources"] & fb["sources"]:
+            return True
+        if fa["slugs"] and fb["slugs"] and not fa["slugs"] & fb["slugs"]:
+            return True
+        return any(not fa["ids"][s] & fb["ids"][s] for s in fa["ids"].keys() & fb["ids"].keys())
+
+    def _merge_facts(self, root, other):
+        facts, merged = self.facts[root], self.facts.pop(other)
+        facts["sources"] |= merged["sources"]
+        facts["slugs"] |= merged["slugs"]
+        for space, ids in merged["ids"].items():
+            facts["ids"].setdefault(space, set()).update(ids)
+
+    def groups(self):
+        """{canonical ref: [every ref in the group, canonical first, then in arrival order]}."""
+        members = {}
+        for ref in self.order:
+            members.setdefault(self._find(ref), []).append(ref)
+        groups = {}
+        for refs in members.values():
+            canonical = self._previous_canonical(refs) or refs[0]
+            groups[canonical] = [canonical, *(r for r in refs if r != canonical)]
+        return groups
+
+    def _previous_canonical(self, refs):
+        present = set(refs)
+        for ref in refs:
+            for key in self.keys[ref]:
+                if self.known.get(key) in present:
+                    return self.known[key]
+        return None
+
+    def key_map(self):
+        """{key: canonical ref} for every key seen, to save for the next run."""
+        canonical_of = {ref: canonical for canonical, refs in self.groups().items() for ref in refs}
+        return {key: canonical_of[ref] for key, ref in self.owner.items()}
+
+
+def embed_seconds_per_row(path):
+    """Measured embedding seconds per row recorded by the asset locator, else the README estimate.
+
+    Returns (seconds per row, whether it was measured).
+    """
+    try:
+        data = json.loads(Path(path).read_text())
+        return data["seconds"] / data["rows"], True
+    except (FileNotFoundError, json.JSONDecodeError, KeyError, ZeroDivisionError):
+        return DEFAULT_EMBED_SECONDS_PER_ROW, False
+
+
+def apply_groups(df, refs, groups, mode="flag"):
+    """Merge (or, with mode="flag", only mark) the duplicate rows of `df`.
+
+    `refs` holds each row's ref, aligned with `df`. Merged rows keep the canonical
+    row's position and values, fill its empty fields from the other copies in
+    arrival order, and list those copies in `also_in`.
+    """
+    canonical_of = {ref: canonical for canonical, members in groups.items() for ref in members}
+    canonical = refs.map(canonical_of)
+    if mode == "flag":
+        return df.assign(duplicate_of=canonical.where(canonical != refs, "").values)
+
+    position = refs.map({ref: i for members in groups.values() for i, ref in enumerate(members)})
+    first = (position == 0).values
+    canonical_rows = df[first].set_axis(refs[first].values)
+    # the other copies in arrival order; their first non-empty value fills each gap
+    copies = (
+        df[~first].set_axis(canonical[~first].values).iloc[position[~first].argsort(kind="stable")]
+    )
+    fill = copies.mask(copies.eq("")).groupby(level=0, sort=False).first()
+    empty = canonical_rows.isna() | canonical_rows.eq("")
+    merged = canonical_rows.mask(empty, fill.reindex(canonical_rows.index))
+    merged = merged.mask(merged.isna() & canonical_rows.eq(""), "")
+    merged["also_in"] = ["; ".join(groups[ref][1:]) for ref in merged.index]
+    return merged.reset_index(drop=True)
+
+
+def summarize(refs, groups, seconds_per_row=DEFAULT_EMBED_SECONDS_PER_ROW):
+    """Rows, datasets and duplicates overall and per source; embedding seconds the duplicates cost."""
+    canonical_of = {ref: canonical for canonical, members in groups.items() for ref in members}
+    by_source = {}
+    for ref in refs:
+        source = ref.split(":", 1)[0]
+        counts = by_source.setdefault(source, {"rows": 0, "duplicates": 0})
+        counts["rows"] += 1
+        counts["duplicates"] += canonical_of[ref] != ref
+    duplicates = sum(counts["duplicates"] for counts in by_source.values())
+    return {
+        "rows": len(refs),
+        "datasets": len(groups),
+        "duplicates": duplicates,
+        "by_source": by_source,
+        "embed_seconds_saved": duplicates * seconds_per_row,
+    }
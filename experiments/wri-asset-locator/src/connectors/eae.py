@@ -0,0 +1,348 @@
+"""Energy Access Explorer catalog, extracted from the "Data and Methods" report PDF.
+
+Figure 1 of the report groups the EAE input datasets by category (Demographics
+and Social & Productive Uses on the demand side, Resources and Infrastructure on
+the supply side); Table 1 lists them with their units and the indices each one
+feeds (EAP, Demand, Supply, Need for Assistance). `extract_catalog` reads a
+local copy of the PDF with `pdfplumber`, page by page on a process pool, finds
+both, and turns them into rows of the EAE catalog schema (`FIELDS`).
+
+Extractions are cached in `data/.pdf_cache/` under the PDF's SHA-256 (and
+`PARSER_VERSION`), so re-running against an unchanged document doesn't parse it
+again, and a new version of the report is parsed as soon as `download` has
+fetched it.
+
+`pdfplumber` is optional (see `extraction_available`); without it
+`extract_catalog` raises ImportError.
+"""
+
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import requests
+
+from .checkpoint import atomic_output
+from .client import RETRIES, open_body
+from .freshness import file_digest
+
+try:
+    import pdfplumber
+except ImportError:  # optional dependency
+    pdfplumber = None
+
+PDF_URL = "https://files.wri.org/d8/s3fs-public/energy-access-explorer-data-and-methods.pdf"
+
+DATA_DIR = Path(__file__).resolve().parents[2] / "data"
+PDF_PATH = DATA_DIR / "energy-access-explorer-data-and-methods.pdf"
+CACHE_DIR = DATA_DIR / ".pdf_cache"
+
+# Bump when the parsing below changes, so cached extractions are redone
+PARSER_VERSION = 1
+
+MAX_WORKERS = min(os.cpu_count() or 1, 8)
+
+# share of the hand-written datasets an extraction must find to replace them
+MIN_OVERLAP = 0.8
+
+FIELDS = [
+    "id",
+    "name",
+    "category",
+    "group",
+    "unit",
+    "usedIn_EAP",
+    "usedIn_Demand",
+    "usedIn_Supply",
+    "usedIn_NeedAssist",
+    "provider",
+    "tags",
+    "layerCount",
+    "layerNames",
+    "createdAt",
+    "dataLastUpdated",
+    "updatedAt",
+    "description",
+]
+FLAG_FIELDS = ["usedIn_EAP", "usedIn_Demand", "usedIn_Supply", "usedIn_NeedAssist"]
+
+# Figure 1's categories, keyed by their normalized heading, and the side each is on
+CATEGORIES = {
+    "demographics": "Demographics",
+    "social and productive uses": "Social & Productive Uses",
+    "resources": "Resources",
+    "infrastructure": "Infrastructure",
+}
+CATEGORY_GROUPS = {
+    "Demographics": "Demand",
+    "Social & Productive Uses": "Demand",
+    "Resources": "Supply",
+    "Infrastructure": "Supply",
+}
+
+# Table 1 header cells, matched by keyword; the first field whose keywords match wins
+HEADER_KEYWORDS = [
+    ("unit", ("unit",)),
+    ("category", ("categor", "theme")),
+    ("usedIn_NeedAssist", ("need", "assistance")),
+    ("usedIn_EAP", ("eap", "potential")),
+    ("usedIn_Demand", ("demand",)),
+    ("usedIn_Supply", ("supply",)),
+    ("name", ("dataset", "data set", "indicator", "input", "name", "layer")),
+]
+# cells that leave an index column unticked
+UNMARKED = {"", "no", "n/a", "-", "–", "—", "0", "✗"}
+
+TABLE_1 = re.compile(r"\bTable\s+1\b")
+FIGURE_1 = re.compile(r"\bFigure\s+1\b")
+# where Figure 1's text ends: a source/note line or the next caption
+FIGURE_END = re.compile(r"^(Source|Sources|Note|Notes|Figure\s+\d|Table\s+\d)\b")
+
+
+def extraction_available():
+    return pdfplumber is not None
+
+
+def slugify(s):
+    """Slugify a name into an id."""
+    s = s.strip().lower()
+    s = re.sub(r"[^a-z0-9\s\-_/]", "", s)
+    s = s.replace("/", " ")
+    s = re.sub(r"\s+", "-", s)
+    s = re.sub(r"-+", "-", s)
+    return s
+
+
+def _clean(cell):
+    return re.sub(r"\s+", " ", cell or "").strip()
+
+
+def _key(text):
+    """Normalized text for matching names and headings."""
+    return re.sub(r"[^a-z0-9]+", " ", text.lower().replace("&", " and ")).strip()
+
+
+def download(url=PDF_URL, path=PDF_PATH):
+    """Keep the local copy of the report current; return its path, or None if there's none.
+
+    Goes through the shared HTTP cache, so a fresh copy isn't requested again and
+    a stale one is revalidated. Without network access an existing copy is used.
+    """
+    path = Path(path)
+    try:
+        # with a local copy to fall back on, don't sit through the full retry backoff
+        retries = 2 if path.exists() else RETRIES
+        with open_body(url, retries=retries, stream=True) as body:
+            data = body.read()
+    except requests.RequestException as e:
+        print(f"Couldn't download {path.name} ({type(e).__name__})")
+        return path if path.exists() else None
+    if not path.exists() or path.read_bytes() != data:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_output(path) as tmp:
+            Path(tmp).write_bytes(data)
+        print(f"Downloaded {path.name} ({len(data) / 2**20:.1f} MB)")
+    return path
+
+
+def _read_pages(path, page_numbers):
+    """Text and tables of some pages (runs in a worker process)."""
+    pages = []
+    with pdfplumber.open(path) as pdf:
+        for n in page_numbers:
+            page = pdf.pages[n]
+            # ruled tables first; fall back to column alignment for tables without rules
+            tables = page.extract_tables() or page.extract_tables(
+                {"vertical_strategy": "text", "horizontal_strategy": "text"}
+            )
+            pages.append({"page": n + 1, "text": page.extract_text() or "", "tables": tables})
+    return pages
+
+
+def read_pages(path, max_workers=MAX_WORKERS):
+    """[{"page", "text", "tables"}] for every page, read in contiguous chunks on a process pool."""
+    if pdfplumber is None:
+        raise ImportError(
+            "Reading the EAE report needs `pdfplumber`; add it to the script dependencies."
+        )
+    with pdfplumber.open(path) as pdf:
+        n_pages = len(pdf.pages)
+    size = -(-n_pages // max(1, min(max_workers, n_pages)))
+    chunks = [list(range(i, min(i + size, n_pages))) for i in range(0, n_pages, size)]
+    if len(chunks) == 1:
+        return _read_pages(path, chunks[0])
+    with ProcessPoolExecutor(max_workers=len(chunks)) as pool:
+        results = pool.map(_read_pages, [str(path)] * len(chunks), chunks)
+        pages = [page for chunk in results for page in chunk]
+    return sorted(pages, key=lambda p: p["page"])
+
+
+def figure_rows(pages):
+    """(name, category) pairs listed under Figure 1's category headings."""
+    rows = []
+    for page in pages:
+        lines = [_clean(line) for line in page["text"].splitlines()]
+        start = next((i for i, line in enumerate(lines) if FIGURE_1.search(line)), None)
+        if start is None:
+            continue
+        category = None
+        for line in lines[start + 1 :]:
+            if FIGURE_END.match(line) and category:
+                break
+            if _key(line) in CATEGORIES:
+                category = CATEGORIES[_key(line)]
+            elif _key(line) in ("demand", "supply") or not line:
+                continue
+            elif category and len(line.split()) <= 8 and not line.endswith("."):
+                rows.append((line, category))
+            elif category:
+                # back in running text
+                break
+        if rows:
+            return rows
+    return rows
+
+
+def _header(row):
+    """{field: column} for a Table 1 header row, or None if `row` isn't one."""
+    columns = {}
+    for i, cell in enumerate(row):
+        cell = _clean(cell).lower()
+        for field, words in HEADER_KEYWORDS:
+            if cell and any(w in cell for w in words):
+                columns.setdefault(field, i)
+                break
+    flags = [f for f in FLAG_FIELDS if f in columns]
+    return columns if "name" in columns and (flags or "unit" in columns) else None
+
+
+def table_rows(pages):
+    """Table 1 rows as dicts (name, category, unit, flags), across continuation pages."""
+    rows = []
+    columns = None
+    width = None
+    category = None
+    started = False
+    for page in pages:
+        started = started or bool(TABLE_1.search(page["text"]))
+        if not started:
+            continue
+        if rows and not page["tables"]:
+            break
+        for table in page["tables"]:
+            for raw in table:
+                if header := _header(raw):
+                    columns, width = header, len(raw)
+                    continue
+                if columns is None:
+                    continue
+                if len(raw) != width:
+                    # another table (or running text parsed as one): Table 1 is over
+                    return rows
+                cells = [_clean(c) for c in raw]
+                filled = [c for c in cells if c]
+                if len(filled) == 1 and _key(filled[0]) in CATEGORIES:
+                    # a section row spanning the table
+                    category = CATEGORIES[_key(filled[0])]
+                    continue
+                if "category" in columns and cells[columns["category"]]:
+                    # merged category cells are only filled on their first row
+                    text = cells[columns["category"]]
+                    category = CATEGORIES.get(_key(text), text)
+                name = cells[columns["name"]]
+                if not name:
+                    continue
+                row = {"name": name, "category": category}
+                if "unit" in columns:
+                    row["unit"] = cells[columns["unit"]]
+                for field in FLAG_FIELDS:
+                    if field in columns:
+                        row[field] = cells[columns[field]].lower() not in UNMARKED
+                rows.append(row)
+    return rows
+
+
+def catalog_rows(pages):
+    """Rows in the `FIELDS` schema: Table 1's, plus Figure 1 datasets it doesn't list."""
+    figure = figure_rows(pages)
+    figure_category = {_key(name): category for name, category in figure}
+    records = []
+    seen = set()
+    for row in table_rows(pages):
+        key = _key(row["name"])
+        category = row["category"] or figure_category.get(key) or ""
+        records.append({**row, "category": category})
+        seen.add(key)
+    for name, category in figure:
+        if _key(name) not in seen:
+            # shown in Figure 1 as an input to the Energy Access Potential index
+            records.append({"name": name, "category": category, "usedIn_EAP": True})
+            seen.add(_key(name))
+
+    rows = []
+    for rec in records:
+        group = CATEGORY_GROUPS.get(rec["category"])
+        row = {field: "" for field in FIELDS}
+        row.update(
+            {
+                "id": slugify(rec["name"] if group is None else f"{group}-{rec['name']}"),
+                "name": rec["name"],
+                "category": rec["category"],
+                "group": group or "",
+                "unit": rec.get("unit", ""),
+            }
+        )
+        row.update({field: rec[field] for field in FLAG_FIELDS if field in rec})
+        rows.append(row)
+    return rows
+
+
+def extract_catalog(path=PDF_PATH, max_workers=MAX_WORKERS, cache_dir=CACHE_DIR):
+    """Catalog rows extracted from the report at `path`; return (rows, whether cached).
+
+    Cached by content hash, so a renamed or re-downloaded but unchanged file hits.
+    """
+    digest = file_digest(path)
+    cache_path = Path(cache_dir) / f"eae-{digest}-v{PARSER_VERSION}.json"
+    if cache_path.exists():
+        return json.loads(cache_path.read_text())["rows"], True
+    pages = read_pages(path, max_workers=max_workers)
+    rows = catalog_rows(pages)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    with atomic_output(cache_path) as tmp:
+        Path(tmp).write_text(
+            json.dumps({"pdf": Path(path).name, "pages": len(pages), "rows": rows})
+        )
+    return rows, False
+
+
+def annotate(extracted, curated):
+    """Fill empty `tags`/`description` of extracted rows from the curated ones, by name.
+
+    Both are DataFrames in the `FIELDS` schema; returns the annotated copy and the
+    names only found in one of them, as (annotated, missing from PDF, new in PDF).
+    """
+    notes = {
+        _key(name): row
+        for name, row in zip(curated["name"], curated.to_dict("records"), strict=True)
+    }
+    annotated = extracted.copy()
+    for col in ("tags", "description", "provider"):
+        annotated[col] = [
+            value or notes.get(_key(name), {}).get(col, "")
+            for name, value in zip(annotated["name"], annotated[col], strict=True)
+        ]
+    extracted_keys = {_key(n) for n in extracted["name"]}
+    missing = [n for n in curated["name"] if _key(n) not in extracted_keys]
+    new = [n for n in extracted["name"] if _key(n) not in notes]
+    return annotated, missing, new
+
+
+def overlap(extracted, curated):
+    """Share of the `curated` dataset names (a DataFrame) also in `extracted`, 0 to 1."""
+    if not len(curated):
+        return 1.0
+    extracted_keys = {_key(n) for n in extracted["name"]}
+    return sum(_key(n) in extracted_keys for n in curated["name"]) / len(curated)
@@ -0,0 +1,82 @@
+"""Application facet index for the Resource Watch catalog.
+
+Every Resource Watch dataset lists the applications it belongs to (`rw`, `gfw`,
+`aqueduct`, ...). The RW and GFW fetchers already download those lists, so each
+crawl records them here instead of anyone crawling the whole catalog again to
+find out which applications exist.
+
+The index lives in `data/rw_application_index/`, one `<crawl>.json` slice per
+crawled application: `{dataset id: {"applications": [...], "updatedAt": ...}}`.
+A crawl only rewrites its own slice, so fetchers running in parallel never touch
+the same file, and a dataset drops out once no crawl returns it any more.
+Lookups merge the slices. Applications that share no dataset with a crawled
+application are not visible; the GFW notebook's gut check crawls the whole
+catalog instead with `FETCH_RW_FULL_CATALOG=1`.
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+
+FACET_DIR = Path(__file__).resolve().parents[2] / "data" / "rw_application_index"
+
+
+def _slice_path(directory, crawl):
+    return Path(directory) / f"{crawl}.json"
+
+
+def read_slice(crawl, directory=FACET_DIR):
+    try:
+        return json.loads(_slice_path(directory, crawl).read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def write_slice(crawl, datasets, directory=FACET_DIR):
+    """Replace the slice for `crawl` with `datasets` ({id: {"applications", "updatedAt"}}).
+
+    Returns how the slice changed: datasets added, removed and updated
+    (a new `updatedAt` or application list).
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    old = (read_slice(crawl, directory) or {}).get("datasets", {})
+    stats = {
+        "datasets": len(datasets),
+        "added": len(datasets.keys() - old.keys()),
+        "removed": len(old.keys() - datasets.keys()),
+        "updated": sum(1 for k in datasets.keys() & old.keys() if datasets[k] != old[k]),
+    }
+    payload = {"crawl": crawl, "crawled_at": time.time(), "datasets": datasets}
+    path = _slice_path(directory, crawl)
+    tmp = path.with_name(f"{path.name}.tmp")
+    tmp.write_text(json.dumps(payload, sort_keys=True))
+    os.replace(tmp, path)
+    return stats
+
+
+def load_index(directory=FACET_DIR):
+    """Merge every slice into {dataset id: sorted applications}; also return the crawls used."""
+    index = {}
+    crawls = {}
+    for path in sorted(Path(directory).glob("*.json")):
+        data = json.loads(path.read_text())
+        crawls[data["crawl"]] = data["crawled_at"]
+        for dataset_id, entry in data["datasets"].items():
+            index.setdefault(dataset_id, set()).update(entry["applications"])
+    return {k: sorted(v) for k, v in index.items()}, crawls
+
+
+def application_counts(index):
+    """{application: number of datasets}, most common first."""
+    counts = {}
+    for applications in index.values():
+        for app in applications:
+            counts[app] = counts.get(app, 0) + 1
+    return dict(sorted(counts.items(), key=lambda kv: (-kv[1], kv[0])))
+
+
+def dataset_ids(index, application):
+    """Ids of the indexed datasets tagged with `application`."""
+    return sorted(k for k, applications in index.items() if application in applications)
@@ -0,0 +1,109 @@
+"""Build records of the fetch pipeline's stages, for make-style skipping.
+
+After a stage succeeds, `fetch_all.py` records what it was built from: the
+SHA-256 of every input file (upstream outputs, plus files a source declares,
+like the EAE report PDF), of its code (the stage's notebook, the `fetch_all.py`
+and `fetch_cli.py` runners and the `connectors` package) and of the settings
+that change its output, the hashes of the outputs it wrote, and when. A later run with `--skip-fresh` then skips the
+stage when nothing it depends on changed (`stale_reason` returns None):
+
+* its code, settings or inputs hash the same as when it was built,
+* its outputs still exist with the hashes it wrote,
+* and it is younger than its TTL. Fetchers read the network, which has no hash,
+  so their outputs expire after their source's `ttl` (see `registry.py`); the
+  combine step has no TTL and only reruns when an input changed.
+
+Records live in `data/.build_state.json` ({stage: record}).
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+STATE_PATH = Path(__file__).resolve().parents[2] / "data" / ".build_state.json"
+
+CONNECTORS_DIR = Path(__file__).resolve().parent
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def digests(paths):
+    """{file name: SHA-256} of the files that exist among `paths`."""
+    return {Path(p).name: file_digest(p) for p in paths if Path(p).exists()}
+
+
+def code_digest(paths):
+    """One SHA-256 over `paths` and every module of the `connectors` package."""
+    h = hashlib.sha256()
+    for path in [*map(Path, paths), *sorted(CONNECTORS_DIR.glob("*.py"))]:
+        h.update(path.name.encode())
+        h.update(path.read_bytes())
+    return h.hexdigest()
+
+
+def settings(names):
+    """The current values of the environment variables `names` ({} for unset ones)."""
+    return {name: os.environ[name] for name in names if name in os.environ}
+
+
+def load_state(path=STATE_PATH):
+    try:
+        return json.loads(Path(path).read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_state(state, path=STATE_PATH):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.tmp")
+    tmp.write_text(json.dumps(state, indent=1, sort_keys=True))
+    os.replace(tmp, path)
+
+
+def make_record(inputs, code, env, outputs):
+    """A stage's record, built from `inputs` ({name: hash}) and having written `outputs` (paths)."""
+    return {
+        "inputs": inputs,
+        "code": code,
+        "settings": env,
+        "outputs": digests(outputs),
+        "built_at": time.time(),
+    }
+
+
+def format_age(seconds):
+    if seconds < 3600:
+        return f"{seconds / 60:.0f}m"
+    return f"{seconds / 3600:.1f}h"
+
+
+def stale_reason(record, inputs, code, env, outputs, ttl=None, now=None):
+    """Why a stage must be rebuilt, or None when `record` is still fresh.
+
+    `inputs` are the hashes of what it would read now, `outputs` the paths it
+    writes; `ttl` (seconds) bounds the age of a fresh record, None for no limit.
+    """
+    if not record:
+        return "no build record"
+    if record["code"] != code:
+        return "code changed"
+    if record["settings"] != env:
+        return "settings changed"
+    if record["inputs"] != inputs:
+        changed = sorted(set(record["inputs"].items()) ^ set(inputs.items()))
+        return f"inputs changed ({', '.join(sorted({name for name, _ in changed}))})"
+    if digests(outputs) != record["outputs"] or len(record["outputs"]) != len(outputs):
+        return "outputs missing or changed since the last build"
+    age = (now or time.time()) - record["built_at"]
+    if ttl is not None and age > ttl:
+        return f"built {format_age(age)} ago, TTL {format_age(ttl)}"
+    return None
@@ -0,0 +1,165 @@
+"""The paging engine every JSON catalog source is crawled with.
+
+`crawl` pages through a `registry.Source`'s `endpoint` in one of four styles:
+
+* `page`: `cursor_param` is a page number from `first` (1), `size_param` the page size
+* `offset`: `cursor_param` is an item offset from `first` (0 or 1)
+* `next`: each page names the next one's URL (`next`), followed one at a time
+* `static`: a single response
+
+For `page` and `offset`, when page 1 reports the total (`total`), every other
+page is known up front and fetched concurrently; otherwise pages are requested
+until a short one. A source that also declares `next` has its links followed
+instead when they don't carry `cursor_param` (opaque cursors) or there is no
+total. Page requests go through the shared session, HTTP cache and per-host
+rate limiter, and run on the process-wide bounded pool (`pool.py`). Every page
+is checkpointed, so an interrupted crawl resumes and a finished one is archived.
+
+Connectors whose rows need more than `normalize` pass their own `extract` (CKAN
+turns a page into dataset and resource records) and extra request `params`
+(Resource Watch's `application`, CKAN's `fq`).
+"""
+
+from functools import partial
+from urllib.parse import parse_qs, urlparse
+
+from .client import get_json, get_session
+from .pool import bounded_map
+from .streaming import StreamedPage, stream_page
+
+PAGING_STYLES = ("page", "offset", "next", "static")
+
+
+def _lookup(spec, page):
+    if callable(spec):
+        return spec(page)
+    if isinstance(page, StreamedPage):
+        return page.value(spec)
+    value = page
+    for part in spec.split(".") if spec else ():
+        value = (value or {}).get(part)
+    return value
+
+
+def page_rows(source, page):
+    """Normalized rows of one raw page: decoded JSON, or a `StreamedPage` parsed item by item."""
+    if isinstance(page, StreamedPage):
+        with page:
+            return [source.normalize(item) for item in page.items(f"{source.items}.item")]
+    items = _lookup(source.items, page) if source.items else page
+    if isinstance(items, dict):
+        items = [items]
+    return [source.normalize(item) for item in items or []]
+
+
+def _params(source, params, page_size, cursor=None):
+    params = dict(params)
+    if source.cursor_param and cursor is not None:
+        params[source.cursor_param] = cursor
+    if source.size_param:
+        params[source.size_param] = page_size
+    return params
+
+
+def _follows_links(source, page, total):
+    """True if the pages after `page` are reached through `next` links, not computed cursors."""
+    if not source.next:
+        return False
+    if total is None:
+        return True
+    href = _lookup(source.next, page)
+    # a single page needs no cursors; otherwise `next` must itself carry one
+    return bool(href) and source.cursor_param not in parse_qs(urlparse(href).query)
+
+
+def _follow_links(source, checkpoint, key, get, extract):
+    """Yield (key, rows) from page `key` on, following each saved page's `next` link."""
+    yield key, checkpoint.rows(key)
+    while href := _lookup(source.next, checkpoint.raw(key)):
+        key += 1
+        if not checkpoint.done(key):
+            # the next link is a full URL
+            checkpoint.save(key, get(href), extract)
+        yield key, checkpoint.rows(key)
+
+
+def crawl(
+    source,
+    checkpoint,
+    page_size=None,
+    max_workers=None,
+    session=None,
+    params=None,
+    extract=None,
+    stream=False,
+):
+    """Yield (key, rows) for every page of `source`, in order, checkpointing each page.
+
+    Keys are page numbers or offsets (positions when following links). Pages already
+    in `checkpoint` (from an interrupted run being resumed) are read back from disk.
+    `params` are added to the source's own, `extract` (raw page -> rows) replaces
+    `page_rows`, and `stream=True` fetches `StreamedPage`s (needs `ijson`).
+    """
+    page_size = page_size or source.page_size
+    max_workers = max_workers or source.max_workers
+    s = session or get_session()
+    extract = extract or partial(page_rows, source)
+    base = {**source.params, **(params or {})}
+
+    def get(url, query=None):
+        if stream:
+            page = stream_page(url, params=query, session=s)
+        else:
+            page = get_json(url, params=query, session=s)
+        if source.check:
+            source.check(page)
+        return page
+
+    if source.paging in ("static", "next"):
+        if not checkpoint.done(1):
+            query = base if source.paging == "static" else _params(source, base, page_size)
+            checkpoint.save(1, get(source.endpoint, query), extract)
+        if source.paging == "static":
+            yield 1, checkpoint.rows(1)
+        else:
+            yield from _follow_links(source, checkpoint, 1, get, extract)
+        return
+
+    step = 1 if source.paging == "page" else page_size
+    first = source.first
+
+    def fetch(cursor):
+        return get(source.endpoint, _params(source, base, page_size, cursor))
+
+    if "total" not in checkpoint.info:
+        page = fetch(first)
+        total = _lookup(source.total, page) if source.total else None
+        total = total if isinstance(total, int) else None
+        checkpoint.update(total=total, follow=_follows_links(source, page, total))
+        checkpoint.save(first, page, extract)
+
+    total = checkpoint.info["total"]
+    if checkpoint.info["follow"]:
+        print(f"[{checkpoint.name}] no {source.cursor_param} paging; following next links")
+        yield from _follow_links(source, checkpoint, first, get, extract)
+        return
+
+    if total is not None:
+        n_pages = max(1, -(-total // page_size))
+        print(f"[{checkpoint.name}] API reports {total} items across {n_pages} pages")
+        keys = range(first, first + n_pages * step, step)
+        yield from checkpoint.pages(
+            keys, lambda pending: bounded_map(fetch, pending, max_workers), extract
+        )
+        return
+
+    # no total: one page at a time until a short one
+    key = first
+    while True:
+        if not checkpoint.done(key):
+            checkpoint.save(key, fetch(key), extract)
+        rows = checkpoint.rows(key)
+        yield key, rows
+        if len(rows) < page_size:
+            return
+        key += step
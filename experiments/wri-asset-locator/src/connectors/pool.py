@@ -0,0 +1,63 @@
+"""One bounded thread pool shared by every connector's concurrent requests.
+
+Each crawl still caps its own concurrency (`max_workers`), but the pages are run
+on the process-wide pool from `get_pool`, so sources fetched side by side in
+one process (`fetch_all.py --in-process`) never have more than `POOL_WORKERS`
+requests in flight between them. That matches the session's keep-alive pool
+(`client.POOL_SIZE`); set `FETCH_POOL_WORKERS` to change it.
+
+Work on the pool must not wait on other work on the pool (a stage that submits
+its pages and blocks on them would deadlock a full pool), so only leaf tasks
+such as single page requests go through `bounded_map`.
+"""
+
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .client import POOL_SIZE
+
+POOL_WORKERS = int(os.environ.get("FETCH_POOL_WORKERS", POOL_SIZE))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide executor, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=POOL_WORKERS, thread_name_prefix="fetch")
+        return _pool
+
+
+def bounded_map(fn, items, max_workers):
+    """Yield `fn(item)` for each item, in order, with at most `max_workers` on the shared pool.
+
+    With `max_workers <= 1` the calls run one at a time in the calling thread.
+    Calls not yet started when the consumer stops iterating are cancelled.
+    """
+    if max_workers <= 1:
+        yield from map(fn, items)
+        return
+
+    pool = get_pool()
+    items = iter(items)
+    running = deque()
+    try:
+        for item in items:
+            running.append(pool.submit(fn, item))
+            if len(running) >= max_workers:
+                break
+        while running:
+            result = running.popleft().result()
+            # keep the window full before handing the result on
+            for item in items:
+                running.append(pool.submit(fn, item))
+                break
+            yield result
+    finally:
+        for future in running:
+            future.cancel()
@@ -0,0 +1,232 @@
+"""Adaptive per-host token-bucket rate limiter shared by the catalog connectors.
+
+Every request waits for a token from its host's bucket. The refill rate adapts
+to how the server responds (additive increase, multiplicative decrease):
+
+* fast successful responses raise the rate by `RATE_STEP` up to `MAX_RATE`
+* slow responses and 5xx errors lower it a little
+* a 429 halves it and pauses the host for the `Retry-After` period (or
+  `THROTTLE_PAUSE` when the header is missing)
+
+One limiter is shared by every fetcher running in the same process, so the
+in-process `fetch_all.py` mode paces all fetchers hitting a host together.
+Separate processes (`fetch_all.py`'s default, one per stage) each have their
+own limiter, so N of them running at once may together send N times a host's
+rate. What they learn still carries over: with `FETCH_RATE_STATE` pointing at
+a JSON file (`fetch_all.py` uses `data/telemetry/rate_limits.json`), each
+host's bucket starts from the rate and any 429 pause recorded there in the last
+`STATE_MAX_AGE` seconds, and the hosts a process used are written back when it
+exits, so a stage that starts after another was throttled starts slow.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from urllib.parse import urlparse
+
+INITIAL_RATE = 4.0  # requests/sec
+MIN_RATE = 0.5
+MAX_RATE = 40.0
+RATE_STEP = 0.5
+BURST = 4
+
+FAST_LATENCY = 1.0  # seconds
+SLOW_LATENCY = 5.0
+THROTTLE_PAUSE = 2.0
+
+# recorded host state older than this is ignored (seconds)
+STATE_MAX_AGE = 3600.0
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a `Retry-After` header (delta-seconds or HTTP-date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Token bucket for one host whose refill rate adapts to the server's responses."""
+
+    def __init__(self, rate=INITIAL_RATE, burst=BURST, min_rate=MIN_RATE, max_rate=MAX_RATE):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.stats = {"requests": 0, "throttled": 0, "waited": 0.0, "first": None, "last": None}
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def acquire(self):
+        """Block until a request may be sent; return the seconds spent waiting."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            # tokens may go negative: each caller reserves its slot and waits out the deficit
+            self.tokens -= 1
+            start = max(now, self.paused_until)
+            wait = (start - now) + max(0.0, -self.tokens) / self.rate
+            self.stats["waited"] += wait
+            if self.stats["first"] is None:
+                self.stats["first"] = now + wait
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def observe(self, status, latency, retry_after=None):
+        """Adapt the rate to one response (`status` None for a connection error)."""
+        with self._lock:
+            now = time.monotonic()
+            self.stats["requests"] += 1
+            self.stats["last"] = now
+            if status == 429:
+                self.stats["throttled"] += 1
+                self.rate = max(self.min_rate, self.rate / 2)
+                pause = parse_retry_after(retry_after)
+                self.paused_until = max(self.paused_until, now + (pause or THROTTLE_PAUSE))
+                # no refill while paused, so waiting callers don't burst when it ends
+                self.tokens = min(self.tokens, 0.0)
+                self.updated = self.paused_until
+            elif status is None or status >= 500 or latency > SLOW_LATENCY:
+                self.rate = max(self.min_rate, self.rate * 0.75)
+            elif latency < FAST_LATENCY:
+                self.rate = min(self.max_rate, self.rate + RATE_STEP)
+
+    def state(self):
+        """The learned rate and pause, for `RateLimiter.save` (pause as a wall-clock time)."""
+        with self._lock:
+            pause = self.paused_until - time.monotonic()
+            return {
+                "rate": self.rate,
+                "paused_until": time.time() + pause if pause > 0 else 0.0,
+                "saved_at": time.time(),
+            }
+
+    def restore(self, state):
+        """Start from a `state()` recorded by another process."""
+        with self._lock:
+            rate = state.get("rate") or self.rate
+            self.rate = min(self.max_rate, max(self.min_rate, rate))
+            pause = (state.get("paused_until") or 0.0) - time.time()
+            if pause > 0:
+                self.paused_until = time.monotonic() + pause
+                self.tokens = min(self.tokens, 0.0)
+                self.updated = self.paused_until
+
+    def achieved_rate(self):
+        first, last = self.stats["first"], self.stats["last"]
+        if not first or not last or last <= first:
+            return 0.0
+        return self.stats["requests"] / (last - first)
+
+
+class RateLimiter:
+    """One adaptive `TokenBucket` per host.
+
+    With `state_path`, new buckets start from the host state recorded there
+    (see `save`) if it is younger than `STATE_MAX_AGE`.
+    """
+
+    def __init__(self, state_path=None, **bucket_kwargs):
+        self.bucket_kwargs = bucket_kwargs
+        self.buckets = {}
+        self.state_path = state_path
+        self.recorded = load_state(state_path) if state_path else {}
+        self._lock = threading.Lock()
+
+    def bucket(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self.buckets:
+                bucket = TokenBucket(**self.bucket_kwargs)
+                state = self.recorded.get(host)
+                if state and time.time() - state.get("saved_at", 0) < STATE_MAX_AGE:
+                    bucket.restore(state)
+                self.buckets[host] = bucket
+            return self.buckets[host]
+
+    def save(self):
+        """Write the state of every host this limiter sent requests to into `state_path`.
+
+        Other hosts' entries are kept. Processes that exit at the same moment may
+        overwrite each other's entries; the last one written wins.
+        """
+        if not self.state_path:
+            return
+        with self._lock:
+            used = {host: b for host, b in self.buckets.items() if b.stats["requests"]}
+        if not used:
+            return
+        state = load_state(self.state_path)
+        state.update({host: b.state() for host, b in used.items()})
+        path = Path(self.state_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(state, indent=1, sort_keys=True))
+        os.replace(tmp, path)
+
+    def summary(self):
+        lines = []
+        for host, b in sorted(self.buckets.items()):
+            lines.append(
+                f"Rate limiter [{host}]: {b.stats['requests']} requests at "
+                f"{b.achieved_rate():.1f} req/s achieved (rate now {b.rate:.1f}/s), "
+                f"{b.stats['throttled']} throttled, {b.stats['waited']:.1f}s waiting"
+            )
+        return "\n".join(lines)
+
+
+def load_state(path):
+    """{host: state} recorded by `RateLimiter.save`, or {} if there is none."""
+    try:
+        return json.loads(Path(path).read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    """Return the process-wide limiter shared by every fetcher.
+
+    Created on first use, starting from the host state in `FETCH_RATE_STATE` if set.
+    """
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(state_path=os.environ.get("FETCH_RATE_STATE"))
+        return _limiter
+
+
+def reset_limiter():
+    """Start the process-wide limiter over, forgetting every host's learned rate."""
+    global _limiter
+    with _limiter_lock:
+        _limiter = RateLimiter()
+        return _limiter
+
+
+@atexit.register
+def _save_state():
+    if _limiter is not None:
+        _limiter.save()
@@ -0,0 +1,281 @@
+"""Registry of catalog sources: how each one is paged and how it maps onto the combined table.
+
+Each `Source` declares where its rows come from (endpoint, pagination style,
+item normalizer, CSV columns) and how they map onto the combined table
+(`columns`, provider column, dedup identity columns). `fetch_all.py`,
+`fetch_cli.py`, `renormalize.py` and the combine notebook all read `SOURCES`,
+so adding a catalog is one `register(Source(...))` call here and no change to
+the orchestration.
+
+Every JSON source is paged by the one engine, `paging.crawl`, from the fields
+declared here (`endpoint`, `paging`, `params`, `items`, `total`, ...). Sources
+with a `notebook` are fetched by that notebook's `fetch()`, which runs `crawl`
+and adds what plain paging can't (incremental syncs, split and two-phase
+Resource Watch crawls, resource side tables, PDF parsing); sources without one
+are crawled and written by `fetch_source`. Every page is checkpointed, and
+archived when the run completes.
+"""
+
+import importlib
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+
+import pandas as pd
+
+from . import arcgis, ckan, eae, resourcewatch
+from .checkpoint import Checkpoint
+from .client import print_summary
+from .paging import PAGING_STYLES, crawl
+from .tables import write_outputs
+
+DATA_DIR = Path(__file__).resolve().parents[2] / "data"
+
+# How long a fetch stays fresh for `fetch_all.py --skip-fresh` (see `freshness.py`)
+DEFAULT_TTL = 24 * 3600
+
+
+@dataclass
+class Source:
+    """One catalog: how to fetch it and how its CSV maps onto the combined table."""
+
+    name: str  # fetch_all.py stage and fetch_cli.py argument
+    title: str
+    collection: str  # `source_collection` in the combined table
+    output: str  # CSV in data/
+    columns: dict  # CSV column -> combined column
+    provider: str = "provider"  # appended to `source` as "<collection> > <provider>"
+    # (id, slug, name) columns after renaming, for cross-source dedup (see `dedup.py`)
+    identity: tuple = ("dataset_id", "slug", "dataset_name")
+    notebook: str | None = None  # fetch notebook in src/ defining `fetch()`
+    ttl: float | None = DEFAULT_TTL  # seconds; None never expires
+    inputs: list = field(default_factory=list)  # files in data/ its fetch also reads
+
+    endpoint: str = ""
+    paging: str = "static"
+    params: dict = field(default_factory=dict)
+    cursor_param: str = ""
+    size_param: str = ""
+    first: int = 1
+    # where the items, the total item count and the next page's URL are in a page:
+    # a dotted path into the JSON, or a function of the page
+    items: str | Callable = ""
+    total: str | Callable = ""
+    next: str | Callable = ""
+    normalize: Callable = dict  # one item -> one row
+    check: Callable | None = None  # raises on a malformed page
+    fields: list | None = None  # CSV columns (default: those of the first row)
+    page_size: int = 100
+    max_workers: int = 4
+    # typed columns of the Parquet copy (see `tables.py`)
+    datetimes: list = field(default_factory=list)
+    ints: list = field(default_factory=list)
+
+    def __post_init__(self):
+        if self.paging not in PAGING_STYLES:
+            raise ValueError(f"{self.name}: paging must be one of {PAGING_STYLES}")
+
+
+SOURCES = {}
+
+
+def register(source):
+    """Add `source` to `SOURCES` (replacing one of the same name); return it."""
+    SOURCES[source.name] = source
+    return source
+
+
+def to_frame(source, rows):
+    """The source's table as written to CSV: `fields` columns, first row per `id` if any."""
+    df = pd.DataFrame(rows, columns=source.fields)
+    if "id" in df:
+        df = df.drop_duplicates("id")
+    return df
+
+
+def fetch_source(source, page_size=None, max_workers=None, output_format="both", out_dir=DATA_DIR):
+    """Crawl a source without a notebook and write its outputs; its `fetch()`."""
+    page_size = page_size or source.page_size
+    # every page is checkpointed, FETCH_RESUME=1 continues an interrupted crawl
+    checkpoint = Checkpoint(source.name, params={"page_size": page_size})
+    rows = [
+        row
+        for _, page in crawl(source, checkpoint, page_size=page_size, max_workers=max_workers)
+        for row in page
+    ]
+    df = to_frame(source, rows)
+    paths = write_outputs(
+        df,
+        Path(out_dir) / source.output,
+        output_format,
+        datetimes=source.datetimes,
+        ints=source.ints,
+    )
+    # keep the raw pages in the compressed archive (data/raw_archive/) for renormalize.py
+    checkpoint.finish()
+    print(f"Wrote {len(df)} rows to {' and '.join(str(p) for p in paths)}")
+    print_summary()
+    return df
+
+
+def load_fetch(name):
+    """The `fetch()` of a registered source: its notebook's, or `fetch_source` for it.
+
+    Notebooks are imported by module name, so `src/` must be on `sys.path`.
+    """
+    source = SOURCES[name]
+    if source.notebook:
+        return importlib.import_module(Path(source.notebook).stem).fetch
+    return partial(fetch_source, source)
+
+
+RW_INCLUDES = {"env": "production", "published": "true", "includes": "vocabulary,layer"}
+
+register(
+    Source(
+        name="rw",
+        title="Resource Watch",
+        collection="resource_watch",
+        output="resourcewatch_datasets.csv",
+        columns={
+            "id": "dataset_id",
+            "name": "dataset_name",
+            "slug": "slug",
+            "updatedAt": "last_updated",
+            "tags": "dataset_tags",
+        },
+        notebook="fetch_datasets_resource_watch_datasets.py",
+        endpoint=resourcewatch.BASE,
+        paging="page",
+        params={"application": "rw", **RW_INCLUDES},
+        cursor_param="page[number]",
+        size_param="page[size]",
+        items="data",
+        total="meta.total-items",
+        normalize=resourcewatch.extract_row,
+        check=resourcewatch.check_page,
+        fields=resourcewatch.FIELDS,
+        page_size=resourcewatch.PAGE_SIZE,
+        max_workers=resourcewatch.MAX_WORKERS,
+        datetimes=resourcewatch.DATETIME_FIELDS,
+        ints=resourcewatch.INT_FIELDS,
+    )
+)
+register(
+    Source(
+        name="gfw",
+        title="GFW",
+        collection="global_forest_watch",
+        output="global_forest_watch_datasets.csv",
+        columns={
+            "id": "dataset_id",
+            "name": "dataset_name",
+            "description": "dataset_description",
+            "tags": "dataset_tags",
+        },
+        notebook="fetch_datasets_global_forest_watch.py",
+        endpoint=resourcewatch.BASE,
+        paging="page",
+        params={"application": "gfw", **RW_INCLUDES},
+        cursor_param="page[number]",
+        size_param="page[size]",
+        items="data",
+        total="meta.total-items",
+        normalize=resourcewatch.extract_row,
+        check=resourcewatch.check_page,
+        fields=resourcewatch.FIELDS,
+        page_size=resourcewatch.PAGE_SIZE,
+        max_workers=resourcewatch.MAX_WORKERS,
+        datetimes=resourcewatch.DATETIME_FIELDS,
+        ints=resourcewatch.INT_FIELDS,
+    )
+)
+register(
+    Source(
+        name="arcgis",
+        title="ArcGIS Catalog",
+        collection="arcgis_wri_catalog",
+        output="wri_arcgis_catalog_01.csv",
+        columns={
+            "id": "dataset_id",
+            "name": "dataset_name",
+            "description": "dataset_description",
+            "tags": "dataset_tags",
+            "updatedAt": "date_last_updated",
+            "createdAt": "date_created",
+        },
+        notebook="fetch_datasets_arcgis_wri_catalog.py",
+        endpoint=arcgis.BASE,
+        paging="offset",
+        cursor_param="startindex",
+        size_param="limit",
+        first=1,
+        items="features",
+        total="numberMatched",
+        # opaque-cursor servers: follow `rel=next` instead of computing offsets
+        next=arcgis.next_link,
+        normalize=arcgis.normalize_feature,
+        fields=arcgis.FIELDS,
+        page_size=arcgis.PAGE_SIZE,
+        max_workers=arcgis.MAX_WORKERS,
+        datetimes=arcgis.DATETIME_FIELDS,
+    )
+)
+register(
+    Source(
+        name="eae",
+        title="EAE",
+        collection="energy_access_explorer",
+        output="eae_datasets_pdf-extract.csv",
+        columns={
+            "id": "dataset_id",
+            "name": "dataset_name",
+            "description": "dataset_description",
+            "tags": "dataset_tags",
+        },
+        identity=("dataset_id", None, "dataset_name"),
+        # a report PDF, not JSON pages; its notebook parses it (see `eae.py`)
+        notebook="fetch_datasets_scrape_pdfreport_energy_access_explorer.py",
+        # a published report that rarely changes
+        ttl=30 * 24 * 3600,
+        # a changed local copy of the report changes the rows, like a code change
+        inputs=[eae.PDF_PATH.name],
+        endpoint=eae.PDF_URL,
+        fields=eae.FIELDS,
+        max_workers=eae.MAX_WORKERS,
+    )
+)
+register(
+    Source(
+        name="wri_explorer",
+        title="WRI Data Explorer",
+        collection="wri_data_explorer",
+        output="wri_data_explorer_01.csv",
+        columns={
+            "id": "dataset_id",
+            "name": "dataset_name",
+            "title": "dataset_description",
+            "tags": "dataset_tags",
+            "updatedAt": "date_last_updated",
+            "createdAt": "date_created",
+        },
+        provider="organization",
+        # CKAN's `name` is its slug and its `title` the human-readable name
+        identity=("dataset_id", "dataset_name", "dataset_description"),
+        notebook="fetch_datasets_wri_data_explorer.py",
+        endpoint=ckan.BASE,
+        paging="offset",
+        cursor_param="start",
+        size_param="rows",
+        first=0,
+        items="result.results",
+        total="result.count",
+        normalize=ckan.to_dataset_row,
+        check=ckan.check_page,
+        fields=ckan.DATASET_FIELDS,
+        max_workers=ckan.MAX_WORKERS,
+        datetimes=ckan.DATASET_DATETIME_FIELDS,
+        ints=ckan.DATASET_INT_FIELDS,
+    )
+)
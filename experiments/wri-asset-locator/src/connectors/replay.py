@@ -0,0 +1,190 @@
+"""Record real API responses once, then replay them from a local stand-in server.
+
+Recording: with `FETCH_RECORD_DIR` set, every response that comes back from the
+network is also written to that directory as `<key>.body` plus `<key>.json`
+(the full request URL and content type), where `<key>` hashes the request URL
+with its query string. Run with the cache off so every page is downloaded.
+
+Replaying: `FixtureServer` serves a fixture directory over HTTP with
+configurable latency (fixed, plus random jitter), error rate and 429
+injection. With `FETCH_REPLAY_URL` pointing at it, the client rewrites every request
+`https://host/path?query` to `<replay url>/https/host/path?query`, so the
+fetchers run unchanged against local data. Rate limiting stays per original host.
+"""
+
+import hashlib
+import json
+import os
+import random
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import requests
+
+FIXTURE_DIR = Path(__file__).resolve().parents[2] / "data" / "fixtures"
+
+
+def full_url(url, params=None):
+    """The URL `requests` would send for `url` and `params`."""
+    return requests.Request("GET", url, params=params).prepare().url
+
+
+def fixture_key(url):
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+def replay_url(url, params=None):
+    """Where to send this request instead, when `FETCH_REPLAY_URL` is set (else None)."""
+    base = os.environ.get("FETCH_REPLAY_URL")
+    if not base:
+        return None
+    parts = urlsplit(full_url(url, params))
+    query = f"?{parts.query}" if parts.query else ""
+    return f"{base.rstrip('/')}/{parts.scheme}/{parts.netloc}{parts.path}{query}"
+
+
+def record(url, params, response, body):
+    """Copy a response body to `FETCH_RECORD_DIR` if recording; return `body` rewound."""
+    body.seek(0)
+    directory = os.environ.get("FETCH_RECORD_DIR")
+    if not directory:
+        return body
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    url = full_url(url, params)
+    key = fixture_key(url)
+    tmp = directory / f"{key}.body.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        shutil.copyfileobj(body, f)
+    os.replace(tmp, directory / f"{key}.body")
+    meta = {"url": url, "content_type": response.headers.get("Content-Type", "application/json")}
+    (directory / f"{key}.json").write_text(json.dumps(meta))
+    body.seek(0)
+    return body
+
+
+class FixtureServer(ThreadingHTTPServer):
+    """Serves recorded fixtures, optionally slow, flaky or throttling.
+
+    * `latency`: seconds added to every response
+    * `jitter`: up to this many more seconds, at random, so concurrent responses finish out of order
+    * `error_rate`: fraction of requests answered with a 503
+    * `throttle_rate`: fraction answered with a 429 and `Retry-After: <retry_after>`
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        directory=FIXTURE_DIR,
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        throttle_rate=0.0,
+        retry_after=1,
+        seed=0,
+        port=0,
+    ):
+        super().__init__(("127.0.0.1", port), _FixtureHandler)
+        self.directory = Path(directory)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.stats = {"served": 0, "errors": 0, "throttled": 0, "missing": 0, "bytes": 0}
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = dict.fromkeys(self.stats, 0)
+
+    def _delay(self):
+        if not self.jitter:
+            return self.latency
+        with self._lock:
+            return self.latency + self.random.uniform(0, self.jitter)
+
+    def _outcome(self):
+        with self._lock:
+            roll = self.random.random()
+        if roll < self.throttle_rate:
+            return "throttled"
+        if roll < self.throttle_rate + self.error_rate:
+            return "errors"
+        return "served"
+
+    def _count(self, outcome, nbytes=0):
+        with self._lock:
+            self.stats[outcome] += 1
+            self.stats["bytes"] += nbytes
+
+
+class _FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        # /<scheme>/<host>/<path>?<query> -> <scheme>://<host>/<path>?<query>
+        scheme, _, rest = self.path.lstrip("/").partition("/")
+        key = fixture_key(f"{scheme}://{rest}")
+        if delay := server._delay():
+            time.sleep(delay)
+
+        outcome = server._outcome()
+        if outcome == "throttled":
+            server._count(outcome)
+            self.send_response(429)
+            self.send_header("Retry-After", str(server.retry_after))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if outcome == "errors":
+            server._count(outcome)
+            self.send_error(503)
+            return
+
+        body_path = server.directory / f"{key}.body"
+        if not body_path.exists():
+            server._count("missing")
+            self.send_error(404, "No fixture recorded for this request")
+            return
+        meta = json.loads((server.directory / f"{key}.json").read_text())
+        body = body_path.read_bytes()
+        server._count("served", len(body))
+        self.send_response(200)
+        self.send_header("Content-Type", meta.get("content_type", "application/json"))
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@contextmanager
+def serve_fixtures(**server_kwargs):
+    """Run a `FixtureServer` in the background and point the client at it."""
+    server = FixtureServer(**server_kwargs)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    previous = os.environ.get("FETCH_REPLAY_URL")
+    os.environ["FETCH_REPLAY_URL"] = server.url
+    try:
+        yield server
+    finally:
+        if previous is None:
+            os.environ.pop("FETCH_REPLAY_URL", None)
+        else:
+            os.environ["FETCH_REPLAY_URL"] = previous
+        server.shutdown()
+        server.server_close()
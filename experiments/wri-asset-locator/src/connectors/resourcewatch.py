@@ -0,0 +1,338 @@
+"""Resource Watch `/v1/dataset` connector.
+
+The same endpoint serves every Resource Watch "application" (Resource Watch
+itself is `rw`, Global Forest Watch is `gfw`, ...); only the `application`
+query parameter differs, so all of those fetchers share this module.
+
+Pages are fetched by the shared engine (`paging.crawl`) as declared by the
+`rw` and `gfw` sources in `registry.py`. `write_csvs` crawls several
+applications at once (`application=rw,gfw`) and splits the rows locally by
+each dataset's own `application` list, so datasets tagged for more than one of
+them are downloaded once.
+
+Layer names come either from `includes=layer` on every page (`layers="include"`,
+one heavy pass) or, with `layers="lazy"`, from a second phase: the pages are
+fetched without layers, then `/v1/dataset/<id>/layer` is requested in parallel
+for datasets that are new or whose `updatedAt` changed since the last run.
+Everything else comes from the layer cache in `data/.layer_cache/`.
+"""
+
+import csv
+import json
+import math
+import os
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+from . import facets
+from .checkpoint import Checkpoint, atomic_output
+from .client import get_json, get_session, print_summary
+from .paging import crawl
+from .pool import bounded_map
+from .streaming import StreamedPage
+from .tables import finish_csv
+
+BASE = "https://api.resourcewatch.org/v1/dataset"
+
+FIELDS = [
+    "id",
+    "name",
+    "slug",
+    "provider",
+    "tags",
+    "layerCount",
+    "layerNames",
+    "createdAt",
+    "dataLastUpdated",
+    "updatedAt",
+]
+
+# Typed columns of the Parquet copy (see `tables.py`)
+DATETIME_FIELDS = ["createdAt", "dataLastUpdated", "updatedAt"]
+INT_FIELDS = ["layerCount"]
+
+PAGE_SIZE = 100
+
+# Pages 2..N are fetched concurrently (1 fetches them one at a time); pacing is left to
+# the shared per-host rate limiter
+MAX_WORKERS = 4
+
+# `includes` for one-pass pages and for the light pages of the two-phase mode
+INCLUDES = {"include": "vocabulary,layer", "lazy": "vocabulary"}
+
+# Per-dataset layer lookups in the lazy mode; these are small, so more run at once
+LAYER_WORKERS = 8
+LAYER_CACHE_DIR = Path(__file__).resolve().parents[2] / "data" / ".layer_cache"
+
+
+def check_page(page):
+    """Raise if a page (decoded, or a `StreamedPage`) lacks the `meta` every dataset page has."""
+    meta = page.value("meta") if isinstance(page, StreamedPage) else (page or {}).get("meta")
+    if not meta:
+        raise ValueError("Unexpected API response; missing 'meta'.")
+
+
+def layer_names(layers):
+    """Names of layer objects, as included in a dataset or listed by the layer endpoint."""
+    names = []
+    for lyr in layers or []:
+        if isinstance(lyr, dict):
+            nm = (lyr.get("attributes") or {}).get("name") or lyr.get("name")
+            if nm:
+                names.append(nm)
+    return names
+
+
+def set_layer_names(row, names):
+    row["layerCount"] = len(names)
+    row["layerNames"] = " | ".join(names) if names else ""
+
+
+def extract_row(item):
+    """Flatten one dataset item from the API's `data` array."""
+    attr = item.get("attributes", {}) or {}
+
+    # tags from vocabulary (flatten & unique)
+    tags = set()
+    for vocab in attr.get("vocabulary") or []:
+        tags.update((vocab.get("attributes") or {}).get("tags") or [])
+    tags_list = sorted(tags)
+
+    # layer names (if present in include)
+    names = layer_names(attr.get("layer"))
+
+    return {
+        "id": item.get("id"),
+        "name": attr.get("name"),
+        "slug": attr.get("slug"),
+        "provider": attr.get("provider"),
+        "tags": ", ".join(tags_list) if tags_list else "",
+        "layerCount": len(names),
+        "layerNames": " | ".join(names) if names else "",
+        "createdAt": attr.get("createdAt"),
+        "dataLastUpdated": attr.get("dataLastUpdated"),
+        "updatedAt": attr.get("updatedAt"),
+        # not a CSV column; feeds the application facet index (see `facets.py`)
+        "applications": sorted(attr.get("application") or []),
+    }
+
+
+def extract_rows(js):
+    """Flatten one API page into rows with the `FIELDS` columns."""
+    return [extract_row(item) for item in js.get("data", [])]
+
+
+def get_layers(dataset_id, session=None):
+    """Every layer of one dataset, from `/v1/dataset/<id>/layer`."""
+    params = {"env": "production", "page[size]": 100, "page[number]": 1}
+    layers = []
+    while True:
+        js = get_json(f"{BASE}/{dataset_id}/layer", params=params, session=session)
+        layers.extend(js.get("data", []))
+        if params["page[number]"] >= ((js.get("meta") or {}).get("total-pages") or 1):
+            return layers
+        params = {**params, "page[number]": params["page[number]"] + 1}
+
+
+def _layer_cache_path(name, directory):
+    return Path(directory) / f"{name}.json"
+
+
+def load_layer_cache(name, directory=LAYER_CACHE_DIR):
+    """{dataset id: {"updatedAt", "layerNames"}} from the last lazy crawl called `name`."""
+    try:
+        return json.loads(_layer_cache_path(name, directory).read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_layer_cache(name, cache, directory=LAYER_CACHE_DIR):
+    path = _layer_cache_path(name, directory)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.tmp")
+    tmp.write_text(json.dumps(cache))
+    os.replace(tmp, path)
+
+
+def enrich_layer_names(
+    rows, cache_name, cache_dir=LAYER_CACHE_DIR, session=None, max_workers=LAYER_WORKERS
+):
+    """Fill in `layerCount`/`layerNames` of rows taken from light (no-layer) pages.
+
+    Layers are requested, `max_workers` datasets at a time, only for datasets missing
+    from the cache or whose `updatedAt` changed; the rest reuse the cached names.
+    The cache is then rewritten with exactly these rows' datasets. Returns
+    (datasets fetched, datasets served from the cache).
+    """
+    s = session or get_session()
+    cache = load_layer_cache(cache_name, cache_dir)
+    stale = [
+        row["id"]
+        for row in rows
+        if row["id"] not in cache or cache[row["id"]]["updatedAt"] != row["updatedAt"]
+    ]
+    updated_at = {row["id"]: row["updatedAt"] for row in rows}
+    lookups = bounded_map(lambda i: get_layers(i, session=s), stale, max_workers)
+    for dataset_id, layers in zip(stale, lookups, strict=True):
+        cache[dataset_id] = {
+            "updatedAt": updated_at[dataset_id],
+            "layerNames": layer_names(layers),
+        }
+    for row in rows:
+        set_layer_names(row, cache[row["id"]]["layerNames"])
+    save_layer_cache(cache_name, {k: cache[k] for k in updated_at}, cache_dir)
+    return len(stale), len(rows) - len(stale)
+
+
+def two_phase_rows(pages, cache_name, cache_dir=LAYER_CACHE_DIR, stats=None):
+    """Collect every row of `pages` (phase 1), then enrich their layer names (phase 2).
+
+    Yields all rows as one batch, like a single page from `paging.crawl`.
+    """
+    t0 = time.perf_counter()
+    rows = [row for _, page in pages for row in page]
+    phase1 = time.perf_counter() - t0
+    fetched, cached = enrich_layer_names(rows, cache_name, cache_dir=cache_dir)
+    phase2 = time.perf_counter() - t0 - phase1
+    print(
+        f"[{cache_name}] phase 1: {len(rows)} datasets from light pages in {phase1:.1f}s; "
+        f"phase 2: layers of {fetched} new/changed datasets ({cached} cached) in {phase2:.1f}s"
+    )
+    if stats is not None:
+        stats.update(phase1_seconds=phase1, phase2_seconds=phase2, fetched=fetched, cached=cached)
+    yield None, rows
+
+
+def write_csv(source, outfile, resume=None, facet_dir=facets.FACET_DIR, **crawl_kwargs):
+    """Crawl the catalog of a registry `source` and write it to `outfile`; return the row count.
+
+    A typed Parquet copy is written next to it (`output_format` keeps one or both),
+    and the crawl's slice of the application facet index under `facet_dir` is
+    refreshed (`None` skips it).
+    Pass `stream=True` to parse large pages incrementally (needs `ijson`), and
+    `layers="lazy"` for the two-phase layer lookup. Every page
+    is checkpointed; with `resume=True` (or `FETCH_RESUME=1`) an interrupted run
+    continues from its last completed page. `outfile` is only replaced once the whole
+    crawl has succeeded.
+    """
+    application = source.params["application"]
+    counts = write_csvs(
+        source, {application: outfile}, resume=resume, facet_dir=facet_dir, **crawl_kwargs
+    )
+    return counts[application]
+
+
+def write_csvs(
+    source,
+    outfiles,
+    resume=None,
+    facet_dir=facets.FACET_DIR,
+    layers="include",
+    layer_cache_dir=LAYER_CACHE_DIR,
+    stats=None,
+    output_format="both",
+    **crawl_kwargs,
+):
+    """Crawl every application in `outfiles` ({application: path}) once; return row counts.
+
+    `source` is a Resource Watch source of the registry, crawled with `application`
+    set to the applications in `outfiles`. With more than one application the
+    catalog is requested for all of them at once and each row goes to the file of
+    every application it is tagged with.
+    Everything else (Parquet copies, facet index, checkpoints, `resume`) works as in
+    `write_csv`. Also prints the requests and bytes saved versus one crawl each.
+
+    `layers="lazy"` fetches light pages, then layer names via `enrich_layer_names`
+    with its cache in `layer_cache_dir`; phase timings are added to `stats` if given.
+    `output_format` keeps the CSV, the Parquet copy or "both" (see `tables.py`).
+    """
+    applications = list(outfiles)
+    crawl_name = ",".join(applications)
+    name = "+".join(applications)
+    page_size = crawl_kwargs.get("page_size", PAGE_SIZE)
+    checkpoint = Checkpoint(
+        f"resourcewatch-{name}",
+        params={"page_size": page_size, "layers": layers},
+        resume=resume,
+    )
+    pages = crawl(
+        source,
+        checkpoint,
+        params={"application": crawl_name, "includes": INCLUDES[layers]},
+        **crawl_kwargs,
+    )
+    if layers == "lazy":
+        pages = two_phase_rows(pages, name, cache_dir=layer_cache_dir, stats=stats)
+    counts, seen = write_split(pages, outfiles)
+    if len(applications) > 1:
+        print_savings(checkpoint, counts, page_size)
+    checkpoint.finish()
+
+    for app, outfile in outfiles.items():
+        paths = finish_csv(
+            outfile, output_format=output_format, datetimes=DATETIME_FIELDS, ints=INT_FIELDS
+        )
+        print(f"Done. Wrote {counts[app]} rows to {' and '.join(str(p) for p in paths)}")
+        if facet_dir is not None:
+            st = facets.write_slice(app, seen[app], directory=facet_dir)
+            print(
+                f"[{app}] application index: {st['datasets']} datasets "
+                f"({st['added']} added, {st['removed']} removed, {st['updated']} updated)"
+            )
+    print_summary()
+    return counts
+
+
+def write_split(pages, outfiles, split=None):
+    """Write the rows of `pages` ((key, rows) pairs) to each application's CSV in `outfiles`.
+
+    With `split` (the default for several applications) a row goes to every one it
+    is tagged with; otherwise every row goes to every file. Each file is replaced
+    only once all pages are written.
+    Returns (row counts, {application: {id: facet entry}}).
+    """
+    applications = list(outfiles)
+    if split is None:
+        split = len(applications) > 1
+    counts = dict.fromkeys(applications, 0)
+    seen = {app: {} for app in applications}
+    with ExitStack() as stack:
+        writers = {}
+        for app, outfile in outfiles.items():
+            tmp = stack.enter_context(atomic_output(outfile))
+            f = stack.enter_context(open(tmp, "w", newline="", encoding="utf-8"))
+            writers[app] = csv.DictWriter(f, fieldnames=FIELDS, extrasaction="ignore")
+            writers[app].writeheader()
+        for _, rows in pages:
+            for row in rows:
+                tagged = row.get("applications", [])
+                for app in applications:
+                    # a single-application crawl is already filtered by the API
+                    if split and app not in tagged:
+                        continue
+                    writers[app].writerow(row)
+                    counts[app] += 1
+                    seen[app][row["id"]] = {"applications": tagged, "updatedAt": row["updatedAt"]}
+    return counts, seen
+
+
+def print_savings(checkpoint, counts, page_size):
+    """Compare a combined crawl with crawling each application on its own.
+
+    The combined crawl's requests and bytes are counted from its checkpoint (bytes
+    of decoded page bodies, not what went over the wire). The separate crawls, and
+    so the savings, are estimates: one request per `page_size` rows of each
+    application, at the combined crawl's average bytes per dataset.
+    """
+    pages = len(list(checkpoint.directory.glob("*.raw")))
+    items = checkpoint.info["total"] or 0
+    nbytes = sum(p.stat().st_size for p in checkpoint.directory.glob("*.raw"))
+    separate_pages = sum(max(math.ceil(n / page_size), 1) for n in counts.values())
+    separate_bytes = nbytes / max(items, 1) * sum(counts.values())
+    print(
+        f"[{','.join(counts)}] one crawl: {pages} requests, {nbytes / 2**20:.1f} MB decoded "
+        f"for {items} datasets; separate crawls (estimated): ~{separate_pages} requests, "
+        f"~{separate_bytes / 2**20:.1f} MB. Estimated savings: ~{separate_pages - pages} "
+        f"requests and ~{(separate_bytes - nbytes) / 2**20:.1f} MB"
+    )
@@ -0,0 +1,162 @@
+"""Bounded-memory output: rows streamed to CSV / Parquet row groups, and external sorting.
+
+`RowWriter` takes rows as the pages arrive and appends them, a row group at a
+time, to the CSV and/or its typed Parquet copy (`output_format` as in
+`tables.py`), so memory holds one group however large the catalog is. Both
+files go to `.partial` paths and replace the previous outputs only once the
+block completes (see `atomic_output`).
+
+`external_sort` orders a row stream that may not fit in memory: it sorts runs
+of `SORT_RUN_ROWS` rows, spills each to a temporary JSON-lines file and merges
+them lazily with `heapq.merge`. The sort is stable, like pandas' `kind="stable"`.
+"""
+
+import csv
+import heapq
+import json
+import tempfile
+from contextlib import ExitStack
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .checkpoint import atomic_output
+from .tables import check_format, parquet_path, typed
+
+# Rows buffered before they are appended to the outputs (one Parquet row group)
+ROW_GROUP_SIZE = 10_000
+
+# Rows sorted in memory per run of `external_sort`
+SORT_RUN_ROWS = 50_000
+
+
+def arrow_schema(fields, datetimes=(), ints=(), bools=()):
+    """Parquet schema of `typed` rows: the typed columns, and strings for the rest."""
+    types = {
+        **{col: pa.timestamp("ns", tz="UTC") for col in datetimes},
+        **{col: pa.int64() for col in ints},
+        **{col: pa.bool_() for col in bools},
+    }
+    return pa.schema([(col, types.get(col, pa.string())) for col in fields])
+
+
+class RowWriter:
+    """Append rows to `csv_path` and/or its typed Parquet copy, one row group at a time.
+
+    Use as a context manager; `rows` and `paths` hold what was written.
+    """
+
+    def __init__(
+        self,
+        csv_path,
+        fields,
+        output_format="both",
+        datetimes=(),
+        ints=(),
+        bools=(),
+        row_group_size=ROW_GROUP_SIZE,
+    ):
+        check_format(output_format)
+        self.fields = list(fields)
+        self.types = {"datetimes": datetimes, "ints": ints, "bools": bools}
+        self.row_group_size = row_group_size
+        self.paths = []
+        if output_format in ("both", "csv"):
+            self.paths.append(Path(csv_path))
+        if output_format in ("both", "parquet"):
+            self.paths.append(parquet_path(csv_path))
+        # with the pandas metadata `to_parquet` writes, so nullable ints read back as Int64
+        empty = typed(pd.DataFrame(columns=self.fields), **self.types)
+        self.schema = pa.Table.from_pandas(
+            empty, schema=arrow_schema(self.fields, **self.types), preserve_index=False
+        ).schema
+        self.rows = 0
+        self._buffer = []
+
+    def __enter__(self):
+        self._csv = self._parquet = None
+        with ExitStack() as stack:
+            for path in self.paths:
+                tmp = stack.enter_context(atomic_output(path))
+                if path.suffix == ".csv":
+                    f = stack.enter_context(open(tmp, "w", newline="", encoding="utf-8"))
+                    # same line endings as the DataFrame.to_csv outputs it replaces
+                    self._csv = csv.DictWriter(
+                        f, fieldnames=self.fields, extrasaction="ignore", lineterminator="\n"
+                    )
+                    self._csv.writeheader()
+                else:
+                    self._parquet = stack.enter_context(pq.ParquetWriter(tmp, self.schema))
+            self._stack = stack.pop_all()
+        return self
+
+    def __exit__(self, *exc_info):
+        if exc_info[0] is None:
+            self.flush()
+        return self._stack.__exit__(*exc_info)
+
+    def write(self, row):
+        self._buffer.append(row)
+        if len(self._buffer) >= self.row_group_size:
+            self.flush()
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.write(row)
+        return self
+
+    def flush(self):
+        if not self._buffer:
+            return
+        if self._csv is not None:
+            self._csv.writerows(self._buffer)
+        if self._parquet is not None:
+            self._parquet.write_table(self._to_table(self._buffer))
+        self.rows += len(self._buffer)
+        self._buffer = []
+
+    def _to_table(self, rows):
+        df = typed(pd.DataFrame(rows, columns=self.fields), **self.types)
+        for col, kind in zip(self.schema.names, self.schema.types, strict=True):
+            if kind == pa.string():
+                values = df[col].astype(object).where(df[col].notna(), None)
+                df[col] = values.map(lambda v: v if v is None or isinstance(v, str) else str(v))
+        return pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+
+
+def _spill(rows, directory, n):
+    path = Path(directory) / f"run-{n}.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+    return path
+
+
+def external_sort(rows, key, reverse=False, run_rows=SORT_RUN_ROWS, tmp_dir=None):
+    """Yield `rows` (JSON-serializable dicts) sorted by `key`, with at most `run_rows` in memory.
+
+    Nothing is yielded until `rows` is exhausted. A stream that fits in one run is
+    sorted in memory; longer ones are spilled to `tmp_dir` (default: the system's).
+    """
+    with tempfile.TemporaryDirectory(prefix="sort-", dir=tmp_dir) as tmp:
+        runs = []
+        buffer = []
+        for row in rows:
+            buffer.append(row)
+            if len(buffer) >= run_rows:
+                buffer.sort(key=key, reverse=reverse)
+                runs.append(_spill(buffer, tmp, len(runs)))
+                buffer = []
+        buffer.sort(key=key, reverse=reverse)
+        if not runs:
+            yield from buffer
+            return
+        runs.append(_spill(buffer, tmp, len(runs)))
+        del buffer
+
+        with ExitStack() as stack:
+            files = [stack.enter_context(open(path, encoding="utf-8")) for path in runs]
+            # merge keeps equal keys in run order, so the sort stays stable
+            yield from heapq.merge(*(map(json.loads, f) for f in files), key=key, reverse=reverse)
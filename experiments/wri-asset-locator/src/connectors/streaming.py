@@ -0,0 +1,55 @@
+"""Optional streaming JSON path for large catalog pages.
+
+`stream_page` spools a response body to disk in chunks (into the shared cache
+when it's enabled) and parses it lazily with `ijson`, so items can be handed to
+a row extractor one at a time. Peak memory then depends on the size of one item
+rather than the size of the page.
+
+`ijson` is optional; without it the connectors fall back to `json.load`.
+"""
+
+from .client import open_body
+
+try:
+    import ijson
+except ImportError:  # optional dependency
+    ijson = None
+
+
+def streaming_available():
+    return ijson is not None
+
+
+class StreamedPage:
+    """A response body on disk, parsed incrementally on demand."""
+
+    def __init__(self, body):
+        self.body = body
+
+    def items(self, prefix):
+        """Yield each object found at `prefix` (e.g. `"data.item"`), one at a time."""
+        self.body.seek(0)
+        yield from ijson.items(self.body, prefix, use_float=True)
+
+    def value(self, prefix, default=None):
+        """Return the first object at `prefix` (e.g. `"meta"`), or `default`."""
+        self.body.seek(0)
+        return next(ijson.items(self.body, prefix, use_float=True), default)
+
+    def close(self):
+        self.body.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def stream_page(url, params=None, **kwargs):
+    """GET `url` with the body streamed to disk; return a `StreamedPage` (needs `ijson`)."""
+    if ijson is None:
+        raise ImportError(
+            "Streaming JSON parsing needs `ijson`; add it to the script dependencies."
+        )
+    return StreamedPage(open_body(url, params=params, stream=True, **kwargs))
@@ -0,0 +1,91 @@
+"""Typed Parquet copies of the fetch outputs, next to their CSVs.
+
+Every stage writes its CSV and, alongside it, `<name>.parquet` with timestamps
+as UTC datetimes, counts as nullable ints and flags as nullable booleans, so
+consumers get real dtypes without re-parsing text. `output_format` ("csv",
+"parquet" or the default "both") picks which of the two a fetcher keeps.
+"""
+
+from pathlib import Path
+
+import pandas as pd
+
+from .checkpoint import atomic_output
+
+
+def parquet_path(csv_path):
+    return Path(csv_path).with_suffix(".parquet")
+
+
+def typed(df, datetimes=(), ints=(), bools=()):
+    """Copy of `df` with the named columns converted; columns not present are ignored."""
+    df = df.copy()
+    for col in datetimes:
+        if col in df:
+            df[col] = pd.to_datetime(df[col], errors="coerce", utc=True, format="ISO8601")
+    for col in ints:
+        if col in df:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int64")
+    for col in bools:
+        if col in df:
+            flags = df[col].map(
+                lambda v: (
+                    v
+                    if isinstance(v, bool)
+                    else {"true": True, "false": False}.get(str(v).strip().lower())
+                )
+            )
+            df[col] = flags.astype("boolean")
+    return df
+
+
+def write_parquet(df, path, datetimes=(), ints=(), bools=(), row_group_size=None):
+    """Write `typed(df, ...)` to `path` atomically; return the path."""
+    with atomic_output(path) as tmp:
+        typed(df, datetimes=datetimes, ints=ints, bools=bools).to_parquet(
+            tmp, index=False, row_group_size=row_group_size
+        )
+    return path
+
+
+def csv_to_parquet(csv_path, datetimes=(), ints=(), bools=()):
+    """Write the typed Parquet copy of a CSV the fetcher has just written; return its path."""
+    df = pd.read_csv(csv_path, dtype=str)
+    return write_parquet(df, parquet_path(csv_path), datetimes=datetimes, ints=ints, bools=bools)
+
+
+OUTPUT_FORMATS = ("both", "csv", "parquet")
+
+
+def check_format(output_format):
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"output_format must be one of {OUTPUT_FORMATS}, not {output_format!r}")
+
+
+def write_outputs(df, csv_path, output_format="both", datetimes=(), ints=(), bools=()):
+    """Write `df` as a CSV at `csv_path` and/or its typed Parquet copy; return the paths written."""
+    check_format(output_format)
+    paths = []
+    if output_format in ("both", "csv"):
+        with atomic_output(csv_path) as tmp:
+            df.to_csv(tmp, index=False, encoding="utf-8")
+        paths.append(Path(csv_path))
+    if output_format in ("both", "parquet"):
+        types = {"datetimes": datetimes, "ints": ints, "bools": bools}
+        paths.append(write_parquet(df, parquet_path(csv_path), **types))
+    return paths
+
+
+def finish_csv(csv_path, output_format="both", datetimes=(), ints=(), bools=()):
+    """Apply `output_format` to a CSV a fetcher has streamed out; return the paths kept.
+
+    Adds the Parquet copy, or replaces the CSV with it for "parquet".
+    """
+    check_format(output_format)
+    paths = [Path(csv_path)]
+    if output_format in ("both", "parquet"):
+        paths.append(csv_to_parquet(csv_path, datetimes=datetimes, ints=ints, bools=bools))
+    if output_format == "parquet":
+        Path(csv_path).unlink()
+        paths.pop(0)
+    return paths
@@ -0,0 +1,138 @@
+"""Per-request fetch telemetry and the end-of-run report built from it.
+
+When `FETCH_TELEMETRY_FILE` is set (`fetch_all.py` sets it for every notebook),
+each `open_body` call appends one JSON line to that file: host, URL, final
+status, whether the cache answered, latency of the final attempt (request sent
+to body stored), bytes downloaded (decoded, and as sent over the wire), retries,
+and the seconds spent waiting on the rate limiter and sleeping between retries.
+Lines are appended in a single write, so notebooks running as separate processes
+can share the file.
+
+`build_report` summarizes a run per host: request counts, p50/p95/p99 latency,
+bytes, retries, and time spent sleeping (throttle + backoff) versus working
+(network latency). Both are summed over requests, so with concurrent fetches
+they can exceed the run's wall time.
+"""
+
+import csv
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+REPORT_FIELDS = [
+    "host",
+    "requests",
+    "from_cache",
+    "errors",
+    "retries",
+    "p50_latency",
+    "p95_latency",
+    "p99_latency",
+    "bytes",
+    "wire_bytes",
+    "working_seconds",
+    "throttle_wait_seconds",
+    "backoff_seconds",
+]
+
+_lock = threading.Lock()
+
+
+def log_request(trace):
+    """Append one request's trace to `FETCH_TELEMETRY_FILE`, if telemetry is on."""
+    path = os.environ.get("FETCH_TELEMETRY_FILE")
+    if not path:
+        return
+    line = json.dumps({"ts": time.time(), **trace}) + "\n"
+    with _lock, open(path, "a", encoding="utf-8") as f:
+        f.write(line)
+
+
+def load_requests(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def percentile(values, pct):
+    """Linearly interpolated percentile of `values` (None if empty)."""
+    if not values:
+        return None
+    xs = sorted(values)
+    k = (len(xs) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(xs) - 1)
+    return xs[lo] + (xs[hi] - xs[lo]) * (k - lo)
+
+
+def _summarize(host, records):
+    # cache hits never touched the network, so they don't count towards latency
+    latencies = [r["latency"] for r in records if r.get("latency") is not None]
+    return {
+        "host": host,
+        "requests": len(records),
+        "from_cache": sum(r["cache"] in ("hit", "revalidated") for r in records),
+        "errors": sum(r["status"] is None or r["status"] >= 400 for r in records),
+        "retries": sum(r["retries"] for r in records),
+        "p50_latency": percentile(latencies, 50),
+        "p95_latency": percentile(latencies, 95),
+        "p99_latency": percentile(latencies, 99),
+        "bytes": sum(r["bytes"] for r in records),
+        # traces from before transfer compression was tracked only know the decoded size
+        "wire_bytes": sum(r.get("wire_bytes", r["bytes"]) for r in records),
+        "working_seconds": sum(latencies),
+        "throttle_wait_seconds": sum(r["throttle_wait"] for r in records),
+        "backoff_seconds": sum(r["backoff"] for r in records),
+    }
+
+
+def build_report(records, wall=None):
+    """Per-host and overall summaries of a run's request traces."""
+    by_host = {}
+    for r in records:
+        by_host.setdefault(r["host"], []).append(r)
+    hosts = [_summarize(host, rs) for host, rs in sorted(by_host.items())]
+    totals = _summarize("all", records)
+    totals["sleeping_seconds"] = totals["throttle_wait_seconds"] + totals["backoff_seconds"]
+    totals["wall_seconds"] = wall
+    return {"hosts": hosts, "totals": totals}
+
+
+def write_report(report, directory):
+    """Write `report.json` and a per-host `report.csv` into `directory`; return their paths."""
+    directory = Path(directory)
+    json_path = directory / "report.json"
+    csv_path = directory / "report.csv"
+    json_path.write_text(json.dumps(report, indent=2))
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=REPORT_FIELDS, extrasaction="ignore")
+        w.writeheader()
+        w.writerows([*report["hosts"], report["totals"]])
+    return json_path, csv_path
+
+
+def print_report(report):
+    def ms(seconds):
+        return "-" if seconds is None else f"{seconds * 1000:.0f}"
+
+    print("\nHTTP telemetry:")
+    print(
+        f"  {'host':<48} {'reqs':>5} {'cached':>6} {'retry':>5} "
+        f"{'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'MB':>7} {'wire MB':>8}"
+    )
+    for h in [*report["hosts"], report["totals"]]:
+        print(
+            f"  {h['host']:<48} {h['requests']:>5} {h['from_cache']:>6} {h['retries']:>5} "
+            f"{ms(h['p50_latency']):>7} {ms(h['p95_latency']):>7} {ms(h['p99_latency']):>7} "
+            f"{h['bytes'] / 2**20:>7.1f} {h['wire_bytes'] / 2**20:>8.1f}"
+        )
+    t = report["totals"]
+    print(
+        f"  request time: {t['working_seconds']:.1f}s working vs {t['sleeping_seconds']:.1f}s "
+        f"sleeping ({t['throttle_wait_seconds']:.1f}s rate limiter, "
+        f"{t['backoff_seconds']:.1f}s retry backoff)"
+    )
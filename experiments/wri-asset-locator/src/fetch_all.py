@@ -1,45 +1,450 @@
 #!/usr/bin/env python3
-"""Fetch all WRI datasets by running each fetch notebook in sequence."""
+# /// script
+# requires-python = ">=3.11"
+# dependencies = [
+#     "brotli==1.1.0",
+#     "ijson==3.4.0",
+#     "marimo",
+#     "pandas==2.3.3",
+#     "pdfplumber==0.11.10",
+#     "pyarrow==22.0.0",
+#     "requests==2.32.5",
+# ]
+# ///
+"""Fetch all WRI datasets and combine them, running independent stages in parallel.
 
+There is one fetch stage per source in `connectors/registry.py`. They don't
+depend on each other, so they run concurrently on a bounded worker pool.
+`combine_assets_data.py` starts once every fetcher it reads from has finished
+and all of its input CSVs exist.
+
+Fetchers run headless through `fetch_cli.py`, which calls each notebook's
+`fetch()` without executing its UI cells (or, for a source declared without a
+notebook, crawls it with the registry's engine); the combine notebook runs in
+full. In-process, every source's page requests share one bounded thread pool
+(`connectors/pool.py`) besides the HTTP cache and rate limiter.
+By default each stage runs in its own `uv run` process. With `--in-process`
+the notebooks are loaded into this interpreter instead, so dependencies are
+resolved and imported once; run it through uv so the union of the notebooks'
+dependencies (declared above) is available.
+
+Every stage that succeeds records the hashes of its inputs, code, settings and
+outputs (see `connectors/freshness.py`). With `--skip-fresh`, stages whose
+record still holds are skipped: fetchers younger than their source's TTL, and
+combine when none of its inputs changed. `--force` rebuilds the named stages
+anyway; `--only` runs just the named ones.
+
+Run it through uv, which installs the dependencies declared above: the
+connectors it imports need `requests` and `pandas`, so a bare `python` may not
+have them.
+
+Usage: uv run src/fetch_all.py [--workers N] [--resume]
+       uv run src/fetch_all.py --skip-fresh [--force rw]
+       uv run src/fetch_all.py --only eae combine
+       uv run src/fetch_all.py --in-process [--workers N]
+"""
+
+import argparse
+import importlib
+import os
 import subprocess
 import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
 from pathlib import Path
 
-FETCH_NOTEBOOKS = [
-    "fetch_datasets_arcgis_wri_catalog.py",
-    "fetch_datasets_global_forest_watch.py",
-    "fetch_datasets_resource_watch_datasets.py",
-    "fetch_datasets_scrape_pdfreport_energy_access_explorer.py",
-    "fetch_datasets_wri_data_explorer.py",
-    "combine_assets_data.py",  # Combines all individual datasets
-]
+from connectors import freshness, registry
+
+
+@dataclass
+class Stage:
+    """One node of the fetch graph: a notebook, the files it writes, and its upstream stages.
+
+    `notebook` is None for a registered source crawled by the registry's engine.
+    `inputs` are files in data/ it reads besides its upstream stages' outputs.
+    `ttl` (seconds) is how long its outputs stay fresh, None for as long as its
+    inputs don't change; `settings` are the environment variables its outputs depend on.
+    """
+
+    notebook: str | None
+    outputs: list[str]
+    depends_on: list[str] = field(default_factory=list)
+    inputs: list[str] = field(default_factory=list)
+    ttl: float | None = None
+    settings: list[str] = field(default_factory=list)
+
+
+# scripts that run every stage: their code is part of each stage's build record
+RUNNER_SCRIPTS = ["fetch_all.py", "fetch_cli.py"]
+
+# environment variables that change what the fetchers write (see main())
+FETCH_SETTINGS = ["FETCH_RW_APPLICATIONS", "FETCH_RW_LAYERS", "FETCH_SKIP_RESOURCES"]
+
+# one fetcher per registered source
+FETCH_STAGES = {
+    name: Stage(
+        source.notebook,
+        [source.output],
+        inputs=source.inputs,
+        ttl=source.ttl,
+        settings=FETCH_SETTINGS,
+    )
+    for name, source in registry.SOURCES.items()
+}
+
+STAGES = {
+    **FETCH_STAGES,
+    # Combines all individual datasets
+    "combine": Stage(
+        "combine_assets_data.py",
+        ["wri_assets_info_combined.csv"],
+        depends_on=list(FETCH_STAGES),
+        settings=["FETCH_DEDUP"],
+    ),
+}
+
+
+def use_combined_rw(stages=STAGES):
+    """Fetch Resource Watch and GFW in one crawl: the RW stage writes both CSVs."""
+    gfw = stages.pop("gfw")
+    rw = stages["rw"]
+    rw.outputs = [*rw.outputs, *gfw.outputs]
+    for stage in stages.values():
+        if "gfw" in stage.depends_on:
+            stage.depends_on = [d for d in stage.depends_on if d != "gfw"]
+    # read by the RW notebook (see fetch_datasets_resource_watch_datasets.py)
+    os.environ["FETCH_RW_APPLICATIONS"] = "rw,gfw"
+
+
+def upstream_outputs(name, stages=STAGES):
+    """The outputs of every stage `name` depends on."""
+    return [f for dep in stages[name].depends_on for f in stages[dep].outputs]
+
+
+def stage_inputs(name, stages=STAGES):
+    """Files a stage reads: its upstream stages' outputs and its own `inputs`."""
+    return [*upstream_outputs(name, stages), *stages[name].inputs]
+
+
+@dataclass
+class StageResult:
+    status: str  # ok | failed | skipped | fresh (up to date) | excluded (not in --only)
+    seconds: float = 0.0
+    startup: float | None = None  # time to load the notebook, when measurable
+    output: str = ""
+
+
+def run_stage(name, src_dir):
+    """Run one stage in its own `uv run` process: a fetcher headless, combine as a script."""
+    if name in FETCH_STAGES:
+        command = ["uv", "run", str(src_dir / "fetch_cli.py"), name]
+    else:
+        command = ["uv", "run", str(src_dir / STAGES[name].notebook)]
+    t0 = time.perf_counter()
+    # Run from src/ so every notebook resolves the same data/ directory
+    proc = subprocess.run(
+        command,
+        cwd=src_dir,
+        capture_output=True,
+        text=True,
+    )
+    status = "ok" if proc.returncode == 0 else "failed"
+    return StageResult(status, time.perf_counter() - t0, output=proc.stdout + proc.stderr)
+
+
+def run_stage_in_process(name, src_dir):
+    """Import a notebook module and run it in this interpreter.
+
+    Startup is the module import (including the notebook's setup cell); work is
+    a fetcher's `fetch()` (headless, as `fetch_cli.py` runs it) or, for combine,
+    `app.run()`, which executes every cell as `uv run` would.
+    """
+    t0 = time.perf_counter()
+    try:
+        if name in FETCH_STAGES:
+            fetch = registry.load_fetch(name)
+            startup = time.perf_counter() - t0
+            fetch()
+        else:
+            module = importlib.import_module(Path(STAGES[name].notebook).stem)
+            startup = time.perf_counter() - t0
+            module.app.run()
+    except (Exception, SystemExit) as e:
+        return StageResult("failed", time.perf_counter() - t0, output=f"{type(e).__name__}: {e}")
+    return StageResult("ok", time.perf_counter() - t0, startup=startup)
+
+
+def warm_interpreter(src_dir):
+    """Import the shared heavy dependencies once, before any notebook is loaded."""
+    # Notebooks resolve data/ relative to the working directory and import from src/
+    os.chdir(src_dir)
+    sys.path.insert(0, str(src_dir))
+    t0 = time.perf_counter()
+    import marimo  # noqa: F401
+    import pandas  # noqa: F401
+    import requests  # noqa: F401
+
+    return time.perf_counter() - t0
+
+
+class BuildState:
+    """The stages' build records (see connectors/freshness.py) and which stages may be skipped.
+
+    With `skip_fresh`, `stale_reason` returns None for stages whose record still
+    holds, except those in `force`. Records are updated as stages succeed either way.
+    """
+
+    def __init__(self, src_dir, data_dir, skip_fresh=False, force=()):
+        self.src_dir = src_dir
+        self.data_dir = data_dir
+        self.path = data_dir / freshness.STATE_PATH.name
+        self.state = freshness.load_state(self.path)
+        self.skip_fresh = skip_fresh
+        self.force = set(force)
+        self.started = {}  # stage -> (input hashes, code hash, settings) it started with
+
+    def _current(self, name):
+        stage = STAGES[name]
+        inputs = freshness.digests(self.data_dir / f for f in stage_inputs(name))
+        scripts = [*RUNNER_SCRIPTS, *([stage.notebook] if stage.notebook else [])]
+        code = freshness.code_digest([self.src_dir / f for f in scripts])
+        return inputs, code, freshness.settings(stage.settings)
+
+    def stale_reason(self, name):
+        """Why `name` must run ("" when not checked), or None to skip it as up to date."""
+        self.started[name] = self._current(name)
+        if not self.skip_fresh:
+            return ""
+        if name in self.force:
+            return "forced"
+        stage = STAGES[name]
+        outputs = [self.data_dir / f for f in stage.outputs]
+        return freshness.stale_reason(
+            self.state.get(name), *self.started[name], outputs, ttl=stage.ttl
+        )
+
+    def describe(self, name):
+        age = freshness.format_age(time.time() - self.state[name]["built_at"])
+        ttl = STAGES[name].ttl
+        if ttl is None:
+            return f"no input changed since it was built {age} ago"
+        return f"built {age} ago, TTL {freshness.format_age(ttl)}"
+
+    def record(self, name):
+        stage = STAGES[name]
+        inputs, code, env = self.started.pop(name)
+        # a stage may refresh its own inputs (EAE re-downloads a changed PDF): record what it read
+        inputs = {**inputs, **freshness.digests(self.data_dir / f for f in stage.inputs)}
+        outputs = [self.data_dir / f for f in stage.outputs]
+        self.state[name] = freshness.make_record(inputs, code, env, outputs)
+        freshness.save_state(self.state, self.path)
+
+
+def run_graph(src_dir, data_dir, workers, runner=run_stage, builds=None, only=None):
+    """Run every stage once its dependencies succeeded; return {stage: StageResult}.
+
+    `builds` (a `BuildState`) skips up-to-date stages and records the ones that
+    succeed; `only` limits the run to those stages.
+    """
+    pending = dict(STAGES)
+    running = {}
+    results = {}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while pending or running:
+            for name in list(pending):
+                deps = pending[name].depends_on
+                if any(results[d].status in ("failed", "skipped") for d in deps if d in results):
+                    print(f"- Skipping {name}: an upstream stage failed", file=sys.stderr)
+                    results[name] = StageResult("skipped")
+                    del pending[name]
+                elif all(d in results for d in deps):
+                    # a stage's own inputs may not exist yet (EAE downloads its PDF)
+                    missing = [f for f in upstream_outputs(name) if not (data_dir / f).exists()]
+                    if missing:
+                        print(f"- Skipping {name}: missing inputs {missing}", file=sys.stderr)
+                        results[name] = StageResult("skipped")
+                    elif only is not None and name not in only:
+                        results[name] = StageResult("excluded")
+                    elif builds is not None and (reason := builds.stale_reason(name)) is None:
+                        print(f"= Up to date: {name} ({builds.describe(name)})")
+                        results[name] = StageResult("fresh")
+                    else:
+                        notebook = STAGES[name].notebook or "connectors/registry.py"
+                        why = f": {reason}" if builds is not None and reason else ""
+                        print(f"→ Starting {name} ({notebook}){why}")
+                        running[pool.submit(runner, name, src_dir)] = name
+                    del pending[name]
+
+            if not running:
+                if pending:
+                    raise RuntimeError(f"Unresolvable dependencies for: {', '.join(pending)}")
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                result = results[name] = future.result()
+                if result.status == "ok":
+                    print(f"✓ Completed {name} in {result.seconds:.1f}s")
+                    if builds is not None:
+                        builds.record(name)
+                else:
+                    print(f"✗ Failed: {name}", file=sys.stderr)
+                    print(result.output, file=sys.stderr)
+
+    return results
+
+
+def print_timings(results, wall, warmup=None):
+    print("\nStage timings:")
+    if warmup is not None:
+        print(f"  {'(warm-up)':<14} {'':<8} {warmup:7.1f}s  importing marimo, pandas, requests")
+    for name, r in results.items():
+        line = f"  {name:<14} {r.status:<8} {r.seconds:7.1f}s"
+        if r.startup is not None:
+            line += f"  (startup {r.startup:.2f}s, work {r.seconds - r.startup:.1f}s)"
+        print(line)
+    busy = sum(r.seconds for r in results.values())
+    print(f"  {'total':<14} {'':<8} {wall:7.1f}s wall ({busy:.1f}s of stage time)")
 
 
 def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=len(FETCH_STAGES),
+        help="Maximum number of notebooks to run at once (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        help="Seconds a cached HTTP response is reused before revalidating it (default: 12h)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Bypass the shared on-disk HTTP response cache (data/.http_cache)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue interrupted fetches from their page checkpoints (data/.checkpoints)",
+    )
+    parser.add_argument(
+        "--skip-resources",
+        action="store_true",
+        help="Don't build the WRI Data Explorer resources side table (saves memory)",
+    )
+    parser.add_argument(
+        "--combined-rw",
+        action="store_true",
+        help="Crawl Resource Watch and GFW once (application=rw,gfw) and split the rows locally",
+    )
+    parser.add_argument(
+        "--lazy-layers",
+        action="store_true",
+        help="Fetch RW/GFW layer names in a second, cached phase instead of with every page",
+    )
+    parser.add_argument(
+        "--dedup",
+        choices=["merge", "flag", "off"],
+        default="flag",
+        help="Merge rows of the same dataset across sources in the combine step, only flag "
+        "them, or neither (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--skip-fresh",
+        action="store_true",
+        help="Skip up-to-date stages: fetchers younger than their source's TTL, and combine "
+        "when none of its inputs changed (see connectors/freshness.py)",
+    )
+    parser.add_argument(
+        "--force",
+        nargs="+",
+        default=[],
+        metavar="STAGE",
+        help="Rebuild these stages even if they are up to date (implies --skip-fresh)",
+    )
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        metavar="STAGE",
+        help="Run only these stages, e.g. `--only rw combine`",
+    )
+    parser.add_argument(
+        "--in-process",
+        action="store_true",
+        help="Run the notebooks' marimo apps in this interpreter instead of one `uv run` each",
+    )
+    args = parser.parse_args()
+
+    # Cache settings reach the notebooks through the environment (see connectors/cache.py)
+    if args.no_cache:
+        os.environ["FETCH_NO_CACHE"] = "1"
+    if args.cache_ttl is not None:
+        os.environ["FETCH_CACHE_TTL"] = str(args.cache_ttl)
+    # ...and so does resuming (see connectors/checkpoint.py)
+    if args.resume:
+        os.environ["FETCH_RESUME"] = "1"
+    if args.skip_resources:
+        os.environ["FETCH_SKIP_RESOURCES"] = "1"
+    if args.combined_rw:
+        use_combined_rw()
+    if args.lazy_layers:
+        os.environ["FETCH_RW_LAYERS"] = "lazy"
+    # read by the combine notebook (see connectors/dedup.py)
+    os.environ["FETCH_DEDUP"] = args.dedup
+    if unknown := sorted(set(args.force) | set(args.only or ()) - set(STAGES)):
+        parser.error(f"unknown stages {unknown}; choose from {', '.join(STAGES)}")
+
     print("Fetching all WRI assets and combining data...")
-    print(f"Running {len(FETCH_NOTEBOOKS)} scripts\n")
+    print(f"Running {len(STAGES)} scripts with up to {args.workers} workers\n")
 
     # Get src directory (where this script lives)
-    src_dir = Path(__file__).parent
+    src_dir = Path(__file__).resolve().parent
 
     # Ensure data directory exists (relative to src/)
     data_dir = src_dir.parent / "data"
     data_dir.mkdir(parents=True, exist_ok=True)
 
-    # Run each notebook from the src directory
-    for i, notebook in enumerate(FETCH_NOTEBOOKS, 1):
-        print(f"[{i}/{len(FETCH_NOTEBOOKS)}] Running {notebook}...")
-        try:
-            notebook_path = src_dir / notebook
-            subprocess.run(["uv", "run", str(notebook_path)], check=True)
-            print(f"✓ Completed {notebook}\n")
-        except subprocess.CalledProcessError as e:
-            print(f"✗ Failed: {notebook}", file=sys.stderr)
-            sys.exit(1)
-
-    print(f"✓ All assets fetched and combined successfully!")
+    # Every notebook appends its HTTP requests here (see connectors/telemetry.py)
+    telemetry_dir = data_dir / "telemetry"
+    telemetry_dir.mkdir(exist_ok=True)
+    requests_log = telemetry_dir / "requests.jsonl"
+    requests_log.unlink(missing_ok=True)
+    os.environ["FETCH_TELEMETRY_FILE"] = str(requests_log)
+    # each stage's process starts from the per-host rates earlier ones learned
+    # (see connectors/ratelimit.py); kept across runs
+    os.environ.setdefault("FETCH_RATE_STATE", str(telemetry_dir / "rate_limits.json"))
+
+    t0 = time.perf_counter()
+    warmup = warm_interpreter(src_dir) if args.in_process else None
+    runner = run_stage_in_process if args.in_process else run_stage
+    builds = BuildState(
+        src_dir, data_dir, skip_fresh=args.skip_fresh or bool(args.force), force=args.force
+    )
+    results = run_graph(
+        src_dir, data_dir, max(1, args.workers), runner=runner, builds=builds, only=args.only
+    )
+    wall = time.perf_counter() - t0
+    print_timings(results, wall, warmup=warmup)
+
+    from connectors import telemetry
+
+    report = telemetry.build_report(telemetry.load_requests(requests_log), wall=wall)
+    telemetry.print_report(report)
+    json_path, csv_path = telemetry.write_report(report, telemetry_dir)
+    print(f"  per-request log: {requests_log}\n  report: {json_path}, {csv_path}")
+
+    if any(r.status in ("failed", "skipped") for r in results.values()):
+        sys.exit(1)
+
+    print("\n✓ All assets fetched and combined successfully!")
     print(f"Data files are in: {data_dir.absolute()}")
-    print(f"\nCombined data available in: wri_assets_info_combined.csv")
+    print("\nCombined data available in: wri_assets_info_combined.csv")
 
 
 if __name__ == "__main__":
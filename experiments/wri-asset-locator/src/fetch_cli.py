@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# /// script
+# requires-python = ">=3.11"
+# dependencies = [
+#     "brotli==1.1.0",
+#     "ijson==3.4.0",
+#     "marimo",
+#     "pandas==2.3.3",
+#     "pdfplumber==0.11.10",
+#     "pyarrow==22.0.0",
+#     "requests==2.32.5",
+# ]
+# ///
+"""Run one fetch notebook headless: just its `fetch()`, none of its UI cells.
+
+Every fetch notebook defines a top-level `fetch(page_size, max_workers,
+output_format, out_dir)` that does the whole crawl and writes the outputs; its
+cells only call it and display the result. This imports the notebook as a
+module and calls `fetch()` directly, so previews, tables and buttons never run.
+Sources are those in `connectors/registry.py`; one declared there without a
+notebook is crawled by the registry's engine, with the same options.
+`fetch_all.py` runs every fetcher this way; cron can too. The `FETCH_*`
+environment variables (cache, resume, combined RW, lazy layers, ...) apply as usual.
+
+`--format parquet` skips the CSVs, which the combine step and the WRI Data
+Explorer incremental sync read.
+
+Usage: uv run src/fetch_cli.py rw [--page-size 200] [--workers 8]
+                               [--format csv|parquet|both] [--out-dir DIR]
+"""
+
+import argparse
+import inspect
+import os
+import sys
+import time
+from pathlib import Path
+
+from connectors import OUTPUT_FORMATS, registry
+
+SRC_DIR = Path(__file__).resolve().parent
+
+
+def fetch_kwargs(source, fetch, page_size=None, workers=None, output_format="both", out_dir=None):
+    """Keyword arguments for `fetch`; raises ValueError for options the source doesn't take."""
+    kwargs = {"output_format": output_format}
+    if out_dir is not None:
+        kwargs["out_dir"] = Path(out_dir)
+    params = inspect.signature(fetch).parameters
+    options = [("--page-size", "page_size", page_size), ("--workers", "max_workers", workers)]
+    for option, name, value in options:
+        if value is None:
+            continue
+        if name not in params:
+            raise ValueError(f"{option} doesn't apply to {source}")
+        kwargs[name] = value
+    return kwargs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", choices=list(registry.SOURCES))
+    parser.add_argument("--page-size", type=int, help="Rows per API page (default: the source's)")
+    parser.add_argument("--workers", type=int, help="Pages fetched at once (default: the source's)")
+    parser.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default="both",
+        help="Write the CSV, the typed Parquet copy, or both (default: %(default)s)",
+    )
+    parser.add_argument("--out-dir", type=Path, help="Output directory (default: data/)")
+    args = parser.parse_args()
+
+    out_dir = args.out_dir.resolve() if args.out_dir else None
+    # notebooks resolve data/ (and their caches) relative to the working directory
+    os.chdir(SRC_DIR)
+    if out_dir is not None:
+        out_dir.mkdir(parents=True, exist_ok=True)
+
+    t0 = time.perf_counter()
+    fetch = registry.load_fetch(args.source)
+    try:
+        kwargs = fetch_kwargs(
+            args.source, fetch, args.page_size, args.workers, args.format, out_dir
+        )
+    except ValueError as e:
+        sys.exit(str(e))
+    fetch(**kwargs)
+    print(f"{args.source}: done in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
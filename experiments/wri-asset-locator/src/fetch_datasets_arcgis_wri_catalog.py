@@ -1,8 +1,10 @@
 # /// script
 # requires-python = ">=3.11"
 # dependencies = [
+#     "brotli==1.1.0",
 #     "marimo",
 #     "pandas==2.3.3",
+#     "pyarrow==22.0.0",
 #     "requests==2.32.5",
 # ]
 # ///
@@ -12,9 +14,25 @@ import marimo
 __generated_with = "0.17.2"
 app = marimo.App(width="medium")
 
+with app.setup:
+    import marimo as mo
+    import pandas as pd
+    from pathlib import Path
+
+    # shared ArcGIS Hub connector and HTTP client (src/connectors/)
+    from connectors import Checkpoint, arcgis, get_json, print_summary, registry
+
+    # Calculate data directory - works whether run from src/ or root
+    SCRIPT_DIR = Path.cwd()
+    DATA_DIR = SCRIPT_DIR.parent / "data" if SCRIPT_DIR.name == "src" else SCRIPT_DIR / "data"
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+
+    BASE = arcgis.BASE
+    OUTFILE = DATA_DIR / "wri_arcgis_catalog_01.csv"
+
 
 @app.cell(hide_code=True)
-def _(mo):
+def _():
     mo.md(
         r"""
     ## ArcGIS Hub (WRI Data Catalogue) → `wri_arcgis_catalog_01.csv`
@@ -26,8 +44,8 @@ def _(mo):
     **Endpoints**
 
     * Discovery: `GET /api/search/v1/collections` (used to find the `dataset` collection)
-    * Data: `GET /api/search/v1/collections/dataset/items?limit=100`
-      (follow `links[]` where `rel="next"` until exhausted)
+    * Data: `GET /api/search/v1/collections/dataset/items?limit=100&startindex=N`
+      (page 1 reports `numberMatched`, which gives every other `startindex` up front)
 
     **Structure**
 
@@ -43,6 +61,20 @@ def _(mo):
 
     **Implementation notes**
 
+    * Pages are fetched by the shared paging engine (`connectors.paging`) as declared by the
+      `arcgis` source in `connectors/registry.py`; row flattening lives in `connectors.arcgis`.
+      The remaining pages are fetched concurrently over one pooled session and kept in offset
+      order; if the server's `rel="next"` links aren't `startindex`-based, it falls back to
+      following them one by one.
+    * Every page is checkpointed under `data/.checkpoints/arcgis/`; run with `FETCH_RESUME=1`
+      (or `fetch_all.py --resume`) to continue an interrupted crawl. The CSV is only replaced
+      once the crawl completes; the raw pages are then appended to
+      `data/raw_archive/arcgis.jsonl.gz`, from which `renormalize.py` rebuilds the CSV offline.
+    * Rows are never all held in memory: they are ordered by an on-disk merge sort and written
+      to the CSV and Parquet a row group at a time (`arcgis.write_rows`).
+    * `fetch()` does the whole crawl without touching the UI; `fetch_cli.py` (and so
+      `fetch_all.py` and cron) calls it headless with `--page-size`, `--workers`, `--format`
+      and `--out-dir`.
     * Descriptions can be verbose; we strip HTML and add a short summary field.
     * The dataset collection on this Hub currently returns a small, curated set (we observed `numberMatched` ≈ 23). This may change.
     """
@@ -50,122 +82,43 @@ def _(mo):
     return
 
 
-@app.cell
-def _():
-    import marimo as mo
-    import requests
-    import pandas as pd
-    from pprint import pprint
-    import json
-    import re, html
-    import datetime as dt
-    from pathlib import Path
-
-    return Path, dt, html, mo, pd, re, requests
-
-
-@app.cell
-def _(Path):
-    # Calculate data directory - works whether run from src/ or root
-    SCRIPT_DIR = Path.cwd()
-    DATA_DIR = SCRIPT_DIR.parent / "data" if SCRIPT_DIR.name == "src" else SCRIPT_DIR / "data"
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
-
-    BASE = "https://wri-data-catalogue-worldresources.hub.arcgis.com/api/search/v1/collections/dataset/items"
-    return BASE, DATA_DIR
+@app.function
+def fetch(
+    page_size=arcgis.PAGE_SIZE,
+    max_workers=arcgis.MAX_WORKERS,
+    output_format="both",
+    out_dir=DATA_DIR,
+):
+    """Crawl and write this source's outputs with no UI; `fetch_cli.py` runs it headless."""
+    # every page is checkpointed, FETCH_RESUME=1 continues an interrupted crawl
+    checkpoint = Checkpoint("arcgis", params={"limit": page_size})
+    rows = arcgis.crawl_rows(
+        registry.SOURCES["arcgis"], checkpoint, page_size=page_size, max_workers=max_workers
+    )
+    # FIELDS columns, sorted by updatedAt desc; the CSV is only replaced once it's
+    # complete; plus a typed Parquet copy
+    writer = arcgis.write_rows(rows, Path(out_dir) / OUTFILE.name, output_format)
+    # keep the raw pages in the compressed archive (data/raw_archive/) for renormalize.py
+    checkpoint.finish()
+    print(f"Wrote {writer.rows} rows to {' and '.join(str(p) for p in writer.paths)}")
+    print_summary()
+    return writer.paths
 
 
 @app.cell
-def _(BASE, requests):
-    js_first = requests.get(BASE, params={"limit": 1}, timeout=60).json()
+def _():
+    js_first = get_json(BASE, params={"limit": 1})
     print("Number of datasets we will be fetching: ", js_first["numberMatched"])
     return
 
 
 @app.cell
-def _(BASE, dt, html, pd, re, requests):
-    def ms_to_iso(ms):
-        if not ms:
-            return ""
-        try:
-            return dt.datetime.utcfromtimestamp(int(ms) / 1000).isoformat() + "Z"
-        except Exception:
-            return ""
-
-    TAG_RE = re.compile(r"<[^>]+>")
-    WS_RE = re.compile(r"\s+")
-
-    def clean_html(s):
-        if not s:
-            return ""
-        # strip tags + unescape entities
-        return html.unescape(TAG_RE.sub("", s)).strip()
-
-    def pick_url(links):
-        if not isinstance(links, list):
-            return ""
-        for rel in ("self", "hub", "canonical"):
-            for ln in links:
-                if isinstance(ln, dict) and ln.get("rel") == rel and ln.get("href"):
-                    return ln["href"]
-        return ""
-
-    def fetch_all(limit=100):
-        url, params = BASE, {"limit": limit}
-        while True:
-            r = requests.get(url, params=params, timeout=60)
-            r.raise_for_status()
-            js = r.json()
-            for f in js.get("features") or []:
-                yield f
-            # follow rel=next
-            next_href = ""
-            for ln in js.get("links") or []:
-                if isinstance(ln, dict) and ln.get("rel") == "next" and ln.get("href"):
-                    next_href = ln["href"]
-                    break
-            if not next_href:
-                break
-            url, params = next_href, None  # next is a full URL
-
-    def normalize_feature(f):
-        p = f.get("properties") or {}
-        links = p.get("links") or []
-        return {
-            "id": p.get("id") or f.get("id"),
-            "name": p.get("name") or p.get("title"),
-            "slug": p.get("slug") or "",
-            "provider": p.get("owner") or p.get("source") or "",
-            "tags": ", ".join(p.get("tags") or p.get("keywords") or []),
-            "layerCount": "",  # not exposed here
-            "layerNames": "",  # not exposed here
-            "createdAt": ms_to_iso(p.get("created")),
-            "dataLastUpdated": ms_to_iso(p.get("modified")),
-            "updatedAt": ms_to_iso(p.get("modified")),
-            "license": p.get("license") or "",
-            "type": p.get("type"),
-            "url": pick_url(links),
-            "description": clean_html(p.get("description") or p.get("searchDescription") or ""),
-        }
-
-    def build_df(limit=100):
-        rows = [normalize_feature(f) for f in fetch_all(limit=limit)]
-        df = pd.DataFrame(rows)
-        # optional: sort by updatedAt desc
-        if "updatedAt" in df.columns:
-            df = df.sort_values("updatedAt", ascending=False, na_position="last")
-        return df
-
-    return build_df, normalize_feature
-
-
-@app.cell
-def _(BASE, normalize_feature, pd, requests):
+def _():
     # for sanity checks.
     df_preview = pd.DataFrame(
         [
-            normalize_feature(f)
-            for f in requests.get(BASE, params={"limit": 5}, timeout=60).json().get("features", [])
+            arcgis.normalize_feature(f)
+            for f in get_json(BASE, params={"limit": 5}).get("features", [])
         ]
     )
     df_preview
@@ -173,20 +126,12 @@ def _(BASE, normalize_feature, pd, requests):
 
 
 @app.cell
-def _(build_df):
-    # full run:
-    df_all = build_df(limit=100)
+def _():
+    # full run; read back from disk, `fetch` keeps no copy of the table it wrote
+    _path = fetch()[0]
+    df_all = pd.read_parquet(_path) if _path.suffix == ".parquet" else pd.read_csv(_path)
 
     df_all
-    return (df_all,)
-
-
-@app.cell
-def _(DATA_DIR, df_all):
-    ## Write to CSV
-    outfilename = DATA_DIR / "wri_arcgis_catalog_01.csv"
-    df_all.to_csv(outfilename, index=False, encoding="utf-8")
-    print(f"Wrote {len(df_all)} rows to file: {outfilename}")
     return
 
 
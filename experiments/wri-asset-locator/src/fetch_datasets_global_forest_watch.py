@@ -1,9 +1,12 @@
 # /// script
 # requires-python = ">=3.11"
 # dependencies = [
+#     "brotli==1.1.0",
+#     "ijson==3.4.0",
 #     "marimo",
 #     "openai==2.6.1",
 #     "pandas==2.3.3",
+#     "pyarrow==22.0.0",
 #     "requests==2.32.5",
 # ]
 # ///
@@ -14,11 +17,21 @@ __generated_with = "0.17.2"
 app = marimo.App(width="medium")
 
 with app.setup:
+    import os
+
     import marimo as mo
-    import requests
-    import csv, time, sys
     from pathlib import Path
 
+    # shared Resource Watch connector and HTTP client (src/connectors/)
+    from connectors import (
+        facets,
+        get_json,
+        registry,
+        resourcewatch,
+        stream_page,
+        streaming_available,
+    )
+
     # for looking at results
     import pandas as pd
 
@@ -27,9 +40,20 @@ with app.setup:
     DATA_DIR = SCRIPT_DIR.parent / "data" if SCRIPT_DIR.name == "src" else SCRIPT_DIR / "data"
     DATA_DIR.mkdir(parents=True, exist_ok=True)
 
-    BASE = "https://api.resourcewatch.org/v1/dataset"
+    APPLICATION = "gfw"
     OUTFILE = DATA_DIR / "global_forest_watch_datasets.csv"
 
+    # parse pages item by item when `ijson` is installed instead of loading each body whole
+    STREAM_JSON = streaming_available()
+
+    # "include" requests layers with every page; "lazy" fetches light pages, then layer names
+    # only for new/changed datasets (FETCH_RW_LAYERS=lazy, or fetch_all.py --lazy-layers)
+    LAYERS = os.environ.get("FETCH_RW_LAYERS", "include")
+
+    # the application gut check reads the facet index, which only covers datasets the rw/gfw
+    # crawls returned; FETCH_RW_FULL_CATALOG=1 crawls the whole unfiltered catalog instead
+    FULL_CATALOG = os.environ.get("FETCH_RW_FULL_CATALOG") == "1"
+
 
 @app.cell(hide_code=True)
 def _():
@@ -51,6 +75,24 @@ def _():
     **Implementation notes**
 
     * We request `includes=vocabulary,layer` to collect tags and layer names in one pass.
+      With `LAYERS = "lazy"` (`FETCH_RW_LAYERS=lazy`) pages are requested with
+      `includes=vocabulary` only, and layer names are then fetched per dataset
+      (`/v1/dataset/<id>/layer`, in parallel) for datasets that are new or whose `updatedAt`
+      changed; the rest come from `data/.layer_cache/`.
+    * Pages are fetched by the shared paging engine (`connectors.paging`) as declared by the
+      `gfw` source in `connectors/registry.py`; row extraction lives in `connectors.resourcewatch`.
+    * Page 1 tells us `meta.total-items`; pages 2..N are then fetched concurrently over one pooled
+      session and written in page order, so the CSV matches a serial crawl.
+    * With `ijson` installed, each page body is spooled to disk and parsed one dataset at a time,
+      so memory stays flat as `page[size]` grows; without it pages are decoded whole.
+    * Each dataset's `application` list is recorded in the application facet index
+      (`data/rw_application_index/`), which the gut check below reads instead of crawling
+      the whole catalog. The index only covers the datasets the rw/gfw crawls returned, so
+      applications sharing no dataset with them are missing; `FETCH_RW_FULL_CATALOG=1` makes
+      the gut check crawl the whole catalog instead.
+    * `fetch()` does the whole crawl without touching the UI; `fetch_cli.py` (and so
+      `fetch_all.py` and cron) calls it headless with `--page-size`, `--workers`, `--format`
+      and `--out-dir`. In the editor the crawl waits for the Run button.
     * Some datasets may have no layers/tags; fields remain empty.
     * API is live; counts change over time. 
     """
@@ -58,121 +100,23 @@ def _():
     return
 
 
-@app.cell
-def _():
-    FIELDS = [
-        "id",
-        "name",
-        "slug",
-        "provider",
-        "tags",
-        "layerCount",
-        "layerNames",
-        "createdAt",
-        "dataLastUpdated",
-        "updatedAt",
-    ]
-    return (FIELDS,)
-
-
 @app.function
-def get_page(page_number, page_size=100, session=None):
-    s = session or requests.Session()
-    params = {
-        "application": "gfw",
-        "env": "production",
-        "published": "true",
-        "includes": "vocabulary,layer",
-        "page[size]": page_size,
-        "page[number]": page_number,
-    }
-    for attempt in range(5):
-        try:
-            r = s.get(BASE, params=params, timeout=60)
-            if r.status_code == 429:  # throttled
-                time.sleep(1.5 * (attempt + 1))
-                continue
-            r.raise_for_status()
-            return r.json()
-        except requests.RequestException as e:
-            # transient retry
-            if attempt < 4:
-                time.sleep(1.5 * (attempt + 1))
-                continue
-            raise e
-
-
-@app.function
-def extract_rows(js):
-    rows = []
-    for item in js.get("data", []):
-        attr = item.get("attributes", {}) or {}
-
-        # tags from vocabulary (flatten & unique)
-        tags = set()
-        for vocab in attr.get("vocabulary") or []:
-            tags.update(vocab.get("attributes", {}).get("tags", []) or [])
-        tags_list = sorted(tags)
-
-        # layer names (if present in include)
-        layer_names = []
-        for lyr in attr.get("layer") or []:
-            if isinstance(lyr, dict):
-                nm = (lyr.get("attributes") or {}).get("name") or lyr.get("name")
-                if nm:
-                    layer_names.append(nm)
-
-        row = {
-            "id": item.get("id"),
-            "name": attr.get("name"),
-            "slug": attr.get("slug"),
-            "provider": attr.get("provider"),
-            "tags": ", ".join(tags_list) if tags_list else "",
-            "layerCount": len(layer_names),
-            "layerNames": " | ".join(layer_names) if layer_names else "",
-            "createdAt": attr.get("createdAt"),
-            "dataLastUpdated": attr.get("dataLastUpdated"),
-            "updatedAt": attr.get("updatedAt"),
-        }
-        rows.append(row)
-    return rows
-
-
-@app.cell
-def _(FIELDS):
-    def main():
-        s = requests.Session()
-        first = get_page(1, session=s)
-        if not first or "meta" not in first:
-            print("Unexpected API response; missing 'meta'.", file=sys.stderr)
-            sys.exit(1)
-
-        total_pages = first.get("meta", {}).get("total-pages") or 1
-        total_items = first.get("meta", {}).get("total-items")
-        print(f"API reports {total_items} items across {total_pages} pages.")
-
-        # open CSV and write header
-        with open(OUTFILE, "w", newline="", encoding="utf-8") as f:
-            w = csv.DictWriter(f, fieldnames=FIELDS)
-            w.writeheader()
-
-            # page 1
-            rows = extract_rows(first)
-            for r in rows:
-                w.writerow(r)
-
-            # remaining pages
-            for page_num in range(2, total_pages + 1):
-                js = get_page(page_num, session=s)
-                rows = extract_rows(js)
-                for r in rows:
-                    w.writerow(r)
-                # be polite; avoid hammering the API
-                time.sleep(0.15)
-
-        print(f"Done. Wrote CSV: {OUTFILE}")
-
-    return (main,)
+def fetch(
+    page_size=resourcewatch.PAGE_SIZE,
+    max_workers=resourcewatch.MAX_WORKERS,
+    output_format="both",
+    out_dir=DATA_DIR,
+):
+    """Crawl and write this source's outputs with no UI; `fetch_cli.py` runs it headless."""
+    return resourcewatch.write_csv(
+        registry.SOURCES[APPLICATION],
+        Path(out_dir) / OUTFILE.name,
+        output_format=output_format,
+        page_size=page_size,
+        max_workers=max_workers,
+        stream=STREAM_JSON,
+        layers=LAYERS,
+    )
 
 
 @app.cell
@@ -183,10 +127,11 @@ def _():
 
 
 @app.cell
-def _(main, run_button):
-    mo.stop(not run_button.value)
+def _(run_button):
+    # the button only gates interactive sessions; `python <notebook>` / `marimo export` run it
+    mo.stop(mo.running_in_notebook() and not run_button.value)
 
-    main()
+    fetch()
     return
 
 
@@ -197,10 +142,10 @@ def _():
 
 
 @app.cell
-def _(FIELDS):
+def _():
     # mo.stop(not save_button.value)
     df = pd.read_csv(OUTFILE, dtype=str)
-    df = df[[*FIELDS]]
+    df = df[[*resourcewatch.FIELDS]]
     df
     return (df,)
 
@@ -215,29 +160,50 @@ def _(df):
 def _():
     ## Gut check What other applications are on resorucewatch's API?
 
-    url = "https://api.resourcewatch.org/v1/dataset"
-    params = {
-        "page[size]": 1000,
-        "page[number]": 1,
-        "env": "production",
-        # omit `application` filter to get all
-    }
-    apps = set()
-    while True:
-        r = requests.get(url, params=params, timeout=60)
-        r.raise_for_status()
-        js = r.json()
-        for item in js.get("data", []):
-            attr = item.get("attributes", {})
-            for a in attr.get("application", []) or []:
-                apps.add(a)
-        meta = js.get("meta", {})
-        if params["page[number]"] >= (meta.get("total-pages") or 1):
-            break
-        params["page[number]"] += 1
-
-    print("Distinct applications:", apps)
+    def catalog_application_counts():
+        # every dataset in the catalog: omit the `application` filter
+        params = {"page[size]": 1000, "page[number]": 1, "env": "production"}
+        counts = {}
 
+        def count(attr):
+            for a in attr.get("application", []) or []:
+                counts[a] = counts.get(a, 0) + 1
+
+        while True:
+            # 1000 datasets with `includes` payloads per page: stream them when we can
+            if STREAM_JSON:
+                with stream_page(resourcewatch.BASE, params=params) as streamed:
+                    for attr in streamed.items("data.item.attributes"):
+                        count(attr)
+                    meta = streamed.value("meta", {})
+            else:
+                js = get_json(resourcewatch.BASE, params=params)
+                for item in js.get("data", []):
+                    count(item.get("attributes", {}))
+                meta = js.get("meta", {})
+            if params["page[number]"] >= (meta.get("total-pages") or 1):
+                break
+            params["page[number]"] += 1
+        return dict(sorted(counts.items(), key=lambda kv: (-kv[1], kv[0])))
+
+    if FULL_CATALOG:
+        app_counts = catalog_application_counts()
+        print("Whole catalog crawled (FETCH_RW_FULL_CATALOG=1)")
+    else:
+        # A local lookup in the application facet index the RW and GFW crawls keep up to date
+        # (data/rw_application_index/), instead of crawling the whole catalog again
+        index, crawls = facets.load_index()
+        if not index:
+            print("Application index is empty; run the RW or GFW fetch first.")
+        else:
+            print(
+                f"{len(index)} datasets indexed from the {', '.join(sorted(crawls))} crawls. "
+                "Only applications sharing a dataset with these crawls are listed; "
+                "set FETCH_RW_FULL_CATALOG=1 to crawl the whole catalog."
+            )
+        app_counts = facets.application_counts(index)
+    print("Distinct applications:", set(app_counts))
+    pd.Series(app_counts, name="datasets", dtype="Int64").rename_axis("application")
     return
 
 
@@ -1,9 +1,12 @@
 # /// script
 # requires-python = ">=3.11"
 # dependencies = [
+#     "brotli==1.1.0",
+#     "ijson==3.4.0",
 #     "marimo",
 #     "openai==2.6.1",
 #     "pandas==2.3.3",
+#     "pyarrow==22.0.0",
 #     "requests==2.32.5",
 # ]
 # ///
@@ -14,11 +17,14 @@ __generated_with = "0.17.7"
 app = marimo.App(width="medium")
 
 with app.setup:
+    import os
+
     import marimo as mo
-    import requests
-    import csv, time, sys
     from pathlib import Path
 
+    # shared Resource Watch connector (src/connectors/)
+    from connectors import registry, resourcewatch, streaming_available
+
     # for looking at results
     import pandas as pd
 
@@ -27,9 +33,24 @@ with app.setup:
     DATA_DIR = SCRIPT_DIR.parent / "data" if SCRIPT_DIR.name == "src" else SCRIPT_DIR / "data"
     DATA_DIR.mkdir(parents=True, exist_ok=True)
 
-    BASE = "https://api.resourcewatch.org/v1/dataset"
+    APPLICATION = "rw"
     OUTFILE = DATA_DIR / "resourcewatch_datasets.csv"
 
+    # Combined mode: FETCH_RW_APPLICATIONS=rw,gfw (fetch_all.py --combined-rw) crawls both
+    # applications in one pass and writes each one's CSV
+    APPLICATIONS = os.environ.get("FETCH_RW_APPLICATIONS", APPLICATION).split(",")
+    OUTFILES = {
+        "rw": OUTFILE,
+        "gfw": DATA_DIR / "global_forest_watch_datasets.csv",
+    }
+
+    # parse pages item by item when `ijson` is installed instead of loading each body whole
+    STREAM_JSON = streaming_available()
+
+    # "include" requests layers with every page; "lazy" fetches light pages, then layer names
+    # only for new/changed datasets (FETCH_RW_LAYERS=lazy, or fetch_all.py --lazy-layers)
+    LAYERS = os.environ.get("FETCH_RW_LAYERS", "include")
+
 
 @app.cell(hide_code=True)
 def _():
@@ -56,139 +77,63 @@ def _():
     **Implementation notes**
 
     * We request `includes=vocabulary,layer` to collect tags and layer names in one pass.
+      With `LAYERS = "lazy"` (`FETCH_RW_LAYERS=lazy`) pages are requested with
+      `includes=vocabulary` only, and layer names are then fetched per dataset
+      (`/v1/dataset/<id>/layer`, in parallel) for datasets that are new or whose `updatedAt`
+      changed; the rest come from `data/.layer_cache/`.
+    * Pages are fetched by the shared paging engine (`connectors.paging`) as declared by the
+      `rw` source in `connectors/registry.py`; row extraction lives in `connectors.resourcewatch`.
+    * Page 1 tells us `meta.total-items`; pages 2..N are then fetched concurrently over one pooled
+      session and written in page order, so the CSV matches a serial crawl.
+    * With `ijson` installed, each page body is spooled to disk and parsed one dataset at a time,
+      so memory stays flat as `page[size]` grows; without it pages are decoded whole.
+    * Each dataset's `application` list is recorded in the application facet index
+      (`data/rw_application_index/rw.json`); see `connectors/facets.py`.
+    * Combined mode (`FETCH_RW_APPLICATIONS=rw,gfw`, or `fetch_all.py --combined-rw`) requests
+      `application=rw,gfw` once and splits the rows by each dataset's own `application` list
+      into `resourcewatch_datasets.csv` and `global_forest_watch_datasets.csv`, so datasets
+      tagged for both are downloaded once. It prints an estimate of the requests and bytes saved
+      versus two crawls.
+    * `fetch()` does the whole crawl without touching the UI; `fetch_cli.py` (and so
+      `fetch_all.py` and cron) calls it headless with `--page-size`, `--workers`, `--format`
+      and `--out-dir`.
     * Some datasets may have no layers/tags; fields remain empty.
-    * API is live; counts change over time. Handle 429s with small backoff.
+    * API is live; counts change over time. A 429 pauses requests to the host for its
+      `Retry-After` and halves the host's request rate (`connectors/ratelimit.py`).
     """)
     return
 
 
-@app.cell
-def _():
-    FIELDS = [
-        "id",
-        "name",
-        "slug",
-        "provider",
-        "tags",
-        "layerCount",
-        "layerNames",
-        "createdAt",
-        "dataLastUpdated",
-        "updatedAt",
-    ]
-    return (FIELDS,)
-
-
 @app.function
-def get_page(page_number, page_size=100, session=None):
-    s = session or requests.Session()
-    params = {
-        "application": "rw",
-        "env": "production",
-        "published": "true",
-        "includes": "vocabulary,layer",
-        "page[size]": page_size,
-        "page[number]": page_number,
-    }
-    for attempt in range(5):
-        try:
-            r = s.get(BASE, params=params, timeout=60)
-            if r.status_code == 429:  # throttled
-                time.sleep(1.5 * (attempt + 1))
-                continue
-            r.raise_for_status()
-            return r.json()
-        except requests.RequestException as e:
-            # transient retry
-            if attempt < 4:
-                time.sleep(1.5 * (attempt + 1))
-                continue
-            raise e
-
-
-@app.function
-def extract_rows(js):
-    rows = []
-    for item in js.get("data", []):
-        attr = item.get("attributes", {}) or {}
-
-        # tags from vocabulary (flatten & unique)
-        tags = set()
-        for vocab in attr.get("vocabulary") or []:
-            tags.update(vocab.get("attributes", {}).get("tags", []) or [])
-        tags_list = sorted(tags)
-
-        # layer names (if present in include)
-        layer_names = []
-        for lyr in attr.get("layer") or []:
-            if isinstance(lyr, dict):
-                nm = (lyr.get("attributes") or {}).get("name") or lyr.get("name")
-                if nm:
-                    layer_names.append(nm)
-
-        row = {
-            "id": item.get("id"),
-            "name": attr.get("name"),
-            "slug": attr.get("slug"),
-            "provider": attr.get("provider"),
-            "tags": ", ".join(tags_list) if tags_list else "",
-            "layerCount": len(layer_names),
-            "layerNames": " | ".join(layer_names) if layer_names else "",
-            "createdAt": attr.get("createdAt"),
-            "dataLastUpdated": attr.get("dataLastUpdated"),
-            "updatedAt": attr.get("updatedAt"),
-        }
-        rows.append(row)
-    return rows
+def fetch(
+    page_size=resourcewatch.PAGE_SIZE,
+    max_workers=resourcewatch.MAX_WORKERS,
+    output_format="both",
+    out_dir=DATA_DIR,
+):
+    """Crawl and write this source's outputs with no UI; `fetch_cli.py` runs it headless."""
+    outfiles = {app: Path(out_dir) / OUTFILES[app].name for app in APPLICATIONS}
+    return resourcewatch.write_csvs(
+        registry.SOURCES[APPLICATION],
+        outfiles,
+        output_format=output_format,
+        page_size=page_size,
+        max_workers=max_workers,
+        stream=STREAM_JSON,
+        layers=LAYERS,
+    )
 
 
 @app.cell
-def _(FIELDS):
-    def main():
-        s = requests.Session()
-        first = get_page(1, session=s)
-        if not first or "meta" not in first:
-            print("Unexpected API response; missing 'meta'.", file=sys.stderr)
-            sys.exit(1)
-
-        total_pages = first.get("meta", {}).get("total-pages") or 1
-        total_items = first.get("meta", {}).get("total-items")
-        print(f"API reports {total_items} items across {total_pages} pages.")
-
-        # open CSV and write header
-        with open(OUTFILE, "w", newline="", encoding="utf-8") as f:
-            w = csv.DictWriter(f, fieldnames=FIELDS)
-            w.writeheader()
-
-            # page 1
-            rows = extract_rows(first)
-            for r in rows:
-                w.writerow(r)
-
-            # remaining pages
-            for page_num in range(2, total_pages + 1):
-                js = get_page(page_num, session=s)
-                rows = extract_rows(js)
-                for r in rows:
-                    w.writerow(r)
-                # be polite; avoid hammering the API
-                time.sleep(0.15)
-
-        print(f"Done. Wrote CSV: {OUTFILE}")
-
-    return (main,)
-
-
-@app.cell
-def _(main):
-    main()
+def _():
+    fetch()
     return
 
 
 @app.cell
-def _(FIELDS, OUTFILE):
+def _():
     df = pd.read_csv(OUTFILE, dtype=str)
-    df = df[[*FIELDS]]
+    df = df[[*resourcewatch.FIELDS]]
     df
     return
 
@@ -3,6 +3,9 @@
 # dependencies = [
 #     "marimo",
 #     "pandas==2.3.3",
+#     "pdfplumber==0.11.10",
+#     "pyarrow==22.0.0",
+#     "requests==2.32.5",
 # ]
 # ///
 
@@ -11,6 +14,19 @@ import marimo
 __generated_with = "0.17.2"
 app = marimo.App(width="medium")
 
+with app.setup:
+    import pandas as pd
+    from pathlib import Path
+    import time
+
+    # report extraction and output helper: CSV and/or typed Parquet (src/connectors/)
+    from connectors import eae, write_outputs
+
+    # Calculate data directory - works whether run from src/ or root
+    SCRIPT_DIR = Path.cwd()
+    DATA_DIR = SCRIPT_DIR.parent / "data" if SCRIPT_DIR.name == "src" else SCRIPT_DIR / "data"
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+
 
 @app.cell(hide_code=True)
 def _(mo):
@@ -51,7 +67,18 @@ def _(mo):
 
      **Implementation notes**
 
-     * This is a *document-derived* catalog (static snapshot), not an API crawl.
+     * This is a *document-derived* catalog, not an API crawl. A local copy of the PDF
+       (`data/energy-access-explorer-data-and-methods.pdf`) is kept current through the shared
+       HTTP cache, then read with `pdfplumber`, its pages split across a process pool
+       (`connectors/eae.py`). Figure 1 gives each dataset's category (and so its group); Table 1
+       its unit and the indices it feeds.
+     * The extraction is cached in `data/.pdf_cache/` by the PDF's SHA-256, so re-runs against an
+       unchanged report don't parse it again, and a new version of the report is parsed as soon
+       as it's downloaded.
+     * Tags and descriptions aren't in the report: they come from the hand-written rows below,
+       matched by name. Those rows are also the catalog when the PDF (or `pdfplumber`) isn't
+       available, or when the extraction finds fewer than 80% of them (`eae.MIN_OVERLAP`),
+       which a differently laid out report would. The run lists datasets found on only one side.
      * Where the PDF lacks providers/timestamps, we leave fields blank.
      * Descriptions are concise, one-liners summarizing each input.
     """
@@ -66,33 +93,17 @@ def _():
     return (mo,)
 
 
-@app.cell
-def _():
-    import pandas as pd
-    from pathlib import Path
-    import re
-
-    # Calculate data directory - works whether run from src/ or root
-    SCRIPT_DIR = Path.cwd()
-    DATA_DIR = SCRIPT_DIR.parent / "data" if SCRIPT_DIR.name == "src" else SCRIPT_DIR / "data"
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
-
-    return DATA_DIR, Path, pd, re
-
-
-@app.cell
-def _(DATA_DIR, Path, pd, re):
-    # We create a pandas DataFrame with columns aligned (where possible) to schema already used,
-    # plus a concise description. Write dataframe to CSV
-
-    # Helper to slugify into an id
-    def slugify(s):
-        s = s.strip().lower()
-        s = re.sub(r"[^a-z0-9\s\-_/]", "", s)
-        s = s.replace("/", " ")
-        s = re.sub(r"\s+", "-", s)
-        s = re.sub(r"-+", "-", s)
-        return s
+@app.function
+def fetch(
+    max_workers=eae.MAX_WORKERS,
+    output_format="both",
+    out_dir=DATA_DIR,
+    pdf_path=eae.PDF_PATH,
+):
+    """Extract and write the catalog with no UI; `fetch_cli.py` runs it headless."""
+    # Hand-written rows, aligned (where possible) to the schema already used, plus a concise
+    # description: they add tags and descriptions to the rows extracted from the report
+    # below, and are the catalog itself when the report can't be read
 
     rows = []
 
@@ -109,7 +120,7 @@ def _(DATA_DIR, Path, pd, re):
         description=None,
     ):
         row = {
-            "id": slugify(name if group is None else f"{group}-{name}"),
+            "id": eae.slugify(name if group is None else f"{group}-{name}"),
             "name": name,
             "category": category,  # Demographics / Social & Productive Uses / Resources / Infrastructure
             "group": group,  # High-level bucket from Figure 1 (Demand or Supply) if relevant
@@ -464,9 +475,52 @@ def _(DATA_DIR, Path, pd, re):
     ]
     df = df[cols]
 
-    # Save to CSV
-    out_path = DATA_DIR / "eae_datasets_pdf-extract.csv"
-    df.to_csv(out_path, index=False, encoding="utf-8")
+    # The catalog from the report itself: Figure 1 and Table 1 of a local copy of the PDF,
+    # parsed page-parallel and cached by the file's content hash (connectors/eae.py)
+    pdf = eae.download(path=pdf_path)
+    if pdf is None or not eae.extraction_available():
+        print("Report PDF (or pdfplumber) unavailable; writing the hand-written catalog")
+    else:
+        t0 = time.perf_counter()
+        extracted, cached = eae.extract_catalog(pdf, max_workers=max_workers)
+        how = "cached extraction" if cached else f"parsed on up to {max_workers} processes"
+        print(f"{len(extracted)} datasets from {pdf.name} ({how}, {time.perf_counter() - t0:.2f}s)")
+        if extracted:
+            extracted_df = pd.DataFrame(extracted, columns=cols)
+            annotated, missing, new = eae.annotate(extracted_df, df)
+            if missing:
+                print(f"  hand-written but not in the report: {', '.join(missing)}")
+            if new:
+                print(f"  new in the report (no tags/description yet): {', '.join(new)}")
+            # a report laid out differently parses into wrong or partial rows: only trust an
+            # extraction that finds most of the hand-written datasets
+            share = eae.overlap(extracted_df, df)
+            if share >= eae.MIN_OVERLAP:
+                df = annotated
+            else:
+                print(
+                    f"  only {share:.0%} of the hand-written datasets found (needs "
+                    f"{eae.MIN_OVERLAP:.0%}); writing the hand-written catalog"
+                )
+        else:
+            print("  no Figure 1 / Table 1 rows found; writing the hand-written catalog")
+
+    # Save to CSV (atomically) and/or a typed Parquet copy (usedIn_* as booleans)
+    paths = write_outputs(
+        df,
+        Path(out_dir) / "eae_datasets_pdf-extract.csv",
+        output_format,
+        datetimes=["createdAt", "dataLastUpdated", "updatedAt"],
+        ints=["layerCount"],
+        bools=["usedIn_EAP", "usedIn_Demand", "usedIn_Supply", "usedIn_NeedAssist"],
+    )
+    print(f"Wrote {len(df)} rows to {' and '.join(str(p) for p in paths)}")
+    return df
+
+
+@app.cell
+def _():
+    df = fetch()
     return (df,)
 
 
@@ -1,8 +1,10 @@
 # /// script
 # requires-python = ">=3.11"
 # dependencies = [
+#     "brotli==1.1.0",
 #     "marimo",
 #     "pandas==2.3.3",
+#     "pyarrow==22.0.0",
 #     "requests==2.32.5",
 # ]
 # ///
@@ -13,43 +15,37 @@ __generated_with = "0.17.2"
 app = marimo.App(width="medium")
 
 with app.setup:
+    import os
+
     import marimo as mo
-    import requests, csv, time
     import pandas as pd
     from pathlib import Path
 
+    # shared CKAN connector (src/connectors/)
+    from connectors import Checkpoint, ckan, print_summary, registry, write_outputs
+
     # Calculate data directory - works whether run from src/ or root
     SCRIPT_DIR = Path.cwd()
     DATA_DIR = SCRIPT_DIR.parent / "data" if SCRIPT_DIR.name == "src" else SCRIPT_DIR / "data"
     DATA_DIR.mkdir(parents=True, exist_ok=True)
 
-    BASE = "https://datasets.wri.org/api/3/action/package_search"
-
-    DATASET_FIELDS = [
-        "id",
-        "title",
-        "name",
-        "tags",
-        "createdAt",
-        "updatedAt",
-        "license",
-        "organization",
-        "numResources",
-    ]
-
-    RESOURCE_FIELDS = [
-        "dataset_id",
-        "resource_id",
-        "name",
-        "format",
-        "url",
-        "last_modified",
-        "size",
-    ]
+    # paging of package_search, as declared in connectors/registry.py
+    SOURCE = registry.SOURCES["wri_explorer"]
+
+    OUTFILE = DATA_DIR / "wri_data_explorer_01.csv"
+    RESOURCES_FILE = DATA_DIR / "wri_data_explorer_resources.parquet"
+
+    # Resource rows (one per package resource) go to the side table above; set
+    # FETCH_SKIP_RESOURCES=1 (fetch_all.py --skip-resources) to not build them at all
+    BUILD_RESOURCES = os.environ.get("FETCH_SKIP_RESOURCES") != "1"
+
+    # "incremental" only fetches packages modified since the previous snapshot (falls back
+    # to a full pull when there is none); "full" always pulls the whole catalog
+    SYNC_MODE = "incremental"
 
 
 @app.cell(hide_code=True)
-def _(mo):
+def _():
     mo.md(
         r"""
     ## WRI CKAN (datasets.wri.org) → `wri_data_explorer_01.csv`
@@ -61,7 +57,9 @@ def _(mo):
     **Endpoint & paging**
 
     * `GET https://datasets.wri.org/api/3/action/package_search`
-    * Params: `rows=100`, `start=OFFSET` (iterate `start += rows` until `start >= result.count`)
+    * Params: `rows=100`, `start=OFFSET` (`start = 0, rows, 2*rows, …` until `start >= result.count`)
+    * The `start=0` page doubles as the count probe; the remaining offsets are then fetched
+      concurrently (`ckan.MAX_WORKERS` at a time) and logged with their per-page timing.
 
     **Fields captured (per package)**
 
@@ -73,110 +71,161 @@ def _(mo):
 
     **Implementation notes**
 
-    * We also build a *resources* DataFrame in memory for inspection (one row per resource), but we only write the *datasets* CSV.
-    * Optionally filter with `q=…` if we later need subsets; for now it's a full catalog pull.
+    * Resources (one row per resource: `dataset_id`, `resource_id`, `name`, `format`, `url`,
+      `last_modified`, `size`) are written to a side table, `wri_data_explorer_resources.parquet`,
+      sorted by `dataset_id` so the asset locator can read one dataset's resources on demand.
+      With `FETCH_SKIP_RESOURCES=1` resource rows are never built and the side table is left as is.
+    * The datasets table is also written as typed Parquet (`wri_data_explorer_01.parquet`, timestamps as datetimes).
+    * Optionally filter with `q=…` if we later need subsets.
+    * Pages are fetched by the shared paging engine (`connectors.paging`) as declared by the
+      `wri_explorer` source in `connectors/registry.py`; row flattening lives in `connectors.ckan`.
+    * A full pull streams rows to the outputs as pages arrive (`ckan.write_packages`): datasets
+      in arrival order, resources through an on-disk merge sort by `dataset_id`, so memory stays
+      flat however large the catalog. An incremental sync still loads the previous snapshot.
+    * `fetch()` does the whole pull or sync without touching the UI; `fetch_cli.py` (and so
+      `fetch_all.py` and cron) calls it headless with `--page-size`, `--workers`, `--format`
+      and `--out-dir`. With `--format parquet` there's no CSV for the next incremental sync
+      to patch, so each run is a full pull.
+
+    **Incremental sync** (`SYNC_MODE = "incremental"`, the default)
+
+    * Reads the newest `updatedAt` from the existing CSV and only fetches packages with
+      `fq=metadata_modified:[<that time> TO *]`, merging them in by `id`. A CSV with no rows
+      or no `updatedAt` values has nothing to sync from, so the run is a full pull.
+    * Deletions are found with a cheap id-only listing (`fl=id`, 1000 rows per page); ids missing
+      from it are dropped from the snapshot.
+    * The resources side table is updated the same way: rows of changed and deleted packages are
+      replaced by the changed packages' resources. Without an existing side table the first sync
+      is a full pull.
+    * The side table records its own high-water mark in `wri_data_explorer_resources.json`.
+      Runs with `FETCH_SKIP_RESOURCES=1` advance the CSV but not the side table, so the next
+      run that builds resources syncs from the side table's mark instead of the CSV's.
+
+    **Raw archive**
+
+    * Once written, the raw pages of every full pull and incremental sync are appended to
+      `data/raw_archive/wri-data-explorer*.jsonl.gz`; `renormalize.py` rebuilds the CSV from them.
+
+    **Resuming** (full pulls)
+
+    * Every page is checkpointed under `data/.checkpoints/wri-data-explorer/` (raw response + rows).
+      Run with `FETCH_RESUME=1` (or `fetch_all.py --resume`) to continue an interrupted pull from
+      the pages it already has; the CSV is only replaced once the pull completes.
     """
     )
     return
 
 
-@app.cell
-def _():
-    def fetch_ckan_package_search(q=None, rows=100):
-        """Generator yielding CKAN package_search pages."""
-        start = 0
-        session = requests.Session()
-        params = {"rows": rows, "start": start}
-        if q:
-            params["q"] = q
-
-        r = session.get(BASE, params=params, timeout=60)
-        r.raise_for_status()
-        js = r.json()
-        assert js.get("success") and "result" in js, "Unexpected CKAN response"
-        count = js["result"]["count"]
-
-        while True:
-            params["start"] = start
-            r = session.get(BASE, params=params, timeout=60)
-            r.raise_for_status()
-            yield r.json()["result"]
-            start += rows
-            if start >= count:
-                break
-            time.sleep(0.15)
-
-    def to_dataset_row(pkg):
-        tags = sorted({t.get("name", "").strip() for t in (pkg.get("tags") or []) if t.get("name")})
-        org = (pkg.get("organization") or {}).get("title") or (pkg.get("organization") or {}).get(
-            "name"
+@app.function
+def fetch(
+    page_size=100,
+    max_workers=ckan.MAX_WORKERS,
+    output_format="both",
+    out_dir=DATA_DIR,
+):
+    """Pull or sync and write this source's outputs with no UI; `fetch_cli.py` runs it headless."""
+    outfile = Path(out_dir) / OUTFILE.name
+    resources_file = Path(out_dir) / RESOURCES_FILE.name
+    params = {"rows": page_size, "resources": BUILD_RESOURCES}
+    previous = None
+    if SYNC_MODE == "incremental" and outfile.exists():
+        previous = pd.read_csv(outfile, dtype=str)
+        if not previous["updatedAt"].notna().any():
+            print(f"No updatedAt in {outfile.name} to sync from; doing a full pull")
+            previous = None
+    # an incremental sync patches the previous CSV, and a side table that already exists
+    # and records how current it is (runs that skip resources leave it behind the CSV)
+    resources_since = ckan.resources_since(resources_file) if BUILD_RESOURCES else None
+    have_resources = not BUILD_RESOURCES or (resources_file.exists() and resources_since)
+    if previous is not None and have_resources:
+        previous_resources = ckan.read_resources(resources_file) if BUILD_RESOURCES else None
+        # only checkpointed so its pages reach the raw archive; a sync is never resumed
+        checkpoint = Checkpoint("wri-data-explorer-incremental", params=params, resume=False)
+        datasets_df, resources_df, stats = ckan.sync_incremental(
+            SOURCE,
+            previous,
+            checkpoint,
+            rows=page_size,
+            previous_resources=previous_resources,
+            resources_since=resources_since,
+            resources=BUILD_RESOURCES,
+            max_workers=max_workers,
         )
-        return {
-            "id": pkg.get("id"),
-            "title": pkg.get("title"),
-            "name": pkg.get("name"),
-            "tags": ", ".join(tags),
-            "createdAt": pkg.get("metadata_created"),
-            "updatedAt": pkg.get("metadata_modified"),
-            "license": pkg.get("license_title") or pkg.get("license_id"),
-            "organization": org,
-            "numResources": len(pkg.get("resources") or []),
-        }
-
-    def to_resource_rows(pkg):
-        rows = []
-        for res in pkg.get("resources") or []:
-            rows.append(
-                {
-                    "dataset_id": pkg.get("id"),
-                    "resource_id": res.get("id"),
-                    "name": res.get("name") or res.get("description") or "",
-                    "format": res.get("format"),
-                    "url": res.get("url"),
-                    "last_modified": res.get("last_modified") or res.get("revision_timestamp"),
-                    "size": res.get("size"),
-                }
-            )
-        return rows
-
-    return fetch_ckan_package_search, to_dataset_row, to_resource_rows
-
-
-@app.cell
-def _(fetch_ckan_package_search, to_dataset_row, to_resource_rows):
-    def main():
-        dataset_records = []
-        resource_records = []
-
-        for page in fetch_ckan_package_search(rows=100):
-            for pkg in page.get("results", []):
-                dataset_records.append(to_dataset_row(pkg))
-                resource_records.extend(to_resource_rows(pkg))
-            time.sleep(0.15)
-
-        # Convert to DataFrames
-        datasets_df = pd.DataFrame(dataset_records)
-        resources_df = pd.DataFrame(resource_records)
+        print(
+            f"Incremental sync since {stats['since']}: {stats['changed']} changed, "
+            f"{stats['added']} added, {stats['deleted']} deleted"
+        )
+        # Write datasets df to CSV, replacing the old one only once it's complete, and/or
+        # a typed Parquet copy (datetimes, int counts)
+        paths = write_outputs(
+            datasets_df,
+            outfile,
+            output_format,
+            datetimes=ckan.DATASET_DATETIME_FIELDS,
+            ints=ckan.DATASET_INT_FIELDS,
+        )
+        # ...and the resources side table, keyed by dataset_id
+        if resources_df is not None:
+            since = ckan.high_water_mark(datasets_df)
+            ckan.write_resources(resources_df, resources_file, since=since)
+        n_datasets = len(datasets_df)
+        n_resources = None if resources_df is None else len(resources_df)
+    else:
+        if previous is not None and not resources_file.exists():
+            print(f"No {resources_file.name} yet; doing a full pull to build it")
+        elif previous is not None:
+            stamp = ckan.resources_stamp(resources_file).name
+            print(f"No {stamp} for {resources_file.name}; doing a full pull to rebuild it")
+        # each page is checkpointed; FETCH_RESUME=1 continues an interrupted pull
+        checkpoint = Checkpoint("wri-data-explorer", params=params)
+        pages = ckan.package_pages(
+            SOURCE,
+            checkpoint,
+            rows=page_size,
+            max_workers=max_workers,
+            resources=BUILD_RESOURCES,
+        )
+        # rows go to the outputs as the pages arrive, so a large catalog is never
+        # held in memory; each output replaces the old one only once it's complete
+        datasets, resources = ckan.write_packages(
+            pages,
+            outfile,
+            resources_file if BUILD_RESOURCES else None,
+            output_format,
+        )
+        paths = datasets.paths
+        n_datasets = datasets.rows
+        n_resources = None if resources is None else resources.rows
+    # keep the raw pages in the compressed archive (data/raw_archive/) for renormalize.py
+    checkpoint.finish()
 
-        # Write datasets df to CSV
-        datasets_df.to_csv(DATA_DIR / "wri_data_explorer_01.csv", index=False, encoding="utf-8")
+    print(f"Datasets: {n_datasets} rows -> {', '.join(p.name for p in paths)}")
+    if n_resources is None:
+        print("Resources: skipped (FETCH_SKIP_RESOURCES=1)")
+    else:
+        print(f"Resources: {n_resources} rows -> {resources_file.name}")
+    print_summary()
+    return paths
 
-        print(f"Datasets: {len(datasets_df)} rows")
-        print(f"Resources: {len(resources_df)} rows (not saved)")
-        return datasets_df, resources_df
 
-    datasets_df, resources_df = main()
-    return datasets_df, resources_df
+@app.cell
+def _():
+    paths = fetch()
+    return (paths,)
 
 
 @app.cell
-def _(datasets_df):
+def _(paths):
+    # read back from disk: `fetch` keeps no copy of the tables it wrote
+    _path = paths[0]
+    datasets_df = pd.read_parquet(_path) if _path.suffix == ".parquet" else pd.read_csv(_path)
     datasets_df
     return
 
 
 @app.cell
-def _(resources_df):
+def _():
+    resources_df = ckan.read_resources(RESOURCES_FILE) if RESOURCES_FILE.exists() else None
     resources_df
     return
 
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# /// script
+# requires-python = ">=3.11"
+# dependencies = [
+#     "pandas==2.3.3",
+#     "pyarrow==22.0.0",
+#     "requests==2.32.5",
+# ]
+# ///
+"""Rebuild the source CSVs from the raw-response archive, without any network access.
+
+Every checkpointed fetch appends its raw pages to `data/raw_archive/` when it
+finishes (see `connectors/archive.py`). This re-runs today's row extraction
+(`extract_row`, `normalize_feature`, `to_dataset_row`, ...) over the newest
+archived run of each source and rewrites its CSV and Parquet copy:
+
+* `rw`, `gfw`: the newest Resource Watch run covering the application, split
+  like `write_csvs`; layer names of two-phase runs come from the layer cache
+* `arcgis`: the newest ArcGIS run
+* `wri_explorer`: the newest full pull with every later incremental sync applied
+  on top, limited to the packages still in the current CSV (deletions aren't in
+  the archive); also rewrites the resources side table
+* sources registered in `connectors/registry.py` without a fetch notebook: the
+  newest run of the registry's engine, through the source's `normalize`
+
+The Energy Access Explorer source is parsed from a PDF, not API pages, so it isn't
+archived. Run the combine step afterwards to refresh the combined table.
+
+Usage: uv run src/renormalize.py [--only rw arcgis]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+from connectors import (
+    arcgis,
+    archive,
+    atomic_output,
+    ckan,
+    paging,
+    registry,
+    resourcewatch,
+    write_outputs,
+    write_parquet,
+)
+from connectors.tables import csv_to_parquet
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+
+RW_OUTFILES = {"rw": "resourcewatch_datasets.csv", "gfw": "global_forest_watch_datasets.csv"}
+ARCGIS_OUTFILE = "wri_arcgis_catalog_01.csv"
+CKAN_OUTFILE = "wri_data_explorer_01.csv"
+CKAN_RESOURCES = "wri_data_explorer_resources.parquet"
+
+# crawled by the registry's engine, whose runs are archived under the source's name
+ENGINE_SOURCES = [name for name, source in registry.SOURCES.items() if source.notebook is None]
+
+SOURCES = ["rw", "gfw", "arcgis", "wri_explorer", *ENGINE_SOURCES]
+
+
+def newest_rw_runs(applications):
+    """{application: newest archived Resource Watch run that crawled it}."""
+    newest = {}
+    for name in archive.names():
+        if not name.startswith("resourcewatch-"):
+            continue
+        run = archive.latest_run(name)
+        if run is None:
+            continue
+        for app in name.removeprefix("resourcewatch-").split("+"):
+            if app in applications and (
+                app not in newest or run["archived_at"] > newest[app]["archived_at"]
+            ):
+                newest[app] = run
+    return newest
+
+
+def renormalize_rw(applications):
+    newest = newest_rw_runs(applications)
+    for app in applications:
+        if app not in newest:
+            print(f"{app}: no archived run; skipped")
+
+    runs = {run["run"]: run for run in newest.values()}
+    for run_id, run in runs.items():
+        apps = [app for app, r in newest.items() if r["run"] == run_id]
+        crawled = run["name"].removeprefix("resourcewatch-")
+        cache = None
+        if run["params"].get("layers") == "lazy":
+            cache = resourcewatch.load_layer_cache(crawled)
+
+        def pages(run, cache):
+            for key, page in run["pages"]:
+                rows = resourcewatch.extract_rows(page)
+                if cache is not None:
+                    for row in rows:
+                        if entry := cache.get(row["id"]):
+                            resourcewatch.set_layer_names(row, entry["layerNames"])
+                yield key, rows
+
+        outfiles = {app: DATA_DIR / RW_OUTFILES[app] for app in apps}
+        counts, _ = resourcewatch.write_split(pages(run, cache), outfiles, split="+" in crawled)
+        for app, outfile in outfiles.items():
+            csv_to_parquet(
+                outfile, datetimes=resourcewatch.DATETIME_FIELDS, ints=resourcewatch.INT_FIELDS
+            )
+            print(f"{app}: {counts[app]} rows from run {run_id} -> {outfile.name}")
+
+
+def renormalize_arcgis():
+    run = archive.latest_run("arcgis")
+    if run is None:
+        print("arcgis: no archived run; skipped")
+        return
+    rows = arcgis.distinct_rows(arcgis.page_rows(page) for _, page in run["pages"])
+    writer = arcgis.write_rows(rows, DATA_DIR / ARCGIS_OUTFILE)
+    print(f"arcgis: {writer.rows} rows from run {run['run']} -> {ARCGIS_OUTFILE}")
+
+
+def renormalize_ckan():
+    full = archive.latest_run("wri-data-explorer")
+    if full is None:
+        print("wri_explorer: no archived full pull; skipped")
+        return
+    index = archive.load_index("wri-data-explorer-incremental")
+    later = [entry for entry in index["runs"] if entry["archived_at"] > full["archived_at"]]
+    syncs = list(archive.runs("wri-data-explorer-incremental", entries=later))
+    if (index["pruned_through"] or 0) > full["archived_at"]:
+        print(
+            "wri_explorer: incremental syncs since the full pull were pruned from the archive "
+            "(FETCH_ARCHIVE_KEEP); packages only they changed keep the full pull's values"
+        )
+    with_resources = all(run["params"].get("resources", True) for run in [full, *syncs])
+
+    # later runs replace a package's row (in place) and its resources
+    datasets, resources = {}, {}
+    for run in [full, *syncs]:
+        dataset_records, resource_records = ckan.collect_packages(
+            ckan.package_rows(page, resources=with_resources) for _, page in run["pages"]
+        )
+        for rec in dataset_records:
+            datasets[rec["id"]] = rec
+            resources[rec["id"]] = []
+        for rec in resource_records:
+            resources[rec["dataset_id"]].append(rec)
+
+    outfile = DATA_DIR / CKAN_OUTFILE
+    if outfile.exists():
+        ids = [i for i in pd.read_csv(outfile, dtype=str)["id"] if i in datasets]
+    else:
+        ids = list(datasets)
+    datasets_df = pd.DataFrame([datasets[i] for i in ids], columns=ckan.DATASET_FIELDS)
+    with atomic_output(outfile) as tmp:
+        datasets_df.to_csv(tmp, index=False, encoding="utf-8")
+    write_parquet(
+        datasets_df,
+        outfile.with_suffix(".parquet"),
+        datetimes=ckan.DATASET_DATETIME_FIELDS,
+        ints=ckan.DATASET_INT_FIELDS,
+    )
+    print(
+        f"wri_explorer: {len(datasets_df)} rows from run {full['run']} "
+        f"+ {len(syncs)} incremental syncs -> {outfile.name}"
+    )
+    if with_resources:
+        resources_df = pd.DataFrame(
+            [rec for i in ids for rec in resources[i]], columns=ckan.RESOURCE_FIELDS
+        )
+        since = ckan.high_water_mark(datasets_df)
+        ckan.write_resources(resources_df, DATA_DIR / CKAN_RESOURCES, since=since)
+        print(f"wri_explorer: {len(resources_df)} resources -> {CKAN_RESOURCES}")
+
+
+def renormalize_registered(name):
+    source = registry.SOURCES[name]
+    run = archive.latest_run(name)
+    if run is None:
+        print(f"{name}: no archived run; skipped")
+        return
+    rows = [row for _, page in run["pages"] for row in paging.page_rows(source, page)]
+    df = registry.to_frame(source, rows)
+    outfile = DATA_DIR / source.output
+    write_outputs(df, outfile, datetimes=source.datetimes, ints=source.ints)
+    print(f"{name}: {len(df)} rows from run {run['run']} -> {outfile.name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        choices=SOURCES,
+        default=SOURCES,
+        help="Sources to rebuild (default: all)",
+    )
+    args = parser.parse_args()
+    if not archive.names():
+        sys.exit(f"No archives in {archive.archive_dir()}; run the fetchers first.")
+
+    t0 = time.perf_counter()
+    if rw_apps := [s for s in args.only if s in RW_OUTFILES]:
+        renormalize_rw(rw_apps)
+    if "arcgis" in args.only:
+        renormalize_arcgis()
+    if "wri_explorer" in args.only:
+        renormalize_ckan()
+    for name in ENGINE_SOURCES:
+        if name in args.only:
+            renormalize_registered(name)
+    print(f"\nRenormalized {', '.join(args.only)} in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# the connectors package and the scripts live in src/, which the notebooks run from
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from connectors import replay  # noqa: E402
+
+
+@pytest.fixture
+def fixtures(tmp_path, monkeypatch):
+    """A fixture directory for `replay.FixtureServer`; call it to add a JSON response.
+
+    The cache is off, so every request reaches the server.
+    """
+    monkeypatch.setenv("FETCH_NO_CACHE", "1")
+    directory = tmp_path / "fixtures"
+    directory.mkdir()
+
+    def add(url, params, body):
+        url = replay.full_url(url, params)
+        key = replay.fixture_key(url)
+        (directory / f"{key}.body").write_text(json.dumps(body))
+        meta = {"url": url, "content_type": "application/json"}
+        (directory / f"{key}.json").write_text(json.dumps(meta))
+
+    add.directory = directory
+    return add
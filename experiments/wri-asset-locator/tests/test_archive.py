@@ -0,0 +1,102 @@
+import pytest
+from connectors import archive
+
+
+def pages(n):
+    return [(i, f'{{"page": {i}}}'.encode()) for i in range(1, n + 1)]
+
+
+def test_runs_round_trip(tmp_path):
+    archive.append_run("src", pages(2), params={"rows": 2}, directory=tmp_path)
+    archive.append_run("src", pages(3), directory=tmp_path)
+
+    runs = list(archive.runs("src", tmp_path))
+    assert [len(run["pages"]) for run in runs] == [2, 3]
+    assert runs[0]["params"] == {"rows": 2}
+    assert runs[1]["pages"][2] == (3, {"page": 3})
+
+
+def test_truncated_member_followed_by_good_run(tmp_path):
+    path = archive.archive_path("src", tmp_path)
+    archive.append_run("src", pages(1), info={"n": 1}, directory=tmp_path)
+    good = path.stat().st_size
+    archive.append_run("src", pages(50), info={"n": 2}, directory=tmp_path)
+    # a killed process leaves only part of run 2's member behind
+    data = path.read_bytes()
+    path.write_bytes(data[: good + (len(data) - good) // 2])
+    archive.append_run("src", pages(3), info={"n": 3}, directory=tmp_path)
+
+    assert [run["info"]["n"] for run in archive.runs("src", tmp_path)] == [1, 3]
+    assert archive.latest_run("src", tmp_path)["info"]["n"] == 3
+
+
+def test_truncated_tail_is_ignored(tmp_path):
+    path = archive.archive_path("src", tmp_path)
+    archive.append_run("src", pages(2), directory=tmp_path)
+    good = path.stat().st_size
+    archive.append_run("src", pages(2), directory=tmp_path)
+    path.write_bytes(path.read_bytes()[: good + 10])
+
+    assert len(list(archive.runs("src", tmp_path))) == 1
+
+
+def test_failed_append_is_cut_off(tmp_path):
+    archive.append_run("src", pages(1), directory=tmp_path)
+    size = archive.archive_path("src", tmp_path).stat().st_size
+
+    def failing():
+        yield from pages(2)
+        raise RuntimeError("connection lost")
+
+    with pytest.raises(RuntimeError):
+        archive.append_run("src", failing(), directory=tmp_path)
+    assert archive.archive_path("src", tmp_path).stat().st_size == size
+    assert len(list(archive.runs("src", tmp_path))) == 1
+
+
+def test_latest_run_decodes_only_its_member(tmp_path, monkeypatch):
+    for n in range(1, 4):
+        archive.append_run("src", pages(n), info={"n": n}, directory=tmp_path)
+    read = []
+    read_member = archive._read_member
+
+    def spy(data, pos):
+        read.append(pos)
+        return read_member(data, pos)
+
+    monkeypatch.setattr(archive, "_read_member", spy)
+    assert archive.latest_run("src", tmp_path)["info"]["n"] == 3
+    assert read == [archive.load_index("src", tmp_path)["runs"][-1]["offset"]]
+
+
+def test_missing_or_stale_index_is_rebuilt(tmp_path):
+    archive.append_run("src", pages(1), info={"n": 1}, directory=tmp_path)
+    archive.index_path("src", tmp_path).unlink()
+    archive.append_run("src", pages(2), info={"n": 2}, directory=tmp_path)
+    index = archive.load_index("src", tmp_path)
+    assert [entry["pages"] for entry in index["runs"]] == [1, 2]
+
+    # appended by something that didn't update the index
+    stale = archive.index_path("src", tmp_path).read_text()
+    archive.append_run("src", pages(3), info={"n": 3}, directory=tmp_path)
+    archive.index_path("src", tmp_path).write_text(stale)
+    assert archive.latest_run("src", tmp_path)["info"]["n"] == 3
+
+
+def test_retention_drops_the_oldest_runs(tmp_path, monkeypatch):
+    monkeypatch.setenv("FETCH_ARCHIVE_KEEP", "2")
+    for n in range(1, 5):
+        archive.append_run("src", pages(n), info={"n": n}, directory=tmp_path)
+        if n == 2:
+            second = archive.load_index("src", tmp_path)["runs"][-1]["archived_at"]
+
+    runs = list(archive.runs("src", tmp_path))
+    assert [run["info"]["n"] for run in runs] == [3, 4]
+    index = archive.load_index("src", tmp_path)
+    assert index["runs"][0]["offset"] == 0
+    assert index["size"] == archive.archive_path("src", tmp_path).stat().st_size
+    assert index["pruned_through"] == second
+
+    # an explicit keep of 0 never prunes
+    archive.append_run("src", pages(1), info={"n": 5}, directory=tmp_path, keep=0)
+    assert len(archive.load_index("src", tmp_path)["runs"]) == 3
@@ -0,0 +1,110 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from connectors import cache as cache_module
+from connectors.cache import ResponseCache
+from connectors.client import get_json
+
+URL = "https://api.example.org/catalog"
+
+
+class CatalogHandler(BaseHTTPRequestHandler):
+    """Serves `server.version` with an ETag, answering a matching `If-None-Match` with a 304."""
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(self.headers.get("If-None-Match"))
+        etag = f'"v{server.version}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        body = json.dumps({"version": server.version, "padding": "x" * 1000}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CatalogHandler)
+    server.version = 1
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("FETCH_REPLAY_URL", f"http://127.0.0.1:{server.server_address[1]}")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_fresh_entry_skips_the_network(server, tmp_path):
+    cache = ResponseCache(tmp_path / "cache", ttl=3600)
+    assert get_json(URL, params={"q": 1}, cache=cache)["version"] == 1
+    server.version = 2
+    # within the TTL the stored body is served, even though the server changed
+    assert get_json(URL, params={"q": 1}, cache=cache)["version"] == 1
+    assert len(server.requests) == 1
+    assert (cache.stats["misses"], cache.stats["hits"]) == (1, 1)
+
+
+def test_stale_entry_is_revalidated_with_its_etag(server, tmp_path):
+    cache = ResponseCache(tmp_path / "cache", ttl=3600)
+    get_json(URL, cache=cache)
+    stored_at = cache.get(URL).stored_at
+    cache.ttl = 0
+
+    assert get_json(URL, cache=cache)["version"] == 1
+    assert server.requests == [None, '"v1"']
+    assert cache.stats["revalidated"] == 1
+    # the 304 made the entry fresh again
+    assert cache.get(URL).stored_at > stored_at
+
+
+def test_expired_entry_is_replaced_when_the_resource_changed(server, tmp_path):
+    cache = ResponseCache(tmp_path / "cache", ttl=0.2)
+    get_json(URL, cache=cache)
+    server.version = 2
+    time.sleep(0.3)
+
+    assert get_json(URL, cache=cache)["version"] == 2
+    assert server.requests == [None, '"v1"']
+    assert cache.stats["misses"] == 2
+    assert cache.get(URL).etag == '"v2"'
+
+
+def test_least_recently_used_entries_are_evicted(server, tmp_path):
+    cache = ResponseCache(tmp_path / "cache", ttl=3600, max_bytes=2500)
+    for q in (1, 2):
+        get_json(URL, params={"q": q}, cache=cache)
+    # make q=2 the least recently used entry
+    os.utime(cache.get(URL, {"q": 2}).body_path, (0, 0))
+    get_json(URL, params={"q": 3}, cache=cache)
+
+    assert cache.stats["evicted"] == 1
+    assert cache.get(URL, {"q": 2}) is None
+    assert cache.get(URL, {"q": 1}) is not None and cache.get(URL, {"q": 3}) is not None
+
+
+def test_no_cache_always_goes_to_the_network(server, tmp_path, monkeypatch):
+    # what fetch_all.py --no-cache sets for every fetcher
+    monkeypatch.setenv("FETCH_NO_CACHE", "1")
+    monkeypatch.setenv("FETCH_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(cache_module, "_cache", None)
+    assert cache_module.get_cache() is None
+
+    assert get_json(URL)["version"] == 1
+    server.version = 2
+    assert get_json(URL)["version"] == 2
+    assert server.requests == [None, None]
+    assert not (tmp_path / "cache").exists()
@@ -0,0 +1,98 @@
+import pytest
+import requests
+from connectors import archive, registry, replay
+from connectors.checkpoint import Checkpoint
+from connectors.paging import crawl
+
+URL = "https://api.example.org/items"
+
+ITEMS = [{"id": i} for i in range(1, 8)]
+
+SOURCE = registry.Source(
+    name="test",
+    title="Test",
+    collection="Test",
+    output="test.csv",
+    columns={},
+    endpoint=URL,
+    paging="page",
+    cursor_param="page",
+    size_param="size",
+    items="data",
+    total="meta.total",
+    page_size=3,
+)
+
+
+@pytest.fixture
+def catalog(fixtures, tmp_path, monkeypatch):
+    """Pages 1 and 2 of the catalog; call it to add page 3."""
+    monkeypatch.setenv("FETCH_ARCHIVE_DIR", str(tmp_path / "archive"))
+
+    def add(n):
+        chunk = ITEMS[(n - 1) * 3 : n * 3]
+        fixtures(URL, {"page": n, "size": 3}, {"data": chunk, "meta": {"total": len(ITEMS)}})
+
+    add(1)
+    add(2)
+    return lambda: add(3)
+
+
+def run(fixtures, tmp_path, params, resume, pages=None):
+    """Crawl into the same checkpoint directory every time; return the server's stats."""
+    checkpoint = Checkpoint(
+        "test", params=params, resume=resume, directory=tmp_path / "checkpoints"
+    )
+    with replay.serve_fixtures(directory=fixtures.directory) as server:
+        for page in crawl(SOURCE, checkpoint, max_workers=1):
+            if pages is not None:
+                pages.append(page)
+    return checkpoint, server.stats
+
+
+def interrupted_run(fixtures, tmp_path, params):
+    pages = []
+    # page 3 isn't there yet: the crawl stops after page 2
+    with pytest.raises(requests.HTTPError):
+        run(fixtures, tmp_path, params, resume=False, pages=pages)
+    assert [key for key, _ in pages] == [1, 2]
+
+
+def test_resume_fetches_only_the_missing_pages(fixtures, catalog, tmp_path):
+    interrupted_run(fixtures, tmp_path, {"page_size": 3})
+    catalog()
+
+    pages = []
+    checkpoint, stats = run(fixtures, tmp_path, {"page_size": 3}, resume=True, pages=pages)
+
+    assert checkpoint.resumed
+    assert stats["served"] == 1
+    assert [key for key, _ in pages] == [1, 2, 3]
+    assert [row for _, rows in pages for row in rows] == ITEMS
+
+    # finishing archives every page, in order, and removes the checkpoint
+    checkpoint.finish()
+    assert not checkpoint.directory.exists()
+    run_record = archive.latest_run("test")
+    assert [key for key, _ in run_record["pages"]] == ["1", "2", "3"]
+
+
+def test_checkpoint_with_other_parameters_is_dropped(fixtures, catalog, tmp_path, capsys):
+    interrupted_run(fixtures, tmp_path, {"page_size": 3})
+    catalog()
+
+    checkpoint, stats = run(fixtures, tmp_path, {"page_size": 3, "query": "new"}, resume=True)
+
+    assert not checkpoint.resumed
+    assert "written with different parameters; starting over" in capsys.readouterr().out
+    assert stats["served"] == 3
+
+
+def test_without_resume_a_checkpoint_is_dropped(fixtures, catalog, tmp_path):
+    interrupted_run(fixtures, tmp_path, {"page_size": 3})
+    catalog()
+
+    checkpoint, stats = run(fixtures, tmp_path, {"page_size": 3}, resume=False)
+
+    assert not checkpoint.resumed
+    assert stats["served"] == 3
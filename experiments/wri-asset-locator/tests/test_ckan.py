@@ -0,0 +1,116 @@
+import importlib
+
+import pandas as pd
+import pytest
+from connectors import cache, ckan, registry, replay
+
+
+def package(pkg_id, modified):
+    resource = {"id": f"r-{pkg_id}", "name": pkg_id, "format": "CSV", "url": f"https://x/{pkg_id}"}
+    return {"id": pkg_id, "name": pkg_id, "metadata_modified": modified, "resources": [resource]}
+
+
+PACKAGES = [package("a", "2024-01-02T00:00:00"), package("b", "2024-03-04T00:00:00")]
+
+
+@pytest.fixture
+def explorer(tmp_path, monkeypatch):
+    """The WRI Data Explorer notebook, loaded with its data, checkpoints and archive in `tmp_path`."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("FETCH_CHECKPOINT_DIR", str(tmp_path / "checkpoints"))
+    monkeypatch.setenv("FETCH_ARCHIVE_DIR", str(tmp_path / "archive"))
+    return importlib.import_module("fetch_datasets_wri_data_explorer")
+
+
+def add_catalog(fixtures, packages, rows=2, **params):
+    """Serve `packages` as a `package_search` pull with `params`, `rows` at a time."""
+    for start in range(0, max(len(packages), 1), rows):
+        page = packages[start : start + rows]
+        body = {"success": True, "result": {"count": len(packages), "results": page}}
+        fixtures(ckan.BASE, {**params, "start": start, "rows": rows}, body)
+
+
+@pytest.mark.parametrize("updated", [[], [None, None]])
+def test_sync_incremental_needs_an_updated_at(tmp_path, updated):
+    previous = pd.DataFrame({"id": [f"p{i}" for i in range(len(updated))], "updatedAt": updated})
+    with pytest.raises(ValueError, match="full pull"):
+        ckan.sync_incremental(registry.SOURCES["wri_explorer"], previous, checkpoint=None)
+
+
+@pytest.mark.parametrize("updated", [[], [""]])
+def test_fetch_falls_back_to_full_pull(explorer, fixtures, tmp_path, monkeypatch, updated):
+    monkeypatch.setattr(explorer, "BUILD_RESOURCES", False)
+    outfile = tmp_path / explorer.OUTFILE.name
+    rows = [
+        {**dict.fromkeys(ckan.DATASET_FIELDS, ""), "id": f"old{i}"} for i in range(len(updated))
+    ]
+    pd.DataFrame(rows, columns=ckan.DATASET_FIELDS).to_csv(outfile, index=False)
+    add_catalog(fixtures, PACKAGES)
+
+    with replay.serve_fixtures(directory=fixtures.directory) as server:
+        explorer.fetch(page_size=2, max_workers=1, output_format="csv", out_dir=tmp_path)
+
+    assert server.stats["missing"] == 0
+    assert list(pd.read_csv(outfile)["id"]) == ["a", "b"]
+
+
+def test_resources_sync_from_their_own_high_water_mark(explorer, fixtures, tmp_path, monkeypatch):
+    resources_file = tmp_path / explorer.RESOURCES_FILE.name
+
+    def fetch(build_resources):
+        monkeypatch.setattr(explorer, "BUILD_RESOURCES", build_resources)
+        with replay.serve_fixtures(directory=fixtures.directory) as server:
+            explorer.fetch(page_size=2, max_workers=1, output_format="csv", out_dir=tmp_path)
+        assert server.stats["missing"] == 0
+
+    add_catalog(fixtures, PACKAGES)
+    fetch(build_resources=True)
+    assert ckan.resources_since(resources_file) == "2024-03-04T00:00:00"
+
+    # c is added while resources are skipped: the CSV moves on, the side table doesn't
+    changed = [PACKAGES[1], package("c", "2024-05-06T00:00:00")]
+    add_catalog(fixtures, changed, fq=ckan.modified_since_filter("2024-03-04T00:00:00"))
+    listing = {"success": True, "result": {"count": 3, "results": [{"id": i} for i in "abc"]}}
+    fixtures(ckan.BASE, {"rows": ckan.ID_PAGE_SIZE, "start": 0, "fl": "id"}, listing)
+    fetch(build_resources=False)
+    assert list(pd.read_csv(tmp_path / explorer.OUTFILE.name)["id"]) == ["a", "b", "c"]
+    assert ckan.resources_since(resources_file) == "2024-03-04T00:00:00"
+
+    # the next sync with resources starts from the side table's mark, not the CSV's
+    fetch(build_resources=True)
+    assert sorted(ckan.read_resources(resources_file)["dataset_id"]) == ["a", "b", "c"]
+    assert ckan.resources_since(resources_file) == "2024-05-06T00:00:00"
+
+
+def test_side_table_without_a_mark_is_rebuilt(explorer, fixtures, tmp_path, monkeypatch):
+    monkeypatch.setattr(explorer, "BUILD_RESOURCES", True)
+    add_catalog(fixtures, PACKAGES)
+    with replay.serve_fixtures(directory=fixtures.directory):
+        explorer.fetch(page_size=2, max_workers=1, output_format="csv", out_dir=tmp_path)
+    resources_file = tmp_path / explorer.RESOURCES_FILE.name
+    ckan.resources_stamp(resources_file).unlink()
+
+    # a full pull (the only fixtures there are) rather than a sync from an unknown point
+    with replay.serve_fixtures(directory=fixtures.directory) as server:
+        explorer.fetch(page_size=2, max_workers=1, output_format="csv", out_dir=tmp_path)
+    assert server.stats["missing"] == 0
+    assert ckan.resources_since(resources_file) == "2024-03-04T00:00:00"
+
+
+def test_package_id_listing_skips_the_cache(fixtures, tmp_path, monkeypatch):
+    # the listing is how deletions are found, so a cached copy must not hide them
+    monkeypatch.delenv("FETCH_NO_CACHE")
+    monkeypatch.setenv("FETCH_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(cache, "_cache", None)
+
+    def listing(ids):
+        body = {"success": True, "result": {"count": len(ids), "results": [{"id": i} for i in ids]}}
+        fixtures(ckan.BASE, {"rows": ckan.ID_PAGE_SIZE, "start": 0, "fl": "id"}, body)
+        with replay.serve_fixtures(directory=fixtures.directory) as server:
+            ids = ckan.list_package_ids()
+        assert server.stats["missing"] == 0
+        return ids
+
+    assert listing("ab") == {"a", "b"}
+    assert listing("a") == {"a"}
+    assert not list((tmp_path / "cache").glob("*.body"))
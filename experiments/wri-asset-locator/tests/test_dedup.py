@@ -0,0 +1,158 @@
+import pandas as pd
+from connectors import dedup
+
+RW_SPACES = {"resource_watch": "rw-api", "global_forest_watch": "rw-api"}
+
+
+def add(index, ref, slug=None, name=None):
+    return index.add(ref, dedup.identity_keys(ref.split(":", 1)[1], slug, name))
+
+
+def test_name_never_joins_rows_of_one_source():
+    index = dedup.IdentityIndex(id_spaces=RW_SPACES)
+    add(index, "resource_watch:a1", "tree-cover-loss-2020", "Tree Cover Loss")
+    assert add(index, "resource_watch:a2", "tree-cover-loss-2023", "Tree Cover Loss") is None
+    assert len(index.groups()) == 2
+
+
+def test_name_does_not_override_conflicting_slugs_or_ids():
+    index = dedup.IdentityIndex(id_spaces=RW_SPACES)
+    add(index, "resource_watch:a1", "tree-cover-loss-2020", "Tree Cover Loss")
+    # another source, but the slugs disagree
+    assert add(index, "global_forest_watch:a2", "tree-cover-loss-2023", "Tree Cover Loss") is None
+    # no slug, but an id from the same id space that disagrees
+    assert add(index, "global_forest_watch:a3", None, "Tree Cover Loss") is None
+    assert len(index.groups()) == 3
+
+
+def test_name_does_not_chain_two_rows_of_one_source():
+    index = dedup.IdentityIndex(id_spaces=RW_SPACES)
+    add(index, "wri_data_explorer:c1", None, "Tree Cover Loss")
+    add(index, "arcgis_wri_catalog:g1", None, "Tree Cover Loss")
+    # would join c1's group, which already holds an ArcGIS row
+    assert add(index, "arcgis_wri_catalog:g2", None, "Tree Cover Loss") is None
+    assert sorted(map(sorted, index.groups().values())) == [
+        ["arcgis_wri_catalog:g1", "wri_data_explorer:c1"],
+        ["arcgis_wri_catalog:g2"],
+    ]
+
+
+def test_rows_sharing_an_id_slug_or_name_are_grouped():
+    index = dedup.IdentityIndex(id_spaces=RW_SPACES)
+    add(index, "resource_watch:a1", "forest-loss", "Tree Cover Loss")
+    # same dataset through the GFW application: same id
+    assert add(index, "global_forest_watch:a1") == "resource_watch:a1"
+    # another catalog, same slug
+    assert add(index, "wri_data_explorer:c1", "forest-loss") == "resource_watch:a1"
+    # another catalog, only the name (accents and punctuation don't matter)
+    assert add(index, "arcgis_wri_catalog:g1", None, "Tree cover-loss!") == "resource_watch:a1"
+    # too short a name to identify anything
+    add(index, "arcgis_wri_catalog:g2", None, "Population")
+    add(index, "wri_data_explorer:c2", None, "Population")
+    assert index.groups() == {
+        "resource_watch:a1": [
+            "resource_watch:a1",
+            "global_forest_watch:a1",
+            "wri_data_explorer:c1",
+            "arcgis_wri_catalog:g1",
+        ],
+        "arcgis_wri_catalog:g2": ["arcgis_wri_catalog:g2"],
+        "wri_data_explorer:c2": ["wri_data_explorer:c2"],
+    }
+
+
+def test_canonical_row_is_kept_across_runs(tmp_path):
+    path = tmp_path / "dedup_index.json"
+    first = dedup.IdentityIndex()
+    add(first, "wri_data_explorer:c1", "forest-loss")
+    add(first, "arcgis_wri_catalog:g1", "forest-loss")
+    dedup.save_index(first.key_map(), path)
+
+    # the next run sees the rows in the other order, plus a new copy
+    second = dedup.IdentityIndex(dedup.load_index(path))
+    add(second, "arcgis_wri_catalog:g1", "forest-loss")
+    add(second, "resource_watch:a1", "forest-loss")
+    add(second, "wri_data_explorer:c1", "forest-loss")
+    assert second.groups() == {
+        "wri_data_explorer:c1": [
+            "wri_data_explorer:c1",
+            "arcgis_wri_catalog:g1",
+            "resource_watch:a1",
+        ]
+    }
+
+    # a canonical row that is gone hands over to the first arrival
+    third = dedup.IdentityIndex(dedup.load_index(path))
+    add(third, "resource_watch:a1", "forest-loss")
+    add(third, "arcgis_wri_catalog:g1", "forest-loss")
+    assert list(third.groups()) == ["resource_watch:a1"]
+
+
+def test_load_index_without_a_file(tmp_path):
+    assert dedup.load_index(tmp_path / "missing.json") == {}
+
+
+def frame():
+    df = pd.DataFrame(
+        {
+            "dataset_id": ["a1", "c1", "g1", "c2"],
+            "dataset_description": ["", "from ckan", "from arcgis", "other"],
+            "provider": ["rw", "", "arcgis", "ckan"],
+        }
+    )
+    refs = pd.Series(
+        [
+            "resource_watch:a1",
+            "wri_data_explorer:c1",
+            "arcgis_wri_catalog:g1",
+            "wri_data_explorer:c2",
+        ]
+    )
+    groups = {
+        "resource_watch:a1": ["resource_watch:a1", "arcgis_wri_catalog:g1", "wri_data_explorer:c1"],
+        "wri_data_explorer:c2": ["wri_data_explorer:c2"],
+    }
+    return df, refs, groups
+
+
+def test_apply_groups_flag_keeps_every_row():
+    df, refs, groups = frame()
+    flagged = dedup.apply_groups(df, refs, groups, mode="flag")
+    assert flagged["dataset_id"].tolist() == df["dataset_id"].tolist()
+    assert flagged["duplicate_of"].tolist() == ["", "resource_watch:a1", "resource_watch:a1", ""]
+
+
+def test_apply_groups_merge_fills_empty_fields_in_arrival_order():
+    df, refs, groups = frame()
+    merged = dedup.apply_groups(df, refs, groups, mode="merge")
+    assert merged.to_dict("records") == [
+        {
+            "dataset_id": "a1",
+            # g1 arrived before c1 in the group, so its description wins
+            "dataset_description": "from arcgis",
+            "provider": "rw",
+            "also_in": "arcgis_wri_catalog:g1; wri_data_explorer:c1",
+        },
+        {
+            "dataset_id": "c2",
+            "dataset_description": "other",
+            "provider": "ckan",
+            "also_in": "",
+        },
+    ]
+
+
+def test_summarize():
+    _, refs, groups = frame()
+    report = dedup.summarize(list(refs), groups, seconds_per_row=2.0)
+    assert report == {
+        "rows": 4,
+        "datasets": 2,
+        "duplicates": 2,
+        "by_source": {
+            "resource_watch": {"rows": 1, "duplicates": 0},
+            "wri_data_explorer": {"rows": 2, "duplicates": 1},
+            "arcgis_wri_catalog": {"rows": 1, "duplicates": 1},
+        },
+        "embed_seconds_saved": 4.0,
+    }
@@ -0,0 +1,128 @@
+"""The report extraction (`eae.figure_rows` / `eae.table_rows`) against the hand-written catalog.
+
+`fixtures/eae_report_pages.json` is `eae.read_pages` output (text and tables per
+page) for a copy of the report's Figure 1 and Table 1 layout. To check a newer
+report, or the original, put it at `data/energy-access-explorer-data-and-methods.pdf`:
+`test_report_matches_hand_written` then extracts it and diffs it the same way.
+"""
+
+import importlib
+import json
+from pathlib import Path
+
+import pytest
+from connectors import eae
+
+PAGES = json.loads((Path(__file__).parent / "fixtures" / "eae_report_pages.json").read_text())
+
+COMPARED = ["name", "category", "group", "unit", *eae.FLAG_FIELDS]
+
+# Radio Ownership is only in Figure 1, which has no units or index columns
+EXPECTED_DIFF = {
+    "demand-radio-ownership": {
+        "unit": ("Ownership rate", ""),
+        "usedIn_Demand": (True, False),
+    },
+}
+
+
+@pytest.fixture
+def hand_written(tmp_path, monkeypatch):
+    """The notebook's hand-written catalog: what it writes when the report can't be read."""
+    monkeypatch.chdir(tmp_path)
+    notebook = importlib.import_module("fetch_datasets_scrape_pdfreport_energy_access_explorer")
+    monkeypatch.setattr(eae, "download", lambda **kwargs: None)
+    return notebook.fetch(output_format="csv", out_dir=tmp_path)
+
+
+def value(field, v):
+    # the hand-written rows leave an index they don't know about empty
+    return v is True if field in eae.FLAG_FIELDS else v
+
+
+def diff(extracted, hand_written):
+    """{id: {field: (hand-written, extracted)}} for every value that differs, plus missing ids."""
+    pdf = {row["id"]: row for row in extracted}
+    hand = {row["id"]: row for row in hand_written.to_dict("records")}
+    changes = {}
+    for row_id in hand.keys() | pdf.keys():
+        if row_id not in pdf or row_id not in hand:
+            changes[row_id] = "only hand-written" if row_id in hand else "only in the report"
+            continue
+        fields = {
+            field: (value(field, hand[row_id][field]), value(field, pdf[row_id][field]))
+            for field in COMPARED
+        }
+        if changed := {field: pair for field, pair in fields.items() if pair[0] != pair[1]}:
+            changes[row_id] = changed
+    return changes
+
+
+def test_figure_rows():
+    rows = eae.figure_rows(PAGES)
+    assert len(rows) == 25
+    assert rows[0] == ("Population", "Demographics")
+    assert rows[-1] == ("Accessibility to Cities", "Infrastructure")
+    assert {category for _, category in rows} == set(eae.CATEGORY_GROUPS)
+
+
+def test_table_rows_span_pages_and_stop_at_the_next_table():
+    rows = eae.table_rows(PAGES)
+    # 24 rows over two pages (the header repeats); Table 2 after it is not read
+    assert len(rows) == 24
+    assert rows[-1]["name"] == "Accessibility to Cities"
+    # merged category cells carry down to the rows below them
+    assert all(row["category"] in eae.CATEGORY_GROUPS for row in rows)
+    assert rows[0] == {
+        "name": "Population",
+        "category": "Demographics",
+        "unit": "People/km²",
+        "usedIn_EAP": True,
+        "usedIn_Demand": True,
+        "usedIn_Supply": False,
+        "usedIn_NeedAssist": False,
+    }
+
+
+def test_fixture_matches_hand_written(hand_written):
+    assert len(hand_written) == 25
+    assert diff(eae.catalog_rows(PAGES), hand_written) == EXPECTED_DIFF
+
+
+@pytest.mark.skipif(
+    not (eae.PDF_PATH.exists() and eae.extraction_available()),
+    reason=f"no {eae.PDF_PATH.name} in data/ (or no pdfplumber)",
+)
+def test_report_matches_hand_written(hand_written):
+    extracted = eae.catalog_rows(eae.read_pages(eae.PDF_PATH))
+    assert diff(extracted, hand_written) == EXPECTED_DIFF
+
+
+@pytest.fixture
+def notebook(tmp_path, monkeypatch):
+    """The notebook, with the report "downloaded" and its extraction replaced by `extract`."""
+    monkeypatch.chdir(tmp_path)
+    notebook = importlib.import_module("fetch_datasets_scrape_pdfreport_energy_access_explorer")
+
+    def fetch(rows):
+        monkeypatch.setattr(eae, "download", lambda **kwargs: tmp_path / "report.pdf")
+        monkeypatch.setattr(eae, "extraction_available", lambda: True)
+        monkeypatch.setattr(eae, "extract_catalog", lambda path, **kwargs: (rows, False))
+        return notebook.fetch(output_format="csv", out_dir=tmp_path)
+
+    return fetch
+
+
+def test_extraction_replaces_hand_written_rows(notebook, hand_written):
+    df = notebook(eae.catalog_rows(PAGES))
+    assert diff(df.to_dict("records"), hand_written) == EXPECTED_DIFF
+    # tags and descriptions still come from the hand-written rows
+    descriptions = dict(zip(hand_written["id"], hand_written["description"], strict=True))
+    assert dict(zip(df["id"], df["description"], strict=True)) == descriptions
+
+
+def test_partial_extraction_keeps_hand_written_rows(notebook, hand_written, capsys):
+    rows = eae.catalog_rows(PAGES)[:10]
+    df = notebook(rows)
+    assert df.to_dict("records") == hand_written.to_dict("records")
+    assert "only 40% of the hand-written datasets found" in capsys.readouterr().out
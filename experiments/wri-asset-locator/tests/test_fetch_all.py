@@ -0,0 +1,46 @@
+from pathlib import Path
+
+import fetch_all
+from connectors import eae
+
+SRC_DIR = Path(fetch_all.__file__).resolve().parent
+
+
+def build(data_dir, name):
+    """Record `name` as built from what's in `data_dir` now."""
+    builds = fetch_all.BuildState(SRC_DIR, data_dir, skip_fresh=True)
+    builds.stale_reason(name)
+    builds.record(name)
+
+
+def test_changed_pdf_makes_eae_stale(tmp_path):
+    stage = fetch_all.STAGES["eae"]
+    pdf = tmp_path / eae.PDF_PATH.name
+    pdf.write_bytes(b"%PDF-1.4 first edition")
+    (tmp_path / stage.outputs[0]).write_text("id,name\n")
+    build(tmp_path, "eae")
+
+    assert fetch_all.BuildState(SRC_DIR, tmp_path, skip_fresh=True).stale_reason("eae") is None
+
+    pdf.write_bytes(b"%PDF-1.4 second edition")
+    reason = fetch_all.BuildState(SRC_DIR, tmp_path, skip_fresh=True).stale_reason("eae")
+    assert reason == f"inputs changed ({pdf.name})"
+
+
+def test_pdf_downloaded_by_the_stage_is_recorded(tmp_path):
+    stage = fetch_all.STAGES["eae"]
+    builds = fetch_all.BuildState(SRC_DIR, tmp_path, skip_fresh=True)
+    assert builds.stale_reason("eae") == "no build record"
+    # what the stage does while it runs
+    (tmp_path / eae.PDF_PATH.name).write_bytes(b"%PDF-1.4")
+    (tmp_path / stage.outputs[0]).write_text("id,name\n")
+    builds.record("eae")
+
+    assert fetch_all.BuildState(SRC_DIR, tmp_path, skip_fresh=True).stale_reason("eae") is None
+
+
+def test_runner_scripts_are_part_of_the_code_hash(tmp_path, monkeypatch):
+    builds = fetch_all.BuildState(SRC_DIR, tmp_path)
+    _, code, _ = builds._current("combine")
+    monkeypatch.setattr(fetch_all, "RUNNER_SCRIPTS", ["fetch_all.py"])
+    assert builds._current("combine")[1] != code
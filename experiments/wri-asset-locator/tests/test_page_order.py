@@ -0,0 +1,117 @@
+"""A concurrent Resource Watch crawl writes the same bytes as a serial one.
+
+Pages are recorded once (`FETCH_RECORD_DIR`) from a stand-in for the API, then
+replayed with random per-response delays, so pages 2..N finish out of order.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+from connectors import paging, registry, replay, resourcewatch
+
+N_ITEMS = 47
+PAGE_SIZE = 5
+
+
+def dataset(i):
+    return {
+        "id": f"ds-{i:03d}",
+        "type": "dataset",
+        "attributes": {
+            "name": f'Dataset {i}, "quoted"',
+            "slug": f"dataset-{i}",
+            "provider": "cartodb",
+            "application": ["rw"],
+            "createdAt": "2020-01-01T00:00:00.000Z",
+            "updatedAt": f"2023-{1 + i % 12:02d}-01T00:00:00.000Z",
+            "dataLastUpdated": None,
+            "layer": [{"attributes": {"name": f"Layer {i}.{k}"}} for k in range(i % 3)],
+            "vocabulary": [{"attributes": {"tags": [f"t{i % 4}", "shared"]}}],
+        },
+    }
+
+
+class CatalogHandler(BaseHTTPRequestHandler):
+    """The `/v1/dataset` listing, at the paths the client uses with `FETCH_REPLAY_URL`."""
+
+    def do_GET(self):
+        query = parse_qs(urlsplit(self.path).query)
+        number, size = int(query["page[number]"][0]), int(query["page[size]"][0])
+        items = [dataset(i) for i in range((number - 1) * size, min(N_ITEMS, number * size))]
+        meta = {"total-pages": -(-N_ITEMS // size), "total-items": N_ITEMS, "size": size}
+        body = json.dumps({"data": items, "meta": meta}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def recorded(tmp_path, monkeypatch):
+    """A fixture directory holding every page of the catalog."""
+    directory = tmp_path / "recorded"
+    monkeypatch.setenv("FETCH_NO_CACHE", "1")
+    monkeypatch.setenv("FETCH_CHECKPOINT_DIR", str(tmp_path / "checkpoints"))
+    monkeypatch.setenv("FETCH_ARCHIVE_DIR", str(tmp_path / "archive"))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CatalogHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with monkeypatch.context() as m:
+            m.setenv("FETCH_REPLAY_URL", f"http://127.0.0.1:{server.server_address[1]}")
+            m.setenv("FETCH_RECORD_DIR", str(directory))
+            crawl_to(tmp_path / "live.csv", max_workers=1)
+    finally:
+        server.shutdown()
+        server.server_close()
+    return directory
+
+
+def crawl_to(outfile, max_workers):
+    return resourcewatch.write_csv(
+        registry.SOURCES["rw"],
+        outfile,
+        facet_dir=None,
+        output_format="csv",
+        page_size=PAGE_SIZE,
+        max_workers=max_workers,
+    )
+
+
+def test_concurrent_crawl_is_byte_identical_to_serial(recorded, tmp_path, monkeypatch):
+    arrived = []
+    get_json = paging.get_json
+
+    def record_arrival(url, params=None, **kwargs):
+        page = get_json(url, params=params, **kwargs)
+        if params["page[number]"] == 2:
+            # whatever the jitter, the pages after it overtake page 2
+            time.sleep(0.5)
+        arrived.append(params["page[number]"])
+        return page
+
+    monkeypatch.setattr(paging, "get_json", record_arrival)
+    outputs = {}
+    orders = {}
+    for workers in (1, 4):
+        arrived.clear()
+        # up to 0.3s more per response, well above the rate limiter's spacing
+        with replay.serve_fixtures(directory=recorded, jitter=0.3) as server:
+            assert crawl_to(tmp_path / f"workers-{workers}.csv", workers) == N_ITEMS
+        assert server.stats["missing"] == 0
+        outputs[workers] = (tmp_path / f"workers-{workers}.csv").read_bytes()
+        orders[workers] = list(arrived)
+
+    pages = list(range(1, -(-N_ITEMS // PAGE_SIZE) + 1))
+    assert orders[1] == pages
+    # the concurrent pages really did arrive out of order
+    assert sorted(orders[4]) == pages and orders[4] != pages
+    assert outputs[4] == outputs[1]
+    assert outputs[1] == (tmp_path / "live.csv").read_bytes()
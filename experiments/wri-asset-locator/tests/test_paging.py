@@ -0,0 +1,116 @@
+import pytest
+from connectors import registry, replay
+from connectors.checkpoint import Checkpoint
+from connectors.paging import crawl
+
+URL = "https://api.example.org/items"
+
+ITEMS = [{"id": i} for i in range(1, 8)]
+
+
+def source(paging, **kwargs):
+    return registry.Source(
+        name="test",
+        title="Test",
+        collection="Test",
+        output="test.csv",
+        columns={},
+        endpoint=URL,
+        paging=paging,
+        page_size=3,
+        **kwargs,
+    )
+
+
+def run(fixtures, tmp_path, src, **kwargs):
+    checkpoint = Checkpoint("test", directory=tmp_path / "checkpoints")
+    with replay.serve_fixtures(directory=fixtures.directory) as server:
+        pages = list(crawl(src, checkpoint, **kwargs))
+    return pages, server.stats
+
+
+def chunks(items, size=3):
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+@pytest.mark.parametrize("with_total", [True, False])
+def test_page_numbers(fixtures, tmp_path, with_total):
+    src = source("page", cursor_param="page", size_param="size", items="data", total="meta.total")
+    for n, chunk in enumerate(chunks(ITEMS), start=1):
+        meta = {"total": len(ITEMS)} if with_total else {}
+        fixtures(URL, {"page": n, "size": 3}, {"data": chunk, "meta": meta})
+
+    pages, stats = run(fixtures, tmp_path, src, max_workers=3)
+
+    assert [key for key, _ in pages] == [1, 2, 3]
+    assert [row for _, rows in pages for row in rows] == ITEMS
+    assert stats["missing"] == 0
+
+
+def test_offsets(fixtures, tmp_path):
+    src = source("offset", cursor_param="start", size_param="limit", first=0, items="results")
+    for n, chunk in enumerate(chunks(ITEMS)):
+        fixtures(URL, {"start": n * 3, "limit": 3}, {"results": chunk})
+
+    pages, stats = run(fixtures, tmp_path, src)
+
+    # no total: pages are requested until a short one
+    assert [key for key, _ in pages] == [0, 3, 6]
+    assert [row for _, rows in pages for row in rows] == ITEMS
+    assert stats["missing"] == 0
+
+
+def test_next_links(fixtures, tmp_path):
+    src = source("next", size_param="limit", items="items", next="links.next")
+    hrefs = [f"{URL}?cursor=a", f"{URL}?cursor=b", None]
+    fixtures(URL, {"limit": 3}, {"items": ITEMS[:3], "links": {"next": hrefs[0]}})
+    fixtures(hrefs[0], None, {"items": ITEMS[3:6], "links": {"next": hrefs[1]}})
+    fixtures(hrefs[1], None, {"items": ITEMS[6:], "links": {}})
+
+    pages, stats = run(fixtures, tmp_path, src)
+
+    assert [key for key, _ in pages] == [1, 2, 3]
+    assert [row for _, rows in pages for row in rows] == ITEMS
+    assert stats["missing"] == 0
+
+
+def test_static(fixtures, tmp_path):
+    src = source("static", params={"format": "json"}, items="items")
+    fixtures(URL, {"format": "json"}, {"items": ITEMS})
+
+    pages, _ = run(fixtures, tmp_path, src)
+
+    assert pages == [(1, ITEMS)]
+
+
+def test_offsets_fall_back_to_opaque_next_links(fixtures, tmp_path):
+    # a total is reported, but `next` doesn't carry `startindex`: follow the links
+    src = source(
+        "offset",
+        cursor_param="startindex",
+        size_param="limit",
+        items="features",
+        total="numberMatched",
+        next="links.next",
+    )
+    href = f"{URL}?token=xyz"
+    first = {"features": ITEMS[:3], "numberMatched": 6, "links": {"next": href}}
+    fixtures(URL, {"startindex": 1, "limit": 3}, first)
+    fixtures(href, None, {"features": ITEMS[3:6], "numberMatched": 6, "links": {}})
+
+    pages, stats = run(fixtures, tmp_path, src)
+
+    assert [row for _, rows in pages for row in rows] == ITEMS[:6]
+    assert stats["missing"] == 0
+
+
+def test_check_rejects_malformed_page(fixtures, tmp_path):
+    def check(page):
+        if "items" not in page:
+            raise ValueError("no items")
+
+    src = source("static", items="items", check=check)
+    fixtures(URL, None, {"error": "nope"})
+
+    with pytest.raises(ValueError, match="no items"):
+        run(fixtures, tmp_path, src)
@@ -0,0 +1,35 @@
+import json
+import time
+
+from connectors.ratelimit import STATE_MAX_AGE, RateLimiter
+
+URL = "https://api.example.org/v1/dataset"
+
+
+def test_learned_rate_and_pause_carry_to_the_next_process(tmp_path):
+    path = tmp_path / "rate_limits.json"
+    first = RateLimiter(state_path=path)
+    bucket = first.bucket(URL)
+    bucket.observe(429, 0.1, retry_after="30")
+    first.save()
+
+    restored = RateLimiter(state_path=path).bucket(URL)
+    assert restored.rate == bucket.rate < RateLimiter().bucket(URL).rate
+    assert restored.paused_until - time.monotonic() > 25
+
+
+def test_old_state_is_ignored(tmp_path):
+    path = tmp_path / "rate_limits.json"
+    stale = {"rate": 0.5, "paused_until": 0.0, "saved_at": time.time() - STATE_MAX_AGE - 1}
+    path.write_text(json.dumps({"api.example.org": stale}))
+    assert RateLimiter(state_path=path).bucket(URL).rate == RateLimiter().bucket(URL).rate
+
+
+def test_save_keeps_other_hosts(tmp_path):
+    path = tmp_path / "rate_limits.json"
+    other = {"rate": 1.0, "paused_until": 0.0, "saved_at": time.time()}
+    path.write_text(json.dumps({"other.example.org": other}))
+    limiter = RateLimiter(state_path=path)
+    limiter.bucket(URL).observe(200, 0.1)
+    limiter.save()
+    assert set(json.loads(path.read_text())) == {"other.example.org", "api.example.org"}
@@ -0,0 +1,55 @@
+import json
+from pathlib import Path
+
+import pytest
+from connectors import resourcewatch
+
+PAGE = json.loads((Path(__file__).parent / "fixtures" / "rw_dataset_page.json").read_text())
+
+
+@pytest.fixture
+def rows():
+    return {row["id"]: row for row in resourcewatch.extract_rows(PAGE)}
+
+
+def test_every_item_becomes_a_row(rows):
+    assert len(rows) == len(PAGE["data"])
+    assert all(set(resourcewatch.FIELDS) <= set(row) for row in rows.values())
+
+
+def test_layers_and_vocabulary_are_joined(rows):
+    row = rows["c0c71e67-0088-4d69-b375-85297f79ee75"]
+    # layers without a name are left out of both columns
+    assert row["layerCount"] == 2
+    assert row["layerNames"] == "Tree cover loss (annual) | Tree cover loss by driver"
+    # tags of every vocabulary, de-duplicated and sorted
+    assert row["tags"] == "forest, forestChange, geospatial, loss"
+    assert row["applications"] == ["gfw", "rw"]
+    assert row["createdAt"] == "2017-07-18T20:32:31.412Z"
+    assert row["dataLastUpdated"] == "2023-04-01T00:00:00.000Z"
+
+
+def test_item_without_attributes(rows):
+    row = rows["0d7a8d5b-6f2c-4a6e-b2b4-0d1b9c4f2a11"]
+    assert row["name"] is None
+    assert (row["tags"], row["layerCount"], row["layerNames"]) == ("", 0, "")
+    assert row["applications"] == []
+
+
+def test_null_metadata_layers_and_vocabulary_attributes(rows):
+    row = rows["9e1b3e34-8a2d-4e59-a1e0-5cfa1f2d6b0c"]
+    assert row["name"] == "Protected Areas"
+    assert (row["tags"], row["layerCount"], row["layerNames"]) == ("", 0, "")
+    assert row["applications"] == []
+    assert row["dataLastUpdated"] is None
+
+
+def test_layer_ids_without_includes_are_skipped(rows):
+    row = rows["b5f0a3d4-1c9e-4f7b-9a2e-6d8c3e1f0a77"]
+    assert (row["layerCount"], row["layerNames"]) == (1, "Baseline water stress")
+
+
+def test_check_page():
+    resourcewatch.check_page(PAGE)
+    with pytest.raises(ValueError, match="meta"):
+        resourcewatch.check_page({"errors": [{"status": 500}]})
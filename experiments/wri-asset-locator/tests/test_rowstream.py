@@ -0,0 +1,101 @@
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+from connectors import arcgis, rowstream
+
+
+def rows(n=23):
+    # few distinct keys, so most rows tie; "" / None mark a missing date
+    dates = ["2024-01-01", "", "2023-06-01", "2024-01-01", None, "2022-12-31"]
+    return [
+        {"id": f"r{i:02d}", "updatedAt": dates[i % len(dates)], "dataset_id": f"d{i % 4}"}
+        for i in range(n)
+    ]
+
+
+@pytest.fixture
+def spills(monkeypatch):
+    """Count the runs `external_sort` spills to disk."""
+    paths = []
+    spill = rowstream._spill
+
+    def counting(rows, directory, n):
+        paths.append(spill(rows, directory, n))
+        return paths[-1]
+
+    monkeypatch.setattr(rowstream, "_spill", counting)
+    return paths
+
+
+def test_external_sort_matches_stable_sort_values(spills, tmp_path):
+    data = rows()
+    ordered = list(
+        rowstream.external_sort(
+            data, key=lambda row: row["dataset_id"], run_rows=4, tmp_dir=tmp_path
+        )
+    )
+    assert len(spills) == 6
+    expected = pd.DataFrame(data).sort_values("dataset_id", kind="stable")
+    assert [row["id"] for row in ordered] == expected["id"].tolist()
+    # the runs are removed once merged
+    assert not any(path.exists() for path in spills)
+
+
+def test_external_sort_descending_keeps_ties_in_arrival_order(spills):
+    data = rows()
+    # arcgis.write_rows' key: newest first, missing dates last
+    ordered = list(
+        rowstream.external_sort(
+            data, key=lambda row: row["updatedAt"] or "", reverse=True, run_rows=5
+        )
+    )
+    assert len(spills) == 5
+    # the in-memory sort it replaced, made stable
+    expected = (
+        pd.DataFrame(data)
+        .replace("", None)
+        .sort_values("updatedAt", ascending=False, na_position="last", kind="stable")
+    )
+    assert [row["id"] for row in ordered] == expected["id"].tolist()
+
+
+def test_external_sort_in_one_run_does_not_spill(spills):
+    data = rows(5)
+    ordered = list(rowstream.external_sort(data, key=lambda row: row["dataset_id"], run_rows=10))
+    assert not spills
+    assert ordered == sorted(data, key=lambda row: row["dataset_id"])
+
+
+def test_arcgis_write_rows_over_several_runs(spills, tmp_path):
+    data = [{**row, "name": f"Dataset {row['id']}"} for row in rows()]
+    csv_path = tmp_path / "arcgis.csv"
+    writer = arcgis.write_rows(iter(data), csv_path, run_rows=4)
+    assert spills
+    assert writer.rows == len(data)
+
+    expected = (
+        pd.DataFrame(data, columns=arcgis.FIELDS)
+        .replace("", None)
+        .sort_values("updatedAt", ascending=False, na_position="last", kind="stable")
+    )
+    written = pd.read_csv(csv_path, dtype=str)
+    assert written["id"].tolist() == expected["id"].tolist()
+    assert (
+        pd.read_parquet(csv_path.with_suffix(".parquet"))["id"].tolist() == written["id"].tolist()
+    )
+
+
+def test_row_writer_appends_row_groups(tmp_path):
+    csv_path = tmp_path / "rows.csv"
+    with rowstream.RowWriter(
+        csv_path, ["id", "updatedAt"], datetimes=["updatedAt"], row_group_size=4
+    ) as writer:
+        writer.write_rows(rows(10))
+        # nothing replaces an output before the block completes
+        assert not csv_path.exists()
+    assert writer.rows == 10
+    parquet = pq.ParquetFile(csv_path.with_suffix(".parquet"))
+    assert parquet.metadata.num_row_groups == 3
+    df = parquet.read().to_pandas()
+    assert str(df["updatedAt"].dtype) == "datetime64[ns, UTC]"
+    assert df["id"].tolist() == pd.read_csv(csv_path, dtype=str)["id"].tolist()
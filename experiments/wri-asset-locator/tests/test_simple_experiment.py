@@ -0,0 +1,90 @@
+"""The simple-python-uv experiment's FETCH DATA cell, run against a stand-in API."""
+
+import csv
+import importlib.util
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import marimo
+import pytest
+from connectors import facets
+
+NOTEBOOK = Path(__file__).resolve().parents[2] / "simple-python-uv-experiment" / "experiment_one.py"
+N_ITEMS = 3
+
+
+class CatalogHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        query = parse_qs(urlsplit(self.path).query)
+        assert query["application"] == ["rw"]
+        items = [
+            {"id": f"ds-{i}", "attributes": {"name": f"Dataset {i}", "application": ["rw"]}}
+            for i in range(N_ITEMS)
+        ]
+        meta = {"total-pages": 1, "total-items": N_ITEMS}
+        body = json.dumps({"data": items, "meta": meta}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    monkeypatch.setenv("FETCH_NO_CACHE", "1")
+    monkeypatch.setenv("FETCH_CHECKPOINT_DIR", str(tmp_path / "checkpoints"))
+    monkeypatch.setenv("FETCH_ARCHIVE_DIR", str(tmp_path / "archive"))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CatalogHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("FETCH_REPLAY_URL", f"http://127.0.0.1:{server.server_address[1]}")
+    yield
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def notebook():
+    spec = importlib.util.spec_from_file_location("experiment_one", NOTEBOOK)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_connector_state_stays_in_the_experiment(notebook, monkeypatch):
+    for name in ("FETCH_CACHE_DIR", "FETCH_CHECKPOINT_DIR", "FETCH_ARCHIVE_DIR"):
+        monkeypatch.delenv(name, raising=False)
+    notebook.connectors_cell.run(mo=marimo, os=os, sys=sys)
+    for name in ("FETCH_CACHE_DIR", "FETCH_CHECKPOINT_DIR", "FETCH_ARCHIVE_DIR"):
+        assert Path(os.environ[name]).parent == NOTEBOOK.parent / ".fetch"
+
+
+def test_fetch_button_writes_the_csv(api, notebook, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    def write_slice(*args, **kwargs):
+        raise AssertionError("the experiment wrote to the wri-asset-locator application index")
+
+    monkeypatch.setattr(facets, "write_slice", write_slice)
+    # the cell's inputs, as the notebook's earlier cells define them
+    _, connectors = notebook.connectors_cell.run(mo=marimo, os=os, sys=sys)
+    _, defs = notebook.fetch_cell.run(
+        FETCH_PARAMS={"application": "rw"},
+        OUTFILE="resourcewatch_datasets.csv",
+        registry=connectors["registry"],
+        resourcewatch=connectors["resourcewatch"],
+    )
+    defs["fetch_data_and_write_file"]()
+
+    with open(tmp_path / "resourcewatch_datasets.csv", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["id"] for row in rows] == [f"ds-{i}" for i in range(N_ITEMS)]
+    assert not (tmp_path / "resourcewatch_datasets.parquet").exists()